@@ -0,0 +1,157 @@
+"""
+Gemeinsame Hilfsfunktionen für die Benchmarks.
+
+Die Skripte werden direkt aus dem Repository gestartet
+(z.B. ``python benchmarks/bench_engine.py``) und benötigen keinen Discord-Token.
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# Der Start des Bots (bot.main.main) verlangt einen Token - für Benchmarks reicht ein Platzhalter
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+
+# Logs/ und temp/ des Bots nicht anfassen: in einem Arbeitsverzeichnis laufen
+ORIGINAL_CWD = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="imagex-bench-"))
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Berechnet das Perzentil (0-100) einer Werteliste mit linearer Interpolation."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def make_test_image(width: int, height: int, mode: str = "RGB", seed: int = 0):
+    """
+    Erzeugt ein synthetisches Foto-ähnliches Testbild (Verläufe plus Rauschen),
+    das sich ähnlich schwer komprimieren lässt wie echte Uploads.
+    """
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    channels = [
+        128 + 100 * np.sin(x / (17 + seed)) * np.cos(y / 23),
+        (x / max(width, 1)) * 255,
+        (y / max(height, 1)) * 255,
+    ]
+    if mode == "RGBA":
+        channels.append(np.clip(255 - (x + y) / (width + height) * 128, 0, 255))
+    array = np.stack(channels, axis=-1)
+    array += rng.normal(0, 12, array.shape)
+    return Image.fromarray(np.clip(array, 0, 255).astype(np.uint8), mode)
+
+
+def encode_image(img, fmt: str, **options) -> bytes:
+    """Kodiert ein PIL-Bild in das angegebene Format und gibt die Bytes zurück."""
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt.upper(), **options)
+    return buffer.getvalue()
+
+
+class LoopLagMonitor:
+    """
+    Misst, wie lange der Event-Loop blockiert ist: ein Ticker erwartet alle
+    ``interval`` Sekunden aufzuwachen und protokolliert jede Verspätung.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Dem Ticker Gelegenheit geben, eine noch ausstehende Verspätung zu messen
+        await asyncio.sleep(self.interval)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "max_lag_ms": max(self.lags, default=0.0) * 1000,
+            "p99_lag_ms": percentile(self.lags, 99) * 1000,
+        }
+
+
+def peak_rss_mb(pid="self") -> float:
+    """Maximaler Resident Set Size eines Prozesses in MB (Linux/macOS, Standard: dieser Prozess)."""
+    import resource
+
+    # VmHWM wird bei exec zurückgesetzt, ru_maxrss erbt dagegen den Wert des Elternprozesses
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        if pid != "self":
+            return 0.0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux meldet KB, macOS Bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def reset_peak_rss(pid="self") -> bool:
+    """Setzt den Spitzen-RSS (VmHWM) eines Prozesses zurück (nur Linux)."""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w", encoding="ascii") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def print_table(rows: List[Dict], columns: Sequence[str]) -> None:
+    """Gibt eine einfache, ausgerichtete Texttabelle aus."""
+    def fmt(value):
+        return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+    widths = {c: max(len(c), *(len(fmt(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(fmt(row.get(c, "")).ljust(widths[c]) for c in columns))
+
+
+def write_json(path: Optional[str], payload) -> None:
+    """Schreibt Ergebnisse maschinenlesbar, falls ein Pfad angegeben wurde."""
+    if path:
+        path = os.path.join(ORIGINAL_CWD, path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+        print(f"Ergebnisse gespeichert: {path}")
+
+
+def now() -> float:
+    return time.perf_counter()
@@ -0,0 +1,197 @@
+"""
+Nachbildungen von Discord für Benchmarks: ein lokaler CDN-Server, die
+Webhook-Endpunkte der Discord-API und minimale Interaction-/Attachment-Objekte,
+die ImageQueue und convert_image erwarten.
+"""
+
+import asyncio
+import itertools
+import secrets
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from _common import now
+
+
+class LocalCDN:
+    """
+    aiohttp-Server als Ersatz für cdn.discordapp.com.
+
+    Dateien liegen im Speicher und werden unter
+    ``/attachments/<kanal>/<id>/<name>?ex=..&is=..&hm=..`` ausgeliefert; die
+    Signatur-Parameter ändern sich bei jeder URL wie beim echten CDN.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency  # Verzögerung pro Anfrage (entferntes CDN)
+        self.files: Dict[str, bytes] = {}
+        self.requests = 0
+        self.bytes_sent = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._ids = itertools.count(1000)
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/attachments/{channel}/{attachment}/{name}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def add(self, filename: str, data: bytes, channel: int = 1) -> str:
+        """Legt eine Datei ab und gibt ihren Pfad (ohne Host und Signatur) zurück."""
+        path = f"/attachments/{channel}/{next(self._ids)}/{filename}"
+        self.files[path] = data
+        return path
+
+    def url(self, path: str) -> str:
+        """Signierte URL für einen Pfad; jeder Aufruf liefert eine neue Signatur."""
+        return f"http://{self.host}:{self.port}{path}?ex={secrets.token_hex(4)}&is={secrets.token_hex(4)}&hm={secrets.token_hex(16)}"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        data = self.files.get(request.path)
+        if data is None:
+            raise web.HTTPNotFound()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.requests += 1
+        self.bytes_sent += len(data)
+        return web.Response(body=data, content_type="application/octet-stream")
+
+
+class FakeWebhookAPI:
+    """
+    aiohttp-Server als Ersatz für die Webhook-Endpunkte von discord.com, die
+    Worker für Interactions benutzen (Followup senden, Antwort bearbeiten).
+
+    discord.py wird über ``discord.http.Route.BASE = api.base_url`` umgeleitet.
+    ``delivered`` ordnet jedem Interaction-Token die Zeit des ersten Followups zu.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.delivered: Dict[str, float] = {}
+        self.edits = 0
+        self.changed = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+        self._ids = itertools.count(10 ** 17)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/v10"
+
+    async def start(self) -> None:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/api/v10/webhooks/{app}/{token}", self._send)
+        app.router.add_patch("/api/v10/webhooks/{app}/{token}/messages/{message}", self._edit)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _message(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "id": str(next(self._ids)), "channel_id": "1", "type": 0, "content": "", "tts": False,
+            "author": {"id": request.match_info["app"], "username": "ImageX", "discriminator": "0", "avatar": None},
+            "attachments": [], "embeds": [], "mentions": [], "mention_roles": [], "mention_everyone": False,
+            "pinned": False, "flags": 0, "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None,
+        })
+
+    async def _send(self, request: web.Request) -> web.Response:
+        await request.read()
+        self.delivered.setdefault(request.match_info["token"], now())
+        self.changed.set()
+        return self._message(request)
+
+    async def _edit(self, request: web.Request) -> web.Response:
+        await request.read()
+        self.edits += 1
+        return self._message(request)
+
+
+class FakeAttachment:
+    """Das, was ImageQueue von discord.Attachment benutzt."""
+
+    def __init__(self, url: str, filename: str, size: int):
+        self.url = url
+        self.filename = filename
+        self.size = size
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class FakeFollowup:
+    """Zeichnet gesendete Nachrichten auf und meldet das Ende eines Jobs."""
+
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+        self.messages: List[dict] = []
+
+    async def send(self, content=None, *, file=None, files=None, **kwargs):
+        attachments = list(files or []) + ([file] if file is not None else [])
+        sizes = []
+        for attachment in attachments:
+            fp = attachment.fp
+            fp.seek(0, 2)
+            sizes.append(fp.tell())
+        self.messages.append({"content": content, "file_sizes": sizes, "time": now()})
+
+        failed = content is not None and content.startswith("❌")
+        if (attachments or failed) and not self.interaction.done.done():
+            self.interaction.done.set_result((not failed, sum(sizes)))
+        await asyncio.sleep(0)
+        return FakeMessage()
+
+
+class FakeMessage:
+    async def edit(self, **kwargs):
+        await asyncio.sleep(0)
+        return self
+
+
+class FakeResponse:
+    async def defer(self, **kwargs):
+        await asyncio.sleep(0)
+
+    async def send_message(self, *args, **kwargs):
+        await asyncio.sleep(0)
+
+
+class FakeInteraction:
+    """
+    Minimale discord.Interaction: ``done`` wird erfüllt, sobald das Ergebnis
+    (Datei oder Fehlermeldung) gesendet wurde, mit (erfolgreich, Ausgabebytes).
+    """
+
+    def __init__(self, user_id: int, guild_id: Optional[int] = 1):
+        self.user = FakeUser(user_id)
+        self.guild_id = guild_id
+        self.followup = FakeFollowup(self)
+        self.response = FakeResponse()
+        self.created = now()
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.edits: List[str] = []
+
+    async def edit_original_response(self, *, content=None, **kwargs):
+        self.edits.append(content)
+        await asyncio.sleep(0)
+        return FakeMessage()
@@ -0,0 +1,129 @@
+"""
+Lange animierte GIFs: naive Konvertierung (alle Frames laden, dann
+save_all/append_images) gegen die Frame-Pipeline aus bot/animation.py.
+
+Die Test-GIFs haben eine globale Palette, einen bewegten Bildausschnitt vor
+ruhigem Hintergrund und Standbild-Phasen, wie typische Bildschirmaufnahmen
+oder Reaction-GIFs. Jede Messung läuft in einem frischen Prozess, damit der
+Spitzen-RSS nicht von vorherigen Läufen verfälscht wird.
+
+    python benchmarks/bench_animation.py --frames 300 1000 --size 480x270 --targets gif webp --json animation.json
+"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import tempfile
+
+from _common import make_test_image, now, peak_rss_mb, print_table, write_json
+
+
+def make_gif(frames, width, height, path):
+    """Erzeugt ein langes GIF; die Frames werden Pillow per Generator übergeben."""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    background = make_test_image(width, height).quantize(200, dither=Image.Dither.NONE)
+    # Index 200 für den bewegten Kreis, 201-240 für die blinkende Leiste
+    palette = background.getpalette()[:200 * 3] + [230, 40, 40]
+    palette += [value for i in range(40) for value in (i * 6, 255 - i * 6, 128)]
+    background.putpalette(palette)
+    sprite = max(8, height // 6)
+
+    def generate():
+        for index in range(frames):
+            # Von zehn Frames zeigen die letzten drei dasselbe Bild (Standbild-Phase);
+            # Pillow fasst sie beim Schreiben zu einem Frame mit längerer Dauer zusammen
+            position = index // 10 * 10 + min(index % 10, 6)
+            frame = background.copy()
+            draw = ImageDraw.Draw(frame)
+            x = position * 4 % (width - sprite)
+            y = height // 2 + int(np.sin(position / 9) * height / 4) - sprite // 2
+            draw.ellipse((x, y, x + sprite, y + sprite), fill=200)
+            draw.rectangle((0, 0, width // 5, sprite // 2), fill=201 + position % 40)
+            yield frame
+
+    frames_iter = generate()
+    next(frames_iter).save(path, "GIF", save_all=True, append_images=frames_iter, duration=40, loop=0)
+
+
+def run_method(method, path, target, max_dimensions, result_queue):
+    from PIL import Image, ImageSequence
+
+    from bot.animation import encode_animation
+    from bot.encoding import fit_within, get_save_options
+
+    rss_before = peak_rss_mb()
+    start = now()
+    img = Image.open(path)
+    size = fit_within(img.size, max_dimensions)
+    options = get_save_options(target, "balanced")
+
+    if method == "naive":
+        frames, durations = [], []
+        for frame in ImageSequence.Iterator(img):
+            durations.append(frame.info.get("duration", 0))
+            frame = frame.convert("RGBA")
+            frames.append(frame if frame.size == size else frame.resize(size, Image.LANCZOS))
+        output = io.BytesIO()
+        if target == "gif":
+            options = {}
+        frames[0].save(output, format=target.upper(), save_all=True, append_images=frames[1:],
+                       duration=durations, loop=0, **options)
+        data = output.getvalue()
+        stats = {"frames": len(frames), "frames_written": Image.open(io.BytesIO(data)).n_frames}
+    else:
+        data, stats = encode_animation(img, target, size, options)
+
+    elapsed = now() - start
+    result_queue.put({
+        "seconds": elapsed,
+        "rss_growth_mb": peak_rss_mb() - rss_before,
+        "peak_rss_mb": peak_rss_mb(),
+        "output_kb": len(data) / 1024,
+        "frames": stats["frames"],
+        "frames_written": stats["frames_written"],
+    })
+
+
+def measure(method, path, target, max_dimensions):
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(target=run_method, args=(method, path, target, max_dimensions, result_queue))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, nargs="+", default=[300, 1000])
+    parser.add_argument("--size", default="480x270", help="Größe der Test-GIFs")
+    parser.add_argument("--max", default="4000x4000", help="Maximale Zielgröße (wie MAX_DIMENSIONS)")
+    parser.add_argument("--targets", nargs="+", default=["gif", "webp"], choices=["gif", "webp", "png"])
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    max_dimensions = tuple(int(v) for v in args.max.split("x"))
+    rows = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for frames in args.frames:
+            path = os.path.join(temp_dir, f"{frames}.gif")
+            make_gif(frames, width, height, path)
+            source_kb = os.path.getsize(path) / 1024
+            for target in args.targets:
+                for method in ("naive", "stream"):
+                    result = measure(method, path, target, max_dimensions)
+                    rows.append(dict(result, source=f"{frames} Frames ({source_kb:.0f} KB)", target=target, method=method))
+
+    print_table(rows, ["source", "target", "method", "frames", "frames_written", "seconds",
+                       "rss_growth_mb", "peak_rss_mb", "output_kb"])
+    write_json(args.json, {"size": args.size, "max_dimensions": max_dimensions, "results": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Durchsatz im geteilten Betrieb: Gateway legt /convert-Jobs im Broker ab,
+1, 2, 4, ... Worker-Prozesse (bot/worker.py) holen sie ab, konvertieren und
+liefern über den Interaction-Webhook aus.
+
+Der Benchmark-Prozess spielt Gateway, CDN und Discord-API: Er legt die Jobs in
+einem SQLite-Broker ab und misst die Zeit, bis jeder Job sein Followup gesendet
+hat. Jeder Worker läuft mit einer Anfrage und einem Konvertierungs-Prozess
+gleichzeitig, damit die Zahl der Worker die Parallelität bestimmt.
+
+Szenarien:
+  - "cpu": große PNGs nach WebP, der Durchsatz hängt an den CPU-Kernen
+  - "io":  kleine JPEGs von einem CDN mit ``--cdn-latency`` Verzögerung; zeigt,
+           ob Broker und Verteilung mit der Zahl der Worker mitwachsen
+
+    python benchmarks/bench_broker.py --workers 1 2 4 --jobs 40 --json broker.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import signal
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+from _common import ROOT_DIR, encode_image, make_test_image, now, print_table, write_json
+from _fixtures import FakeUser, FakeWebhookAPI, LocalCDN
+
+from bot.broker import SQLiteBroker, make_job
+
+# Startet bot.worker mit auf die Fake-API umgeleitetem discord.py (argv[1] = API-Basis-URL)
+WORKER_SCRIPT = (
+    "import sys, discord.http; discord.http.Route.BASE = sys.argv[1]; del sys.argv[1]; "
+    "from bot.worker import main; main()"
+)
+READY_MARKER = "👷 Worker"
+
+SCENARIOS = {
+    "cpu": {"size": (1600, 1200), "source": "PNG", "target": "webp"},
+    "io": {"size": (320, 240), "source": "JPEG", "target": "png"},
+}
+
+# Jeder Job mit anderem Inhalt, sonst träfe er den Cache
+_seeds = itertools.count(1)
+
+
+def start_workers(count: int, broker_url: str, api_url: str, scenario: str) -> List[Tuple[subprocess.Popen, str]]:
+    """Startet die Worker; liefert (Prozess, Ausgabedatei)."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT_DIR, env.get("PYTHONPATH")]))
+    env.update({"MAX_CONCURRENT_CONVERSIONS": "1", "METRICS_PORT": "0"})
+    workers = []
+    for index in range(count):
+        # Eigenes Arbeitsverzeichnis je Worker: getrennte Logs und Festplatten-Caches
+        workdir = os.path.abspath(f"{scenario}-{count}-w{index}")
+        os.makedirs(workdir, exist_ok=True)
+        output = os.path.join(workdir, "worker.out")
+        with open(output, "w") as out:
+            proc = subprocess.Popen(
+                [sys.executable, "-c", WORKER_SCRIPT, api_url, "--broker", broker_url, "--concurrency", "1"],
+                cwd=workdir, env=env, stdout=out, stderr=subprocess.STDOUT
+            )
+        workers.append((proc, output))
+    return workers
+
+
+async def wait_ready(workers: List[Tuple[subprocess.Popen, str]], timeout: float = 60.0) -> None:
+    """Wartet auf die Startmeldung jedes Workers."""
+    deadline = time.monotonic() + timeout
+    pending = list(workers)
+    while pending:
+        for proc, output in list(pending):
+            if proc.poll() is not None:
+                raise RuntimeError(f"Worker {proc.pid} beendet mit Code {proc.returncode}, siehe {output}")
+            with open(output, encoding="utf-8") as f:
+                if READY_MARKER in f.read():
+                    pending.remove((proc, output))
+        if time.monotonic() > deadline:
+            raise RuntimeError("Worker nicht rechtzeitig bereit")
+        await asyncio.sleep(0.1)
+
+
+def stop_workers(workers: List[Tuple[subprocess.Popen, str]]) -> None:
+    for proc, _ in workers:
+        if proc.poll() is None:
+            proc.send_signal(signal.SIGTERM)
+    for proc, _ in workers:
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def wait_delivered(api: FakeWebhookAPI, tokens: List[str], timeout: float) -> float:
+    """Wartet, bis alle Tokens ein Followup bekommen haben; Zeit des letzten."""
+    deadline = time.monotonic() + timeout
+    while not all(token in api.delivered for token in tokens):
+        api.changed.clear()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            missing = sum(token not in api.delivered for token in tokens)
+            raise RuntimeError(f"{missing} von {len(tokens)} Jobs nicht ausgeliefert")
+        try:
+            await asyncio.wait_for(api.changed.wait(), remaining)
+        except asyncio.TimeoutError:
+            pass
+    return max(api.delivered[token] for token in tokens)
+
+
+async def put_jobs(broker: SQLiteBroker, cdn: LocalCDN, scenario: str, count: int, prefix: str) -> List[str]:
+    spec = SCENARIOS[scenario]
+    ext = spec["source"].lower().replace("jpeg", "jpg")
+    tokens = []
+    for i in range(count):
+        data = encode_image(make_test_image(*spec["size"], seed=next(_seeds)), spec["source"])
+        path = cdn.add(f"image{i}.{ext}", data)
+        token = f"{prefix}-{i}"
+        interaction = SimpleNamespace(application_id=1, token=token, user=FakeUser(1000 + i), guild_id=i % 7)
+        attachment = SimpleNamespace(url=cdn.url(path), filename=f"image{i}.{ext}", size=len(data))
+        await broker.put(make_job(interaction, [attachment], spec["target"]))
+        tokens.append(token)
+    return tokens
+
+
+async def run_scenario(scenario: str, worker_count: int, jobs: int, cdn: LocalCDN, api: FakeWebhookAPI) -> Dict:
+    db_path = os.path.abspath(f"jobs-{scenario}-{worker_count}.db")
+    broker = SQLiteBroker(db_path)
+    workers = start_workers(worker_count, f"sqlite://{db_path}", api.base_url, scenario)
+    try:
+        await wait_ready(workers)
+        # Ein Job pro Worker vorab: Prozess-Pools und Verbindungen sind danach warm
+        warm_up = await put_jobs(broker, cdn, scenario, worker_count, f"warm-{scenario}-{worker_count}")
+        await wait_delivered(api, warm_up, timeout=120)
+
+        start = now()
+        tokens = await put_jobs(broker, cdn, scenario, jobs, f"{scenario}-{worker_count}")
+        finished = await wait_delivered(api, tokens, timeout=600)
+    finally:
+        stop_workers(workers)
+        await broker.close()
+
+    seconds = finished - start
+    return {"scenario": scenario, "workers": worker_count, "jobs": jobs,
+            "seconds": seconds, "jobs_per_s": jobs / seconds}
+
+
+async def run(args) -> List[Dict]:
+    cdn = LocalCDN(latency=args.cdn_latency)
+    api = FakeWebhookAPI()
+    await cdn.start()
+    await api.start()
+    rows = []
+    try:
+        for scenario in args.scenarios:
+            # Im CPU-Szenario gibt es keine CDN-Verzögerung
+            cdn.latency = args.cdn_latency if scenario == "io" else 0.0
+            baseline = None
+            for worker_count in args.workers:
+                row = await run_scenario(scenario, worker_count, args.jobs, cdn, api)
+                baseline = baseline or row["jobs_per_s"] / worker_count
+                row["speedup"] = row["jobs_per_s"] / baseline
+                row["efficiency"] = row["speedup"] / worker_count
+                rows.append(row)
+                print(f"  {scenario}: {worker_count} Worker, {row['jobs_per_s']:.2f} Jobs/s")
+    finally:
+        await api.stop()
+        await cdn.stop()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--jobs", type=int, default=40, help="Jobs pro Messung")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=["cpu", "io"])
+    parser.add_argument("--cdn-latency", type=float, default=0.25, help="Verzögerung des CDN im io-Szenario (s)")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    print(f"CPU-Kerne: {os.cpu_count()}")
+    rows = asyncio.run(run(args))
+    print_table(rows, ["scenario", "workers", "jobs", "seconds", "jobs_per_s", "speedup", "efficiency"])
+    print("speedup = Durchsatz relativ zu einem Worker; efficiency = speedup / Worker")
+    write_json(args.json, {"cpu_count": os.cpu_count(), "cdn_latency": args.cdn_latency, "rows": rows})
+
+
+if __name__ == "__main__":
+    main()
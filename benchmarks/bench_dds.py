@@ -0,0 +1,92 @@
+"""
+DDS-Ausgabe: eigener NumPy-Encoder (bot/dds.py) gegen den bisherigen Weg über
+ImageMagick (``convert`` mit dds:compression=dxt5).
+
+Gemessen werden Laufzeit, Ausgabegröße und PSNR der obersten Mipmap-Stufe
+gegenüber dem Quellbild (dekodiert mit Pillows DDS-Reader). Fehlt ImageMagick,
+wird nur der eigene Encoder gemessen.
+
+    python benchmarks/bench_dds.py --sizes 512 1024 2048 --json dds.json
+"""
+
+import argparse
+import asyncio
+import io
+import math
+import shutil
+
+from _common import encode_image, make_test_image, now, print_table, write_json
+
+import bot.converter as converter
+from bot.dds import encode_dds
+
+
+def psnr(reference, data):
+    import numpy as np
+    from PIL import Image
+
+    decoded = Image.open(io.BytesIO(data)).convert("RGBA")
+    ref = np.asarray(reference.convert("RGBA"), dtype=np.float32)
+    mse = np.mean((ref - np.asarray(decoded, dtype=np.float32)) ** 2)
+    return float("inf") if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+
+def measure_native(img, compression, mipmaps, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = now()
+        data = encode_dds(img, compression, mipmaps=mipmaps)
+        best = min(best, now() - start)
+    return best, data
+
+
+async def measure_imagemagick(png_data, repeat):
+    best = float("inf")
+    data = None
+    for _ in range(repeat):
+        start = now()
+        data = await converter.convert_with_imagemagick(png_data, "png", "dds")
+        best = min(best, now() - start)
+        if data is None:
+            return None, None
+    return best, data
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[512, 1024, 2048])
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen (bester Lauf zählt)")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    has_imagemagick = shutil.which(converter.IMAGEMAGICK_PATH) is not None
+    if not has_imagemagick:
+        print(f"ImageMagick ({converter.IMAGEMAGICK_PATH}) nicht gefunden - nur der eigene Encoder wird gemessen\n")
+
+    rows = []
+    for size in args.sizes:
+        img = make_test_image(size, size, "RGBA")
+
+        for compression in ("dxt1", "dxt5"):
+            for mipmaps in (False, True):
+                seconds, data = measure_native(img, compression, mipmaps, args.repeat)
+                rows.append({
+                    "size": size, "encoder": "numpy", "compression": compression, "mipmaps": mipmaps,
+                    "ms": seconds * 1000, "kb": len(data) / 1024,
+                    "psnr_db": psnr(img if compression == "dxt5" else img.convert("RGB"), data),
+                })
+
+        if has_imagemagick:
+            seconds, data = await measure_imagemagick(encode_image(img, "png"), args.repeat)
+            if data is not None:
+                rows.append({
+                    "size": size, "encoder": "imagemagick", "compression": "dxt5", "mipmaps": True,
+                    "ms": seconds * 1000, "kb": len(data) / 1024, "psnr_db": psnr(img, data),
+                })
+
+    print_table(rows, ["size", "encoder", "compression", "mipmaps", "ms", "kb", "psnr_db"])
+    write_json(args.json, {"imagemagick": has_imagemagick, "results": rows})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Zeit/Größe-Abwägung der Encoder-Profile (fast / balanced / max) pro Zielformat.
+
+Gemessen wird nur das Kodieren (Image.save mit get_save_options), einmal für ein
+foto-ähnliches Bild und einmal für einen Screenshot mit großen Flächen. Die
+Spalte "bytes_vs_max" zeigt, wie viel größer die Ausgabe als beim Profil "max" ist.
+
+    python benchmarks/bench_encoder_profiles.py --size 2000 --json profiles.json
+"""
+
+import argparse
+import statistics
+
+from _common import encode_image, make_test_image, now, print_table, write_json
+
+from bot.encoding import ENCODER_PROFILES, get_save_options
+
+
+def make_screenshot(width, height):
+    """Flächige UI-ähnliche Grafik mit Text-artigen Kanten und wenigen Farben."""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (width, height), (245, 246, 250))
+    draw = ImageDraw.Draw(img)
+    for top in range(0, height, 120):
+        draw.rectangle([40, top + 20, width - 40, top + 100], fill=(255, 255, 255), outline=(200, 204, 214))
+        for left in range(60, width - 200, 160):
+            draw.text((left, top + 50), "ImageX 1234", fill=(40, 44, 52))
+    return img
+
+
+def measure(img, target_format, profile, repeat):
+    options = get_save_options(target_format, profile)
+    fmt = "JPEG" if target_format == "jpg" else target_format
+    times = []
+    for _ in range(repeat):
+        start = now()
+        data = encode_image(img, fmt, **options)
+        times.append(now() - start)
+    return statistics.median(times), len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2000, help="Kantenlänge der Testbilder in Pixeln")
+    parser.add_argument("--formats", nargs="+", default=["png", "webp", "jpg"])
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen pro Messung (Median)")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    images = {
+        "photo": make_test_image(args.size, args.size),
+        "screenshot": make_screenshot(args.size, args.size),
+    }
+
+    rows = []
+    for image_name, img in images.items():
+        for target_format in args.formats:
+            results = {profile: measure(img, target_format, profile, args.repeat) for profile in ENCODER_PROFILES}
+            max_seconds, max_bytes = results["max"]
+            for profile, (seconds, size) in results.items():
+                rows.append({
+                    "image": image_name,
+                    "format": target_format,
+                    "profile": profile,
+                    "encode_ms": seconds * 1000,
+                    "speedup": max_seconds / seconds,
+                    "kb": size / 1024,
+                    "bytes_vs_max": f"{(size / max_bytes - 1) * 100:+.1f}%",
+                })
+
+    print(f"{args.size}x{args.size}, Median aus {args.repeat} Läufen\n")
+    print_table(rows, ["image", "format", "profile", "encode_ms", "speedup", "kb", "bytes_vs_max"])
+    write_json(args.json, {"size": args.size, "results": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Vergleicht die Bildverarbeitung direkt im Event-Loop (bisheriger Weg) mit der
+ConversionEngine (Prozess-Pool).
+
+Gemessen werden Gesamtdurchsatz und die Blockierung des Event-Loops, die sich
+1:1 auf Gateway-Heartbeat und Slash-Command-Antworten auswirkt.
+
+    python benchmarks/bench_engine.py --jobs 8 --size 2000 --json engine.json
+"""
+
+import argparse
+import asyncio
+import os
+
+from _common import LoopLagMonitor, encode_image, make_test_image, now, print_table, write_json
+
+from bot.render import render_image
+from bot.engine import ConversionEngine
+
+
+async def run_inline(payloads, target_format):
+    """Bisheriger Weg: PIL läuft direkt im Coroutine-Kontext."""
+    monitor = LoopLagMonitor()
+    monitor.start()
+    start = now()
+
+    async def job(data):
+        await asyncio.sleep(0)
+        return render_image(data, target_format)
+
+    await asyncio.gather(*(job(data) for data in payloads))
+    elapsed = now() - start
+    await monitor.stop()
+    return elapsed, monitor.summary()
+
+
+async def run_engine(payloads, target_format, workers):
+    """Neuer Weg: PIL läuft in Worker-Prozessen."""
+    engine = ConversionEngine(max_workers=workers)
+    engine.start()
+    # Worker vorwärmen, damit der Prozessstart nicht mitgemessen wird
+    await asyncio.gather(*(engine.run(render_image, payloads[0], target_format) for _ in range(workers)))
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    start = now()
+    await asyncio.gather(*(engine.run(render_image, data, target_format) for data in payloads))
+    elapsed = now() - start
+    await monitor.stop()
+    engine.shutdown()
+    return elapsed, monitor.summary()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=8, help="Anzahl der Konvertierungen pro Lauf")
+    parser.add_argument("--size", type=int, default=2000, help="Kantenlänge des Testbildes in Pixeln")
+    parser.add_argument("--target", default="png", help="Zielformat")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    source = encode_image(make_test_image(args.size, args.size), "jpeg", quality=90)
+    payloads = [source] * args.jobs
+
+    rows = []
+    elapsed, lag = await run_inline(payloads, args.target)
+    rows.append({"mode": "inline", "workers": 0, "seconds": elapsed,
+                 "jobs_per_s": args.jobs / elapsed, **lag})
+
+    workers = 1
+    while workers <= args.max_workers:
+        elapsed, lag = await run_engine(payloads, args.target, workers)
+        rows.append({"mode": "engine", "workers": workers, "seconds": elapsed,
+                     "jobs_per_s": args.jobs / elapsed, **lag})
+        workers *= 2
+
+    print(f"{args.jobs} Jobs, JPEG {args.size}x{args.size} -> {args.target.upper()}, {os.cpu_count()} Kerne\n")
+    print_table(rows, ["mode", "workers", "seconds", "jobs_per_s", "max_lag_ms", "p99_lag_ms"])
+    write_json(args.json, {"jobs": args.jobs, "size": args.size, "target": args.target, "results": rows})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
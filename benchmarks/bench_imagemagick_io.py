@@ -0,0 +1,125 @@
+"""
+Latenz des ImageMagick-Pfads (z.B. DDS -> PNG): bisher mit Zwischendateien in
+TEMP_DIR gegen den neuen Weg über stdin/stdout bzw. memfd.
+
+Ist ImageMagick nicht installiert (oder wird ``--tool passthrough`` angegeben),
+wird ein Shell-Skript verwendet, das die Eingabe unverändert zurückgibt. Dann
+wird ausschließlich der Transport gemessen, also genau der Teil, den die
+Änderung betrifft.
+
+    python benchmarks/bench_imagemagick_io.py --size 2048 --runs 50 --json magick.json
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import stat
+import tempfile
+
+from _common import make_test_image, now, percentile, print_table, write_json
+
+import bot.converter as converter
+from bot.dds import encode_dds
+
+PASSTHROUGH_SCRIPT = """#!/bin/sh
+# Gibt die Eingabe unverändert aus ("coder:-" = stdin/stdout, sonst Datei).
+# dd statt cat/cp, damit die Daten wie bei ImageMagick durch den Userspace gehen.
+# Optionen überspringen: "-limit <art> <wert>", sonst "-option <wert>"
+while [ $# -gt 1 ]; do
+    case "$1" in
+        -limit) shift 3 ;;
+        -*) shift 2 ;;
+        *) break ;;
+    esac
+done
+input="$1"
+for output; do :; done
+case "$input" in
+    *:-) source=/dev/stdin ;;
+    *) source="${input#*:}" ;;
+esac
+case "$output" in
+    *:-) target=/dev/stdout ;;
+    *) target="${output#*:}" ;;
+esac
+exec dd if="$source" of="$target" bs=1M iflag=fullblock status=none
+"""
+
+
+async def legacy_convert(image_data, source_format, target_format):
+    """Bisheriger Weg: Eingabe in eine Datei schreiben, Ausgabe aus einer Datei lesen."""
+    with tempfile.TemporaryDirectory(dir=converter.TEMP_DIR) as temp_dir:
+        input_path = os.path.join(temp_dir, f"input.{source_format}")
+        output_path = os.path.join(temp_dir, f"output.{target_format}")
+        with open(input_path, "wb") as f:
+            f.write(image_data)
+
+        cmd = converter.build_imagemagick_command(input_path, target_format)
+        cmd[-1] = output_path
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        await process.communicate()
+        if process.returncode != 0:
+            return None
+
+        result = io.BytesIO()
+        with open(output_path, "rb") as f:
+            result.write(f.read())
+        return result.getvalue()
+
+
+async def measure(func, payload, source_format, target_format, runs):
+    # Ein Aufwärmlauf (Page-Cache, Prozessstart)
+    await func(payload, source_format, target_format)
+    times = []
+    for _ in range(runs):
+        start = now()
+        output = await func(payload, source_format, target_format)
+        times.append(now() - start)
+        if output is None:
+            raise RuntimeError(f"{func.__name__} lieferte keine Ausgabe")
+    return times
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2048, help="Kantenlänge der DDS-Testtextur in Pixeln")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--target", default="png", help="Zielformat")
+    parser.add_argument("--tool", help="Pfad zu convert/magick oder 'passthrough' (Standard: IMAGEMAGICK_PATH)")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    tool = args.tool or converter.IMAGEMAGICK_PATH
+    if tool == "passthrough" or not shutil.which(tool):
+        tool = os.path.abspath("magick-passthrough.sh")
+        with open(tool, "w") as f:
+            f.write(PASSTHROUGH_SCRIPT)
+        os.chmod(tool, os.stat(tool).st_mode | stat.S_IEXEC)
+        print("ImageMagick nicht gefunden - gemessen wird nur der Transport (Passthrough-Skript)\n")
+    converter.IMAGEMAGICK_PATH = tool
+    os.makedirs(converter.TEMP_DIR, exist_ok=True)
+
+    payload = encode_dds(make_test_image(args.size, args.size, "RGBA"), "dxt5", mipmaps=False)
+
+    rows = []
+    for name, func in (("tempfiles", legacy_convert), ("pipes", converter.convert_with_imagemagick)):
+        times = await measure(func, payload, "dds", args.target, args.runs)
+        rows.append({
+            "method": name,
+            "p50_ms": percentile(times, 50) * 1000,
+            "p95_ms": percentile(times, 95) * 1000,
+            "mean_ms": sum(times) / len(times) * 1000,
+        })
+
+    print(f"DDS {args.size}x{args.size} ({len(payload) / 1024 / 1024:.1f} MB) -> {args.target.upper()}, "
+          f"{args.runs} Läufe, Werkzeug: {tool}\n")
+    print_table(rows, ["method", "p50_ms", "p95_ms", "mean_ms"])
+    write_json(args.json, {"size": args.size, "tool": tool, "payload_bytes": len(payload), "results": rows})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
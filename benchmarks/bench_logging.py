@@ -0,0 +1,126 @@
+"""
+Event-Loop-Blockade durch Logging: synchrone RotatingFileHandler (bisher) gegen
+NonBlockingQueueHandler mit Schreib-Thread (bot/logger.py).
+
+Simuliert werden Jobs, die wie convert_image/ImageQueue mehrere INFO-Zeilen
+schreiben, während ein Ticker misst, wie lange der Event-Loop blockiert. Mit
+--slow-ms wird ein langsames Ziel (Netzlaufwerk, volle Pipe zur Konsole)
+nachgebildet, indem jeder Schreibvorgang zusätzlich so lange dauert.
+
+    python benchmarks/bench_logging.py --jobs 2000 --lines 8 --slow-ms 0.2 --json logging.json
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import queue
+import time
+from logging.handlers import RotatingFileHandler
+
+from _common import LoopLagMonitor, now, print_table, write_json
+
+from bot.logger import NonBlockingQueueHandler, RoutingQueueListener, file_formatter
+
+
+class SlowFileHandler(RotatingFileHandler):
+    """Datei-Handler, dessen Schreibvorgänge künstlich verlangsamt sind."""
+
+    def __init__(self, *args, delay_s: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delay_s = delay_s
+
+    def emit(self, record):
+        super().emit(record)
+        self.flush()
+        if self.delay_s:
+            time.sleep(self.delay_s)
+
+
+def make_file_handler(path, delay_s):
+    handler = SlowFileHandler(path, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8", delay_s=delay_s)
+    handler.setFormatter(file_formatter)
+    return handler
+
+
+async def simulate(logger, jobs, lines, concurrency):
+    """Jobs mit je ``lines`` Log-Zeilen und etwas await dazwischen."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def job(index):
+        async with semaphore:
+            for line in range(lines):
+                logger.info(f"🔄 Processing task task_{index}: Schritt {line} von {lines}")
+                await asyncio.sleep(0)
+
+    monitor = LoopLagMonitor(interval=0.001)
+    monitor.start()
+    start = now()
+    await asyncio.gather(*(job(i) for i in range(jobs)))
+    elapsed = now() - start
+    await monitor.stop()
+    return elapsed, monitor.summary()
+
+
+def run_variant(name, args, delay_s, log_dir):
+    logger = logging.getLogger(f"bench.{name}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    path = os.path.join(log_dir, f"{name}.log")
+    file_handler = make_file_handler(path, delay_s)
+
+    listener = None
+    handler = file_handler
+    if name == "queue":
+        log_queue = queue.Queue(maxsize=args.queue_size)
+        listener = RoutingQueueListener(log_queue)
+        listener.add_route(logger.name, [file_handler])
+        listener.start()
+        handler = NonBlockingQueueHandler(log_queue)
+    logger.addHandler(handler)
+
+    elapsed, lag = asyncio.run(simulate(logger, args.jobs, args.lines, args.concurrency))
+
+    flush_start = now()
+    if listener is not None:
+        listener.stop()
+    file_handler.close()
+    flush_time = now() - flush_start
+    logger.removeHandler(handler)
+
+    with open(path, encoding="utf-8") as f:
+        written = sum(1 for _ in f)
+
+    return {
+        "handler": name,
+        "loop_time_ms": elapsed * 1000,
+        "max_lag_ms": lag["max_lag_ms"],
+        "p99_lag_ms": lag["p99_lag_ms"],
+        "flush_ms": flush_time * 1000,
+        "written": written,
+        "dropped": getattr(handler, "dropped", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=8, help="Log-Zeilen pro Job")
+    parser.add_argument("--concurrency", type=int, default=4, help="Gleichzeitige Jobs (wie max_concurrent_tasks)")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="Zusätzliche Dauer pro Schreibvorgang in ms")
+    parser.add_argument("--queue-size", type=int, default=10000, help="Größe der Log-Warteschlange")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    log_dir = os.path.abspath("bench-logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    rows = [run_variant(name, args, args.slow_ms / 1000, log_dir) for name in ("sync", "queue")]
+
+    print(f"{args.jobs} Jobs x {args.lines} Zeilen, {args.slow_ms} ms extra pro Schreibvorgang\n")
+    print_table(rows, ["handler", "loop_time_ms", "max_lag_ms", "p99_lag_ms", "flush_ms", "written", "dropped"])
+    write_json(args.json, {"params": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    main()
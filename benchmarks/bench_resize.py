@@ -0,0 +1,123 @@
+"""
+Vergleicht das Verkleinern großer Fotos: bisher (volles Dekodieren + LANCZOS)
+gegen resize_if_needed (JPEG-draft + reducing_gap).
+
+Jede Messung läuft in einem frischen Prozess, damit der Spitzen-RSS nicht
+von vorherigen Läufen verfälscht wird. Die Qualität wird als PSNR des neuen
+Ergebnisses gegenüber dem bisherigen angegeben (höher = ähnlicher, >40 dB ist
+mit bloßem Auge nicht unterscheidbar).
+
+    python benchmarks/bench_resize.py --sizes 6000x4000 8000x6000 --json resize.json
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import tempfile
+
+from _common import now, peak_rss_mb, print_table, write_json
+
+
+def make_photo(width, height, path):
+    """Erzeugt ein großes, foto-ähnliches JPEG ohne riesige Zwischen-Arrays."""
+    from PIL import Image, ImageChops
+
+    from _common import make_test_image
+
+    base = make_test_image(max(width // 4, 1), max(height // 4, 1))
+    img = base.resize((width, height), Image.BICUBIC)
+    noise = Image.effect_noise((width, height), 10).convert("RGB")
+    img = ImageChops.add(img, noise, scale=1.0, offset=-32)
+    img.save(path, "JPEG", quality=92)
+
+
+def run_method(method, path, max_dimensions, result_queue):
+    from PIL import Image
+
+    from bot.render import resize_if_needed
+
+    rss_before = peak_rss_mb()
+    start = now()
+    img = Image.open(path)
+
+    if method == "old":
+        width, height = img.size
+        scale = min(max_dimensions[0] / width, max_dimensions[1] / height)
+        img = img.resize((int(width * scale), int(height * scale)), Image.LANCZOS)
+    else:
+        img = resize_if_needed(img, max_dimensions)
+        img.load()
+
+    elapsed = now() - start
+    result_queue.put({
+        "seconds": elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": peak_rss_mb() - rss_before,
+        "size": img.size,
+        "pixels": img.convert("RGB").tobytes(),
+    })
+
+
+def measure(method, path, max_dimensions):
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(target=run_method, args=(method, path, max_dimensions, result_queue))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+
+def psnr(reference, candidate, size):
+    import numpy as np
+    from PIL import Image
+
+    ref = np.frombuffer(reference["pixels"], dtype=np.uint8).reshape(reference["size"][1], reference["size"][0], 3)
+    if candidate["size"] != reference["size"]:
+        img = Image.frombytes("RGB", candidate["size"], candidate["pixels"]).resize(reference["size"], Image.LANCZOS)
+        cand = np.asarray(img)
+    else:
+        cand = np.frombuffer(candidate["pixels"], dtype=np.uint8).reshape(ref.shape)
+
+    mse = np.mean((ref.astype(np.float32) - cand.astype(np.float32)) ** 2)
+    return float("inf") if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["6000x4000", "8000x6000", "12000x8000"])
+    parser.add_argument("--max", default="4000x4000", help="Maximale Zielgröße (wie MAX_DIMENSIONS)")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    max_dimensions = tuple(int(v) for v in args.max.split("x"))
+    rows = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in args.sizes:
+            width, height = (int(v) for v in size.split("x"))
+            path = os.path.join(temp_dir, f"{size}.jpg")
+            make_photo(width, height, path)
+
+            old = measure("old", path, max_dimensions)
+            new = measure("new", path, max_dimensions)
+            quality = psnr(old, new, max_dimensions)
+
+            for name, result in (("old", old), ("new", new)):
+                rows.append({
+                    "source": size,
+                    "method": name,
+                    "output": "x".join(str(v) for v in result["size"]),
+                    "seconds": result["seconds"],
+                    "rss_growth_mb": result["rss_growth_mb"],
+                    "peak_rss_mb": result["peak_rss_mb"],
+                    "psnr_db": quality if name == "new" else "ref",
+                })
+
+    print_table(rows, ["source", "method", "output", "seconds", "rss_growth_mb", "peak_rss_mb", "psnr_db"])
+    write_json(args.json, {"max_dimensions": max_dimensions, "results": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Simulation der Warteschlange unter gemischter Last: FIFO (bisher) gegen den
+FairScheduler. Läuft mit virtueller Zeit, braucht also weder Discord noch echte
+Konvertierungen und ist reproduzierbar (fester Seed).
+
+Lastmodell:
+  - "heavy": wenige Nutzer, die alle paar Sekunden /convert mit 4 großen
+    Dateien in mehreren Gilden aufrufen
+  - "light": viele Nutzer mit je einem kleinen JPEG
+
+Danach wird die Rechenzeit einer Auswahl (get) gemessen, wenn viele Nutzer
+einer Gilde je einen Job mit hohen Kosten eingereiht haben. Sie läuft synchron
+in der Event-Loop und darf nicht mit Nutzern und Kosten quadratisch wachsen.
+
+    python benchmarks/bench_scheduler.py --duration 600 --json scheduler.json
+"""
+
+import argparse
+import heapq
+import random
+import time
+from collections import deque
+
+from _common import percentile, print_table, write_json
+
+from bot.scheduler import FairScheduler
+
+# Geschätzte Kosten wie in bot/task_queue.py: ~1 Einheit pro MB
+MB = 1024 * 1024
+
+
+class FifoQueue:
+    """Bisheriges Verhalten: eine einzige FIFO-Schlange ohne Nutzer-Limit."""
+
+    def __init__(self):
+        self.items = deque()
+
+    def put_nowait(self, item):
+        self.items.append(item)
+
+    def get_nowait(self):
+        if not self.items:
+            raise IndexError
+        return self.items.popleft()
+
+    def task_done(self, item):
+        pass
+
+
+def job_keys(job):
+    return job["guild"], job["user"], 1 + job["size"] / MB
+
+
+def generate_jobs(duration, seed, heavy_users, heavy_interval, light_rate):
+    rng = random.Random(seed)
+    jobs = []
+
+    for user in range(heavy_users):
+        t = rng.uniform(0, heavy_interval)
+        while t < duration:
+            guild = rng.randrange(3)
+            for _ in range(4):
+                size = rng.uniform(5, 8) * MB
+                jobs.append({"arrival": t, "user": f"heavy{user}", "guild": guild, "class": "heavy",
+                             "size": size, "service": 0.4 + size / MB * 0.5})
+            t += rng.expovariate(1 / heavy_interval)
+
+    t = 0.0
+    while True:
+        t += rng.expovariate(light_rate)
+        if t >= duration:
+            break
+        size = rng.uniform(0.05, 0.5) * MB
+        jobs.append({"arrival": t, "user": f"light{rng.randrange(200)}", "guild": rng.randrange(20),
+                     "class": "light", "size": size, "service": 0.1 + size / MB * 0.5})
+
+    jobs.sort(key=lambda job: job["arrival"])
+    return jobs
+
+
+def simulate(queue, jobs, workers):
+    """Ereignisgesteuerte Simulation; gibt die Wartezeiten pro Nutzerklasse zurück."""
+    events = [(job["arrival"], i, "arrival", job) for i, job in enumerate(jobs)]
+    heapq.heapify(events)
+    sequence = len(events)
+    free = workers
+    waits = {"heavy": [], "light": []}
+
+    def dispatch(now):
+        nonlocal free, sequence
+        while free > 0:
+            try:
+                job = queue.get_nowait()
+            except Exception:
+                return
+            free -= 1
+            waits[job["class"]].append(now - job["arrival"])
+            sequence += 1
+            heapq.heappush(events, (now + job["service"], sequence, "finish", job))
+
+    while events:
+        now, _, kind, job = heapq.heappop(events)
+        if kind == "arrival":
+            queue.put_nowait(job)
+        else:
+            queue.task_done(job)
+            free += 1
+        dispatch(now)
+
+    return waits
+
+
+def measure_select(users, size):
+    """Rechenzeit von get_nowait, wenn ``users`` Nutzer einer Gilde je einen Job der Größe ``size`` warten."""
+    queue = FairScheduler(job_keys, max_active_per_user=1)
+    for user in range(users):
+        queue.put_nowait({"guild": 0, "user": user, "size": size})
+
+    durations = []
+    while not queue.empty():
+        start = time.perf_counter()
+        job = queue.get_nowait()
+        durations.append((time.perf_counter() - start) * 1000)
+        queue.task_done(job)
+    return {
+        "users": users,
+        "cost": job_keys(job)[2],
+        "first_get_ms": durations[0],
+        "p50_get_ms": percentile(durations, 50),
+        "max_get_ms": max(durations),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=600, help="Simulierte Sekunden")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--heavy-users", type=int, default=3)
+    parser.add_argument("--heavy-interval", type=float, default=20, help="Mittlerer Abstand der heavy-Aufrufe")
+    parser.add_argument("--light-rate", type=float, default=1.0, help="light-Jobs pro Sekunde")
+    parser.add_argument("--per-user", type=int, default=2, help="max_active_per_user des FairScheduler")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--select-users", type=int, nargs="+", default=[100, 500, 2000],
+                        help="Nutzer einer Gilde für die Messung der Auswahl")
+    parser.add_argument("--select-size-mb", type=float, default=26, help="Dateigröße pro Job (Kosten = 1 + MB)")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    jobs = generate_jobs(args.duration, args.seed, args.heavy_users, args.heavy_interval, args.light_rate)
+    policies = {
+        "fifo": FifoQueue(),
+        "fair": FairScheduler(job_keys, max_active_per_user=args.per_user),
+    }
+
+    rows = []
+    for name, queue in policies.items():
+        waits = simulate(queue, [dict(job) for job in jobs], args.workers)
+        for job_class, values in waits.items():
+            rows.append({
+                "policy": name,
+                "class": job_class,
+                "jobs": len(values),
+                "p50_wait_s": percentile(values, 50),
+                "p99_wait_s": percentile(values, 99),
+                "max_wait_s": max(values, default=0.0),
+            })
+
+    print(f"{len(jobs)} Jobs in {args.duration:.0f}s, {args.workers} Worker\n")
+    print_table(rows, ["policy", "class", "jobs", "p50_wait_s", "p99_wait_s", "max_wait_s"])
+
+    select_rows = [measure_select(users, args.select_size_mb * MB) for users in args.select_users]
+    print("\nAuswahl bei vielen Nutzern einer Gilde (ein Job pro Nutzer):")
+    print_table(select_rows, ["users", "cost", "first_get_ms", "p50_get_ms", "max_get_ms"])
+    write_json(args.json, {"params": vars(args), "results": rows, "select": select_rows})
+
+
+if __name__ == "__main__":
+    main()
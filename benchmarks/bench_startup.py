@@ -0,0 +1,156 @@
+"""
+Startzeit des Bots: Importzeit von bot.main (``python -X importtime``) und die
+Initialisierung vor der Gateway-Verbindung (init_converter in setup_hook).
+
+Jede Messung läuft in einem frischen Interpreter. Ausgegeben werden der Median
+der gesamten Importzeit, die Importzeit pro Paket und ob Module geladen wurden,
+die erst in den Worker-Prozessen bzw. beim ersten Gebrauch nötig sind (NumPy,
+Pillow, piexif, ...). Das Skript endet mit Exit-Code 1, wenn der Median das
+Budget (``--budget-ms``, 0 = keine Prüfung) überschreitet oder eines dieser
+Module beim Start geladen wird.
+
+    python benchmarks/bench_startup.py --runs 9 --budget-ms 550 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from _common import ROOT_DIR, print_table, write_json
+
+# Budget für den Median von "import bot.main" (davon entfallen gut 250 ms auf
+# discord.py und aiohttp, die der Bot für die Gateway-Verbindung ohnehin braucht)
+STARTUP_BUDGET_MS = 550
+
+# Module, die der Bot-Prozess beim Start nicht laden soll
+DEFERRED_MODULES = ("numpy", "PIL", "piexif", "psutil", "aiohttp.web", "bot.render", "bot.animation")
+
+# Misst Import und init_converter in einem Prozess; Ausgabe als JSON-Zeile
+INIT_SCRIPT = """
+import asyncio, json, time
+start = time.perf_counter()
+import bot.main
+imported = time.perf_counter()
+import bot.converter as converter
+
+async def run():
+    await converter.init_converter()
+    initialized = time.perf_counter()
+    await converter.warm_up_task
+    ready = time.perf_counter()
+    await converter.shutdown_converter()
+    return initialized, ready
+
+initialized, ready = asyncio.run(run())
+print(json.dumps({"import_ms": (imported - start) * 1000, "init_ms": (initialized - imported) * 1000,
+                  "setup_ms": (initialized - start) * 1000, "workers_ready_ms": (ready - start) * 1000}))
+"""
+
+
+def child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT_DIR, env.get("PYTHONPATH")]))
+    env.setdefault("DISCORD_TOKEN", "benchmark")
+    # Der Metrik-Endpunkt startet ohnehin im Hintergrund; keinen Port belegen
+    env["METRICS_PORT"] = "0"
+    return env
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """Zeilen von ``-X importtime`` als (Modul, Tiefe, eigene µs, kumulierte µs)."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure_import(module: str) -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=child_env(), capture_output=True, text=True, check=True
+    )
+    entries = parse_importtime(result.stderr)
+    packages: Dict[str, int] = defaultdict(int)
+    for name, _, self_us, _ in entries:
+        packages[name.split(".")[0]] += self_us
+    loaded = {name for name, _, _, _ in entries}
+    return {
+        "total_ms": next(cumulative for name, depth, _, cumulative in reversed(entries) if depth == 0 and name == module) / 1000,
+        "packages": {name: us / 1000 for name, us in packages.items()},
+        "deferred_loaded": sorted(name for name in DEFERRED_MODULES if name in loaded),
+    }
+
+
+def measure_init() -> Dict:
+    result = subprocess.run([sys.executable, "-c", INIT_SCRIPT], env=child_env(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--module", default="bot.main", help="Zu importierendes Modul")
+    parser.add_argument("--top", type=int, default=8, help="Anzahl der angezeigten Pakete")
+    parser.add_argument("--no-init", action="store_true", help="init_converter nicht messen")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="Budget für den Median der Importzeit, 0 = keine Prüfung")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    imports = [measure_import(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(run["total_ms"] for run in imports)
+
+    packages = defaultdict(list)
+    for run in imports:
+        for name, ms in run["packages"].items():
+            packages[name].append(ms)
+    package_rows = sorted(
+        ({"package": name, "median_ms": statistics.median(values + [0.0] * (args.runs - len(values)))}
+         for name, values in packages.items()),
+        key=lambda row: row["median_ms"], reverse=True
+    )[:args.top]
+    deferred_loaded = sorted({name for run in imports for name in run["deferred_loaded"]})
+
+    print(f"import {args.module}: Median {total_ms:.1f} ms "
+          f"(min {min(run['total_ms'] for run in imports):.1f}, max {max(run['total_ms'] for run in imports):.1f}, "
+          f"{args.runs} Läufe)")
+    print_table(package_rows, ["package", "median_ms"])
+    print(f"Beim Start geladen, obwohl erst später nötig: {', '.join(deferred_loaded) or '-'}")
+
+    init_rows = []
+    if not args.no_init:
+        init_rows = [measure_init() for _ in range(max(1, args.runs // 2))]
+        summary = {key: statistics.median(row[key] for row in init_rows) for key in init_rows[0]}
+        print()
+        print_table([summary], ["import_ms", "init_ms", "setup_ms", "workers_ready_ms"])
+        print("setup_ms = Import + init_converter (danach verbindet sich der Bot mit dem Gateway);")
+        print("workers_ready_ms = Worker-Prozesse haben die Bildpipeline geladen (im Hintergrund)")
+
+    write_json(args.json, {"module": args.module, "runs": args.runs, "import_total_ms": total_ms,
+                           "imports": imports, "packages": package_rows,
+                           "deferred_loaded": deferred_loaded, "init": init_rows})
+
+    if args.budget_ms > 0:
+        failures = []
+        if total_ms > args.budget_ms:
+            failures.append(f"Importzeit {total_ms:.1f} ms über dem Budget von {args.budget_ms:.0f} ms")
+        if deferred_loaded:
+            failures.append(f"beim Start geladen: {', '.join(deferred_loaded)}")
+        if failures:
+            print("❌ " + "; ".join(failures))
+            sys.exit(1)
+        print(f"✅ Innerhalb des Budgets ({args.budget_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Reproduzierbare End-to-End-Benchmark-Suite für bot/converter.py und bot/task_queue.py.
+
+Erzeugt einen synthetischen Korpus (alle Quellformate aus ALLOWED_FORMATS, die
+Pillow bzw. bot/dds.py schreiben können, in mehreren Größen), liefert ihn über
+einen lokalen aiohttp-Server als Ersatz für das Discord-CDN aus und misst zwei Wege:
+
+  direct  convert_image() nacheinander, Caches vor jedem Lauf geleert
+  queue   ImageQueue mit Fake-Interactions: alle Jobs eines Paares auf einmal
+          eingereiht (mehrere Nutzer), Latenz = Einreihen bis Datei gesendet
+
+Pro (Quelle, Größe, Ziel) werden Durchsatz, p50/p95/p99-Latenz, Spitzen-RSS
+(Bot-Prozess plus Worker-Prozesse) und Ausgabegröße berichtet. Mit --json werden
+die Ergebnisse samt Umgebung gespeichert, mit --compare gegen einen früheren
+Lauf verglichen. --trace schreibt für jeden Job die Stufen (Download, Dekodieren,
+Skalieren, Kodieren, Upload, ...) als Chrome-Trace (.json) oder JSON Lines (.jsonl).
+
+    python benchmarks/bench_suite.py --sizes small medium --runs 5 --json suite.json
+    python benchmarks/bench_suite.py --sizes small medium --runs 5 --compare suite.json
+    python benchmarks/bench_suite.py --sizes medium --runs 3 --trace trace.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+from collections import deque
+
+from _common import (
+    ORIGINAL_CWD, ROOT_DIR, encode_image, make_test_image, now, peak_rss_mb,
+    percentile, print_table, reset_peak_rss, write_json
+)
+from _fixtures import FakeAttachment, FakeInteraction, LocalCDN
+
+# Festplatten-Cache würde wiederholte Läufe verfälschen
+os.environ.setdefault("DISK_CACHE_MAX_MB", "0")
+
+import numpy as np  # noqa: E402
+import PIL  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import bot.converter as converter  # noqa: E402
+from bot.config import ALLOWED_FORMATS, MAX_IMAGE_SIZE_MB  # noqa: E402
+from bot.dds import encode_dds  # noqa: E402
+from bot.task_queue import ImageQueue  # noqa: E402
+from bot.tracing import export_chrome, export_jsonl, recorder  # noqa: E402
+
+SIZES = {
+    "small": (640, 480),
+    "medium": (1920, 1080),
+    "large": (4000, 3000),
+}
+
+# Quellformat -> Funktion, die ein RGBA-Testbild in dieses Format kodiert
+SOURCE_WRITERS = {
+    "jpg": lambda img: encode_image(img.convert("RGB"), "jpeg", quality=90),
+    "png": lambda img: encode_image(img, "png"),
+    "gif": lambda img: encode_image(img.convert("RGB").convert("P", palette=Image.ADAPTIVE), "gif"),
+    "webp": lambda img: encode_image(img, "webp", quality=85),
+    "bmp": lambda img: encode_image(img.convert("RGB"), "bmp"),
+    "tiff": lambda img: encode_image(img, "tiff", compression="tiff_lzw"),
+    "tga": lambda img: encode_image(img, "tga", compression="tga_rle"),
+    "pcx": lambda img: encode_image(img.convert("RGB"), "pcx"),
+    "ico": lambda img: encode_image(img, "ico", sizes=[(min(img.width, 256), min(img.height, 256))]),
+    "jp2": lambda img: encode_image(img.convert("RGB"), "jpeg2000", quality_mode="rates", quality_layers=[20]),
+    "dds": lambda img: encode_dds(img, "dxt5", mipmaps=False),
+}
+
+DEFAULT_SOURCES = ["jpg", "png", "gif", "webp", "bmp", "tiff", "tga", "dds"]
+DEFAULT_TARGETS = ["png", "jpg", "webp"]
+
+MB = 1024 * 1024
+
+
+def build_corpus(sources, sizes):
+    """Erzeugt (Quelle, Größe) -> Bytes; zu große Dateien werden übersprungen."""
+    corpus = {}
+    skipped = []
+    limit = MAX_IMAGE_SIZE_MB * MB
+
+    for size_name in sizes:
+        width, height = SIZES[size_name]
+        img = make_test_image(width, height, "RGBA", seed=1)
+        for source in sources:
+            data = SOURCE_WRITERS[source](img)
+            if len(data) > limit:
+                skipped.append(f"{source}/{size_name} ({len(data) / MB:.1f} MB > {MAX_IMAGE_SIZE_MB} MB)")
+                continue
+            corpus[(source, size_name)] = data
+
+    return corpus, skipped
+
+
+def salted(data, index):
+    """Hängt eindeutige Bytes an, damit Cache und Single-Flight nicht greifen."""
+    return data + b"\0bench" + index.to_bytes(4, "little")
+
+
+def reset_caches():
+    converter.image_cache.clear()
+    converter.source_index.clear()
+
+
+def process_pids():
+    return ["self"] + converter.conversion_engine.worker_pids()
+
+
+def reset_rss():
+    for pid in process_pids():
+        reset_peak_rss(pid)
+
+
+def total_peak_rss():
+    """Summe der Spitzen-RSS von Bot- und Worker-Prozessen (obere Schranke)."""
+    return sum(peak_rss_mb(pid) for pid in process_pids())
+
+
+def summarize(mode, source, size_name, target, data, latencies, outputs, elapsed):
+    ok = [size for size in outputs if size]
+    return {
+        "mode": mode,
+        "source": source,
+        "size": size_name,
+        "target": target,
+        "jobs": len(latencies),
+        "ok": len(ok),
+        "jobs_per_s": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_rss_mb": total_peak_rss(),
+        "in_kb": len(data) / 1024,
+        "out_kb": sum(ok) / len(ok) / 1024 if ok else 0.0,
+    }
+
+
+async def run_direct(cdn, source, size_name, target, data, runs):
+    path = cdn.add(f"bench.{source}", data)
+    latencies, outputs = [], []
+
+    reset_rss()
+    start = now()
+    for _ in range(runs):
+        reset_caches()
+        job_start = now()
+        trace_token = recorder.start("direct", source=source, target=target, size=size_name)
+        result = await converter.convert_image(cdn.url(path), target)
+        recorder.finish(trace_token)
+        latencies.append(now() - job_start)
+        outputs.append(len(result.getvalue()) if result else 0)
+    elapsed = now() - start
+
+    return summarize("direct", source, size_name, target, data, latencies, outputs, elapsed)
+
+
+async def run_queue(cdn, source, size_name, target, data, runs, users):
+    queue = ImageQueue()
+    queue.max_retries = 0
+    interactions = []
+
+    reset_caches()
+    reset_rss()
+    start = now()
+    for index in range(runs):
+        job_data = salted(data, index)
+        path = cdn.add(f"bench{index}.{source}", job_data)
+        attachment = FakeAttachment(cdn.url(path), f"bench{index}.{source}", len(job_data))
+        interaction = FakeInteraction(user_id=index % users)
+        interactions.append(interaction)
+        await queue.add(interaction, attachment, target)
+
+    results = await asyncio.gather(*(interaction.done for interaction in interactions))
+    elapsed = now() - start
+
+    for worker in queue.workers:
+        worker.cancel()
+    await asyncio.gather(*queue.workers, return_exceptions=True)
+
+    latencies = [
+        interaction.followup.messages[-1]["time"] - interaction.created
+        for interaction in interactions
+    ]
+    outputs = [size if success else 0 for success, size in results]
+    return summarize("queue", source, size_name, target, data, latencies, outputs, elapsed)
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "pillow": PIL.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(previous_path, rows):
+    """Vergleicht p50 und Durchsatz mit einem früheren Lauf."""
+    with open(os.path.join(ORIGINAL_CWD, previous_path), encoding="utf-8") as f:
+        previous = {
+            (row["mode"], row["source"], row["size"], row["target"]): row
+            for row in json.load(f)["results"]
+        }
+
+    table = []
+    for row in rows:
+        old = previous.get((row["mode"], row["source"], row["size"], row["target"]))
+        if old is None or not old["ok"] or not old["p50_ms"]:
+            continue
+        table.append({
+            "mode": row["mode"], "source": row["source"], "size": row["size"], "target": row["target"],
+            "p50_old_ms": old["p50_ms"], "p50_new_ms": row["p50_ms"],
+            "p50_delta": f"{(row['p50_ms'] / old['p50_ms'] - 1) * 100:+.1f}%",
+            "jobs_per_s_delta": f"{(row['jobs_per_s'] / old['jobs_per_s'] - 1) * 100:+.1f}%" if old["jobs_per_s"] else "",
+        })
+
+    print(f"\nVergleich mit {previous_path}:\n")
+    print_table(table, ["mode", "source", "size", "target", "p50_old_ms", "p50_new_ms", "p50_delta", "jobs_per_s_delta"])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", nargs="+", default=DEFAULT_SOURCES, choices=sorted(SOURCE_WRITERS))
+    parser.add_argument("--targets", nargs="+", default=DEFAULT_TARGETS)
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(SIZES))
+    parser.add_argument("--modes", nargs="+", default=["direct", "queue"], choices=["direct", "queue"])
+    parser.add_argument("--runs", type=int, default=5, help="Jobs pro (Quelle, Größe, Ziel) und Modus")
+    parser.add_argument("--users", type=int, default=4, help="Anzahl simulierter Nutzer im queue-Modus")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    parser.add_argument("--compare", help="Früheren JSON-Lauf zum Vergleich laden")
+    parser.add_argument("--trace", help="Alle Jobs tracen und als Chrome-Trace (.json) bzw. JSON Lines (.jsonl) speichern")
+    args = parser.parse_args()
+
+    unknown = [fmt for fmt in args.sources + args.targets if fmt not in ALLOWED_FORMATS]
+    if unknown:
+        parser.error(f"Nicht in ALLOWED_FORMATS: {', '.join(unknown)}")
+
+    corpus, skipped = build_corpus(args.sources, args.sizes)
+
+    # Ohne --trace bleibt das Sampling aus; Traces nur im Speicher sammeln
+    recorder.path = None
+    recorder.sample_rate = 1.0 if args.trace else 0.0
+    recorder.recent = deque()
+
+    cdn = LocalCDN()
+    await cdn.start()
+    await converter.init_converter()
+
+    rows = []
+    try:
+        for (source, size_name), data in corpus.items():
+            for target in args.targets:
+                if target == source:
+                    continue
+                if "direct" in args.modes:
+                    rows.append(await run_direct(cdn, source, size_name, target, data, args.runs))
+                if "queue" in args.modes:
+                    rows.append(await run_queue(cdn, source, size_name, target, data, args.runs, args.users))
+    finally:
+        await converter.shutdown_converter()
+        await cdn.stop()
+
+    print(f"\n{len(corpus)} Quelldateien, {args.runs} Jobs pro Paar, {os.cpu_count()} Kerne\n")
+    print_table(rows, ["mode", "source", "size", "target", "jobs", "ok", "jobs_per_s",
+                       "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb", "in_kb", "out_kb"])
+    if skipped:
+        print(f"\nÜbersprungen (zu groß): {', '.join(skipped)}")
+
+    write_json(args.json, {"environment": environment(), "params": vars(args),
+                           "skipped": skipped, "results": rows})
+    if args.compare:
+        compare(args.compare, rows)
+    if args.trace:
+        trace_path = os.path.join(ORIGINAL_CWD, args.trace)
+        (export_jsonl if trace_path.endswith(".jsonl") else export_chrome)(recorder.recent, trace_path)
+        print(f"{len(recorder.recent)} Traces gespeichert: {trace_path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,12 +8,25 @@ Konfiguration, Bildkonvertierung, Task-Queuing und Logging.
 __version__ = "1.0.0"
 __author__ = "Your Name"
 
-# Grundlegende Importe
+import importlib
+
+# Grundlegende Importe (ohne Seiteneffekte, der Logger wird erst mit init_logging eingerichtet)
 from .config import ALLOWED_FORMATS, MAX_FILES_PER_REQUEST
-from .task_queue import ImageQueue
-from .converter import convert_image, check_imagemagick
 from .logger import logger
 
+# Queue und Konverter erst beim ersten Zugriff laden (PEP 562), damit z.B.
+# "import bot.animation" nicht discord.py und aiohttp mitzieht
+_LAZY_EXPORTS = {
+    "ImageQueue": "task_queue",
+    "convert_image": "converter",
+    "check_imagemagick": "converter",
+}
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return getattr(importlib.import_module(f".{_LAZY_EXPORTS[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Versionsinformationen und Bot-Identität
 BOT_NAME = "ImageX"
 BOT_DESCRIPTION = "Ein Discord-Bot zur Bildkonvertierung zwischen verschiedenen Formaten"
@@ -28,6 +41,8 @@ BOT_IDENTITY = {
 # Setup-Funktion zum einfachen Initialisieren des Bots
 def setup_bot():
     from .config import TOKEN
+    from .logger import init_logging
+    init_logging()
     if not TOKEN:
         logger.critical("❌ DISCORD_TOKEN nicht gefunden!")
         return None
@@ -0,0 +1,447 @@
+import io
+import math
+import struct
+import zlib
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+# Zielformate, die Animationen behalten (PNG wird zu APNG)
+ANIMATED_TARGETS = {"gif", "webp", "png"}
+
+# Gemeinsame GIF-Palette: 255 Farben plus ein reservierter Index für Transparenz
+# bzw. "Pixel unverändert" in Delta-Frames
+TRANSPARENT_INDEX = 255
+# Frames, aus denen die gemeinsame Palette gebildet wird (gleichmäßig verteilt)
+PALETTE_SAMPLE_FRAMES = 8
+# Kantenlänge der Frame-Vorschauen für die Palettenbildung (NEAREST, damit nur
+# tatsächlich vorkommende Farben in die Palette eingehen)
+PALETTE_SAMPLE_SIZE = 256
+# Pixel mit weniger Deckkraft werden im GIF transparent
+ALPHA_THRESHOLD = 128
+
+# Größenlimit: höchstens so viele vollständige Kodierungen der Animation
+MAX_ANIMATION_ENCODES = 3
+# Zielgröße mit Sicherheitsabstand zum Limit (wie FIT_TARGET_RATIO)
+ANIMATION_TARGET_RATIO = 0.92
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def is_animated(img: Image.Image) -> bool:
+    """True, wenn das Bild mehr als einen Frame hat."""
+    return getattr(img, "is_animated", False) and getattr(img, "n_frames", 1) > 1
+
+
+def iter_frames(img: Image.Image, size: Tuple[int, int]) -> Iterator[Tuple[np.ndarray, int]]:
+    """
+    Dekodiert die Frames nacheinander und liefert sie als RGBA-Arrays in ``size``.
+
+    Pillow setzt die Frames (Disposal, Blending) selbst zusammen; im Speicher
+    liegt immer nur der aktuelle Frame.
+
+    Yields:
+        Tuple[np.ndarray, int]: (RGBA-Pixel mit Form (Höhe, Breite, 4), Dauer in ms)
+    """
+    for index in range(img.n_frames):
+        img.seek(index)
+        frame = img.convert("RGBA")
+        if frame.size != size:
+            frame = frame.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        yield np.asarray(frame), int(round(img.info.get("duration", 0) or 0))
+
+
+def changed_box(mask: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """Begrenzungsrechteck (links, oben, rechts, unten) der True-Pixel, None wenn keine."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if not rows.size:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def build_palette(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """
+    Gemeinsame Palette (255 Farben) aus Vorschauen von bis zu PALETTE_SAMPLE_FRAMES
+    Frames. Es werden nur deckende Pixel berücksichtigt; danach steht das Bild
+    wieder auf Frame 0.
+    """
+    count = img.n_frames
+    samples = min(PALETTE_SAMPLE_FRAMES, count)
+    indices = sorted({round(i * (count - 1) / max(samples - 1, 1)) for i in range(samples)})
+    scale = min(1.0, PALETTE_SAMPLE_SIZE / max(size))
+    thumb_size = (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+
+    pixels = []
+    for index in indices:
+        img.seek(index)
+        thumb = np.asarray(img.convert("RGBA").resize(thumb_size, Image.NEAREST)).reshape(-1, 4)
+        pixels.append(thumb[thumb[:, 3] >= ALPHA_THRESHOLD, :3])
+    img.seek(0)
+
+    opaque = np.concatenate(pixels)
+    if not opaque.size:
+        opaque = np.zeros((1, 3), dtype=np.uint8)
+    sample = Image.fromarray(np.ascontiguousarray(opaque).reshape(-1, 1, 3), "RGB")
+    # Die Palette darf nicht mehr als 255 Einträge haben, sonst könnte die
+    # Quantisierung den Transparenz-Index vergeben
+    return sample.quantize(TRANSPARENT_INDEX, method=Image.Quantize.MEDIANCUT)
+
+
+def quantize_frame(frame: np.ndarray, palette: Image.Image) -> np.ndarray:
+    """
+    RGBA-Frame -> Palettenindizes der gemeinsamen Palette. Ohne Dithering, damit
+    unveränderte Bereiche in jedem Frame dieselben Indizes bekommen.
+    """
+    rgb = Image.fromarray(frame, "RGBA").convert("RGB")
+    indices = np.array(rgb.quantize(palette=palette, dither=Image.Dither.NONE))
+    indices[frame[:, :, 3] < ALPHA_THRESHOLD] = TRANSPARENT_INDEX
+    return indices
+
+
+def blend_unchanged(region: np.ndarray, previous: Optional[np.ndarray],
+                    box: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+    """
+    Deckender Frame über deckender Anzeige: unveränderte Pixel im Rechteck werden
+    transparent, der Frame wird dann überblendet statt ersetzt. Der Encoder
+    findet dort fast nichts mehr zu kodieren.
+
+    Returns:
+        Optional[np.ndarray]: Geänderte Kopie oder None, wenn ersetzt werden muss
+    """
+    if previous is None or region[:, :, 3].min() < 255:
+        return None
+    left, top, right, bottom = box
+    before = previous[top:bottom, left:right]
+    if before[:, :, 3].min() < 255:
+        return None
+    unchanged = (region == before).all(axis=2)
+    if not unchanged.any():
+        return None
+    blended = region.copy()
+    blended[unchanged] = 0
+    return blended
+
+
+class AnimationWriter:
+    """
+    Schreibt eine Animation Frame für Frame.
+
+    Ein Frame wird erst geschrieben, wenn der nächste bekannt ist: identische
+    Folge-Frames verlängern nur die Dauer, und das GIF braucht den nächsten
+    Frame für die Wahl der Disposal-Methode. Im Speicher liegen daher der zuletzt
+    geschriebene, der zurückgehaltene und der neue Frame.
+    """
+
+    def __init__(self, size: Tuple[int, int], loop: Optional[int] = None):
+        self.size = size
+        # Anzahl Wiederholungen wie in der Quelle (0 = endlos), None = einmal abspielen
+        self.loop = loop
+        self.output = io.BytesIO()
+        self.frames_in = 0
+        self.frames_out = 0
+        self._pending: Optional[np.ndarray] = None
+        self._pending_duration = 0
+
+    def add(self, frame: np.ndarray, duration: int) -> None:
+        self.frames_in += 1
+        if self._pending is not None:
+            if np.array_equal(frame, self._pending):
+                self._pending_duration += duration
+                return
+            self._flush(frame)
+        self._pending, self._pending_duration = frame, duration
+
+    def close(self) -> bytes:
+        if self._pending is not None:
+            self._flush(None)
+            self._pending = None
+        self.finish()
+        return self.output.getvalue()
+
+    def _flush(self, next_frame: Optional[np.ndarray]) -> None:
+        self.write_frame(self._pending, self._pending_duration, next_frame)
+        self.frames_out += 1
+
+    def write_frame(self, frame: np.ndarray, duration: int, next_frame: Optional[np.ndarray]) -> None:
+        raise NotImplementedError
+
+    def finish(self) -> None:
+        raise NotImplementedError
+
+
+class GifWriter(AnimationWriter):
+    """
+    GIF mit gemeinsamer globaler Palette. Jeder Frame enthält nur das Rechteck,
+    das sich gegenüber der Anzeige geändert hat; unveränderte Pixel darin werden
+    transparent, damit LZW lange Läufe findet.
+
+    Disposal 1 (stehen lassen) ist der Normalfall. Wird ein Pixel im nächsten
+    Frame transparent, muss der aktuelle Frame mit Disposal 2 (Hintergrund)
+    abgeräumt werden - dafür der Blick auf den nächsten Frame.
+    """
+
+    def __init__(self, size: Tuple[int, int], palette: Image.Image, loop: Optional[int] = None):
+        super().__init__(size, loop)
+        colors = palette.getpalette()[:TRANSPARENT_INDEX * 3]
+        colors += [0] * (256 * 3 - len(colors))
+        screen = Image.new("P", size, TRANSPARENT_INDEX)
+        screen.putpalette(colors)
+        info = {"transparency": TRANSPARENT_INDEX}
+        if loop is not None:
+            info["loop"] = loop
+        header, _ = GifImagePlugin.getheader(screen, info=info)
+        for chunk in header:
+            self.output.write(chunk)
+        # Anzeige vor dem nächsten Frame (nach Disposal des vorherigen)
+        self.canvas = np.full((size[1], size[0]), TRANSPARENT_INDEX, dtype=np.uint8)
+        # GIF kennt nur Hundertstelsekunden: Rundungsfehler werden weitergetragen
+        self._elapsed_ms = 0
+        self._written_cs = 0
+
+    def write_frame(self, frame: np.ndarray, duration: int, next_frame: Optional[np.ndarray]) -> None:
+        changed = frame != self.canvas
+        disposal = 1
+        if next_frame is not None:
+            cleared = (next_frame == TRANSPARENT_INDEX) & (frame != TRANSPARENT_INDEX)
+            if cleared.any():
+                disposal = 2
+                changed |= cleared
+        left, top, right, bottom = changed_box(changed) or (0, 0, 1, 1)
+
+        region = frame[top:bottom, left:right].copy()
+        region[region == self.canvas[top:bottom, left:right]] = TRANSPARENT_INDEX
+
+        self._elapsed_ms += duration
+        centiseconds = round(self._elapsed_ms / 10) - self._written_cs
+        self._written_cs += centiseconds
+
+        chunks = GifImagePlugin.getdata(
+            Image.fromarray(region, "P"), offset=(left, top),
+            duration=centiseconds * 10, disposal=disposal, transparency=TRANSPARENT_INDEX
+        )
+        for chunk in chunks:
+            self.output.write(chunk)
+
+        self.canvas = frame
+        if disposal == 2:
+            self.canvas = frame.copy()
+            self.canvas[top:bottom, left:right] = TRANSPARENT_INDEX
+
+    def finish(self) -> None:
+        self.output.write(b";")
+
+
+class WebPWriter(AnimationWriter):
+    """
+    Animiertes WebP (RIFF mit ANIM/ANMF). Jeder Frame wird als eigenes WebP-Bild
+    des geänderten Rechtecks kodiert und ohne Blending über die Anzeige gelegt
+    (Ausnahme: siehe blend_unchanged).
+    """
+
+    def __init__(self, size: Tuple[int, int], save_options: Dict[str, Any], loop: Optional[int] = None):
+        super().__init__(size, loop)
+        self.save_options = save_options
+        self.has_alpha = False
+        self.canvas: Optional[np.ndarray] = None
+        width, height = size
+        self.output.write(b"RIFF\0\0\0\0WEBP")
+        self._vp8x_offset = self.output.tell() + 8
+        _write_riff_chunk(self.output, b"VP8X", b"\0\0\0\0" + _uint24(width - 1) + _uint24(height - 1))
+        # Hintergrund transparent (BGRA), Schleifen
+        _write_riff_chunk(self.output, b"ANIM", b"\0\0\0\0" + struct.pack("<H", _plays(loop)))
+
+    def write_frame(self, frame: np.ndarray, duration: int, next_frame: Optional[np.ndarray]) -> None:
+        if self.canvas is None:
+            box = (0, 0, self.size[0], self.size[1])
+        else:
+            box = changed_box((frame != self.canvas).any(axis=2)) or (0, 0, 1, 1)
+        # ANMF speichert den Versatz in halben Pixeln
+        left, top, right, bottom = box[0] & ~1, box[1] & ~1, box[2], box[3]
+        previous, self.canvas = self.canvas, frame
+
+        region = frame[top:bottom, left:right]
+        blended = blend_unchanged(region, previous, (left, top, right, bottom))
+        flags = 0x02  # kein Blending, kein Disposal
+        if blended is not None:
+            image = Image.fromarray(blended, "RGBA")
+            flags = 0x00
+        elif region[:, :, 3].min() == 255:
+            image = Image.fromarray(region, "RGBA").convert("RGB")
+        else:
+            image = Image.fromarray(region, "RGBA")
+            self.has_alpha = True
+        still = io.BytesIO()
+        image.save(still, format="WEBP", **self.save_options)
+
+        payload = (_uint24(left // 2) + _uint24(top // 2) + _uint24(right - left - 1) + _uint24(bottom - top - 1)
+                   + _uint24(min(duration, 0xFFFFFF)) + bytes([flags]))
+        payload += b"".join(_iter_riff_chunks(still.getvalue(), {b"ALPH", b"VP8 ", b"VP8L"}))
+        _write_riff_chunk(self.output, b"ANMF", payload)
+
+    def finish(self) -> None:
+        # Flags: Animation, ggf. Alpha; dann die RIFF-Größe
+        size = self.output.tell()
+        self.output.seek(self._vp8x_offset)
+        self.output.write(bytes([0x02 | (0x10 if self.has_alpha else 0)]))
+        self.output.seek(4)
+        self.output.write(struct.pack("<I", size - 8))
+        self.output.seek(size)
+
+
+class ApngWriter(AnimationWriter):
+    """
+    APNG (RGBA). Jeder Frame wird als PNG des geänderten Rechtecks kodiert; dessen
+    IDAT-Daten werden als fdAT übernommen. Blend "source" ersetzt das Rechteck
+    samt Alpha, deshalb ist kein Disposal nötig (Ausnahme: siehe blend_unchanged).
+    """
+
+    def __init__(self, size: Tuple[int, int], save_options: Dict[str, Any], loop: Optional[int] = None):
+        super().__init__(size, loop)
+        self.save_options = save_options
+        self.canvas: Optional[np.ndarray] = None
+        self.sequence = 0
+        self.output.write(PNG_SIGNATURE)
+        _write_png_chunk(self.output, b"IHDR", struct.pack(">IIBBBBB", size[0], size[1], 8, 6, 0, 0, 0))
+        # Frameanzahl steht erst am Ende fest und wird dann eingetragen
+        self._actl_offset = self.output.tell()
+        _write_png_chunk(self.output, b"acTL", struct.pack(">II", 0, _plays(loop)))
+
+    def write_frame(self, frame: np.ndarray, duration: int, next_frame: Optional[np.ndarray]) -> None:
+        first = self.canvas is None
+        if first:
+            box = (0, 0, self.size[0], self.size[1])
+        else:
+            box = changed_box((frame != self.canvas).any(axis=2)) or (0, 0, 1, 1)
+        left, top, right, bottom = box
+        previous, self.canvas = self.canvas, frame
+
+        region = frame[top:bottom, left:right]
+        blended = blend_unchanged(region, previous, box)
+        # blend_op 1 (über die Anzeige legen) nur für Frames mit transparenten unveränderten Pixeln
+        _write_png_chunk(self.output, b"fcTL", struct.pack(
+            ">IIIIIHHBB", self._next_sequence(), right - left, bottom - top, left, top,
+            min(duration, 0xFFFF), 1000, 0, 0 if blended is None else 1
+        ))
+
+        still = io.BytesIO()
+        Image.fromarray(region if blended is None else blended, "RGBA").save(still, format="PNG", **self.save_options)
+        for data in _iter_png_chunks(still.getvalue(), b"IDAT"):
+            if first:
+                _write_png_chunk(self.output, b"IDAT", data)
+            else:
+                _write_png_chunk(self.output, b"fdAT", struct.pack(">I", self._next_sequence()) + data)
+
+    def _next_sequence(self) -> int:
+        self.sequence += 1
+        return self.sequence - 1
+
+    def finish(self) -> None:
+        _write_png_chunk(self.output, b"IEND", b"")
+        size = self.output.tell()
+        self.output.seek(self._actl_offset)
+        _write_png_chunk(self.output, b"acTL", struct.pack(">II", self.frames_out, _plays(self.loop)))
+        self.output.seek(size)
+
+
+def encode_animation(img: Image.Image, target_format: str, size: Tuple[int, int],
+                     save_options: Dict[str, Any]) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Konvertiert eine Animation Frame für Frame (Dekodieren, Skalieren, bei GIF
+    Quantisieren, Duplikate verwerfen, auf das geänderte Rechteck zuschneiden,
+    Kodieren). Der Speicherbedarf hängt von der Framegröße ab, nicht von der
+    Anzahl der Frames.
+
+    Args:
+        img: Geöffnete, animierte Quelle (noch nicht geladen)
+        target_format: "gif", "webp" oder "png" (APNG)
+        size: Ausgabegröße
+        save_options: Optionen aus get_save_options (WebP/PNG pro Frame)
+
+    Returns:
+        Tuple[bytes, Dict]: Ausgabedaten und ``frames`` (Quelle) sowie ``frames_written``
+    """
+    loop = img.info.get("loop")
+    frames = iter_frames(img, size)
+    if target_format == "gif":
+        palette = build_palette(img, size)
+        writer: AnimationWriter = GifWriter(size, palette, loop)
+        frames = ((quantize_frame(frame, palette), duration) for frame, duration in frames)
+    elif target_format == "webp":
+        writer = WebPWriter(size, save_options, loop)
+    else:
+        options = {key: value for key, value in save_options.items() if key in ("compress_level", "optimize")}
+        writer = ApngWriter(size, options, loop)
+
+    for frame, duration in frames:
+        writer.add(frame, duration)
+    data = writer.close()
+    return data, {"frames": writer.frames_in, "frames_written": writer.frames_out}
+
+
+def render_animation(img: Image.Image, target_format: str, size: Tuple[int, int],
+                     save_options: Dict[str, Any], max_bytes: Optional[int] = None) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    ``encode_animation`` mit Größenlimit: Liegt die Ausgabe darüber, wird die
+    Animation verkleinert neu kodiert (Größe ~ Fläche, mit Sicherheitsabstand),
+    höchstens MAX_ANIMATION_ENCODES-mal.
+
+    Returns:
+        Tuple[bytes, Dict]: Ausgabedaten und ``frames``, ``frames_written``,
+        ``encodes``, ``scale`` und ``fitted``
+    """
+    scale = 1.0
+    stats: Dict[str, Any] = {}
+    data = b""
+    for attempt in range(1, MAX_ANIMATION_ENCODES + 1):
+        scaled = (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+        img.seek(0)
+        data, stats = encode_animation(img, target_format, scaled, save_options)
+        stats.update(encodes=attempt, scale=round(scale, 4), fitted=scale < 1.0, quality=save_options.get("quality"))
+        if not max_bytes or len(data) <= max_bytes:
+            break
+        scale *= min(math.sqrt(max_bytes * ANIMATION_TARGET_RATIO / len(data)), 0.98)
+    return data, stats
+
+
+def _plays(loop: Optional[int]) -> int:
+    """Wiederholungen für WebP/APNG (0 = endlos); ohne Angabe wird einmal abgespielt."""
+    return 1 if loop is None else loop
+
+
+def _uint24(value: int) -> bytes:
+    return value.to_bytes(3, "little")
+
+
+def _write_riff_chunk(fp: io.BytesIO, fourcc: bytes, payload: bytes) -> None:
+    fp.write(fourcc + struct.pack("<I", len(payload)) + payload)
+    if len(payload) & 1:
+        fp.write(b"\0")
+
+
+def _iter_riff_chunks(data: bytes, wanted: set) -> Iterator[bytes]:
+    """Vollständige Chunks (mit Kopf und Padding) einer WebP-Datei, deren Typ in ``wanted`` liegt."""
+    position = 12
+    while position + 8 <= len(data):
+        fourcc = data[position:position + 4]
+        length = struct.unpack("<I", data[position + 4:position + 8])[0]
+        end = position + 8 + length + (length & 1)
+        if fourcc in wanted:
+            yield data[position:end]
+        position = end
+
+
+def _write_png_chunk(fp: io.BytesIO, chunk_type: bytes, data: bytes) -> None:
+    fp.write(struct.pack(">I", len(data)) + chunk_type + data)
+    fp.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+
+def _iter_png_chunks(data: bytes, wanted: bytes) -> Iterator[bytes]:
+    """Nutzdaten aller Chunks vom Typ ``wanted`` einer PNG-Datei."""
+    position = len(PNG_SIGNATURE)
+    while position + 8 <= len(data):
+        length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+        if chunk_type == wanted:
+            yield data[position + 8:position + 8 + length]
+        position += 12 + length
@@ -0,0 +1,499 @@
+"""
+Job-Broker zwischen Gateway und Konvertierungs-Workern.
+
+Ist BROKER_URL gesetzt, konvertiert der Gateway-Prozess nicht selbst: Er legt pro
+/convert einen serialisierten Job ab (Attachment-URLs, Zielformat, Webhook-Token
+der Interaction). Worker-Prozesse (bot/worker.py) holen Jobs ab, konvertieren und
+liefern über den Interaction-Webhook aus. Sie brauchen weder den Bot-Token noch
+eine Gateway-Verbindung, deshalb lassen sie sich beliebig auf Hosts verteilen.
+
+Zustellung mindestens einmal: Ein abgeholter Job ist für BROKER_LEASE Sekunden
+vergeben. Solange der Worker daran arbeitet, verlängert er die Vergabe
+regelmäßig. Bestätigt er ihn nicht und verlängert auch nicht mehr (z.B.
+Absturz), bekommt ihn ein anderer, insgesamt höchstens BROKER_MAX_ATTEMPTS-mal.
+"""
+
+import asyncio
+import hmac
+import ipaddress
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from bot.config import BROKER_LEASE, BROKER_LISTEN, BROKER_MAX_ATTEMPTS, BROKER_SECRET
+from bot.events import log_event
+
+# Logger direkt ohne Import-Loop nutzen
+logger = logging.getLogger("bot")
+event_logger = logging.getLogger("queue")
+
+# Interaction-Tokens gelten 15 Minuten; ältere Jobs können nicht mehr ausgeliefert werden
+INTERACTION_TOKEN_TTL = 15 * 60
+
+# Wie oft lokale Broker ohne Benachrichtigung nachsehen (Jobs anderer Prozesse,
+# abgelaufene Vergaben)
+POLL_INTERVAL = 0.2
+
+# Höchste Wartezeit einer Abholung über HTTP (Long-Polling)
+MAX_CLAIM_WAIT = 30.0
+
+
+class BrokerError(Exception):
+    """Fehler bei der Kommunikation mit dem Broker"""
+    pass
+
+
+def make_job(interaction: Any, attachments: Iterable[Any], target_format: str,
+             max_output_bytes: Optional[int] = None, skipped: Iterable[Tuple[str, str]] = ()) -> Dict[str, Any]:
+    """
+    Serialisiert eine /convert-Anfrage. Enthalten ist alles, was ein Worker zum
+    Konvertieren und Ausliefern braucht, aber keine Discord-Objekte.
+
+    Args:
+        interaction: Interaction der Anfrage (liefert Webhook-ID und -Token)
+        attachments: Zu konvertierende Dateien (url, filename, size)
+        target_format: Zielformat
+        max_output_bytes: Größenlimit pro Ausgabe, None = Upload-Limit
+        skipped: (Dateiname, Grund) bereits im Gateway übersprungener Dateien
+
+    Returns:
+        Dict: JSON-serialisierbarer Job
+    """
+    return {
+        "application_id": interaction.application_id,
+        "token": interaction.token,
+        "user_id": interaction.user.id,
+        "guild_id": interaction.guild_id,
+        "target": target_format,
+        "max_output_bytes": max_output_bytes,
+        "files": [{"url": a.url, "filename": a.filename, "size": a.size} for a in attachments],
+        "skipped": [list(entry) for entry in skipped],
+        "created": time.time(),
+    }
+
+
+class JobBroker:
+    """
+    Gemeinsame Schnittstelle aller Broker. Jobs sind JSON-serialisierbare Dicts;
+    ``claim`` liefert sie mit ``id``, ``attempts`` (Anzahl der Vergaben, kennzeichnet
+    zugleich diese Vergabe) und ``lease`` (Dauer der Vergabe in Sekunden) zurück.
+    """
+
+    async def put(self, job: Dict[str, Any]) -> str:
+        """Reiht einen Job ein und gibt seine ID zurück."""
+        raise NotImplementedError
+
+    async def claim(self, worker: str, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        """Holt den ältesten freien Job ab; wartet höchstens ``timeout`` Sekunden."""
+        raise NotImplementedError
+
+    async def ack(self, job_id: str) -> None:
+        """Der Job ist erledigt (auch wenn einzelne Dateien fehlgeschlagen sind)."""
+        raise NotImplementedError
+
+    async def release(self, job_id: str) -> None:
+        """Gibt einen abgeholten Job sofort wieder frei (erneuter Versuch)."""
+        raise NotImplementedError
+
+    async def extend(self, job_id: str, attempt: int) -> bool:
+        """
+        Verlängert die Vergabe eines Jobs, an dem noch gearbeitet wird.
+
+        Returns:
+            bool: False, wenn der Job inzwischen erneut vergeben oder erledigt ist
+        """
+        raise NotImplementedError
+
+    async def counts(self) -> Dict[str, int]:
+        """Wartende (``queued``) und gerade vergebene (``claimed``) Jobs."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalBroker(JobBroker):
+    """Broker mit eigenem Speicher; Abholungen im selben Prozess werden sofort geweckt."""
+
+    def __init__(self, lease: float = BROKER_LEASE, max_attempts: int = BROKER_MAX_ATTEMPTS):
+        self.lease = lease
+        self.max_attempts = max(1, max_attempts)
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def _notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def claim(self, worker: str, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        while True:
+            # Vor dem Nachsehen zurücksetzen, damit kein put dazwischen verloren geht
+            self._wakeup.clear()
+            job, dead = await self._claim_now(worker, time.time())
+            for job_id, attempts in dead:
+                log_event(event_logger, "broker_job_dead", "💀 Broker-Job {job_id} nach {attempts} Versuchen verworfen",
+                          logging.ERROR, job_id=job_id, attempts=attempts)
+            if job is not None:
+                return job
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), min(remaining, POLL_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim_now(self, worker: str, now: float) -> Tuple[Optional[Dict[str, Any]], List[Tuple[str, int]]]:
+        """Vergibt den ältesten freien Job; Rückgabe (Job oder None, verworfene Jobs)."""
+        raise NotImplementedError
+
+
+class MemoryBroker(LocalBroker):
+    """Broker im selben Prozess, ohne Persistenz (Tests, Benchmarks)."""
+
+    def __init__(self, lease: float = BROKER_LEASE, max_attempts: int = BROKER_MAX_ATTEMPTS):
+        super().__init__(lease, max_attempts)
+        # ID -> [Payload als JSON, Vergaben, vergeben bis]; Einfügereihenfolge = FIFO
+        self._jobs: Dict[str, list] = {}
+        self._ids = itertools.count(1)
+
+    async def put(self, job: Dict[str, Any]) -> str:
+        job_id = str(next(self._ids))
+        # Wie bei den anderen Brokern nur serialisiert ablegen
+        self._jobs[job_id] = [json.dumps(job), 0, 0.0]
+        self._notify()
+        return job_id
+
+    async def _claim_now(self, worker, now):
+        dead = []
+        for job_id, entry in list(self._jobs.items()):
+            payload, attempts, lease_until = entry
+            if lease_until >= now:
+                continue
+            if attempts >= self.max_attempts:
+                del self._jobs[job_id]
+                dead.append((job_id, attempts))
+                continue
+            entry[1], entry[2] = attempts + 1, now + self.lease
+            return dict(json.loads(payload), id=job_id, attempts=attempts + 1, lease=self.lease), dead
+        return None, dead
+
+    async def ack(self, job_id: str) -> None:
+        self._jobs.pop(job_id, None)
+
+    async def release(self, job_id: str) -> None:
+        if job_id in self._jobs:
+            self._jobs[job_id][2] = 0.0
+            self._notify()
+
+    async def extend(self, job_id: str, attempt: int) -> bool:
+        entry = self._jobs.get(job_id)
+        if entry is None or entry[1] != attempt:
+            return False
+        entry[2] = time.time() + self.lease
+        return True
+
+    async def counts(self) -> Dict[str, int]:
+        now = time.time()
+        claimed = sum(1 for _, _, lease_until in self._jobs.values() if lease_until >= now)
+        return {"queued": len(self._jobs) - claimed, "claimed": claimed}
+
+
+class SQLiteBroker(LocalBroker):
+    """
+    Broker in einer SQLite-Datei (WAL). Gateway und Worker auf demselben Host
+    öffnen dieselbe Datei; wartende Jobs überstehen /restart und Deploys.
+    Abgeholt wird in einer IMMEDIATE-Transaktion, sodass jeder Job genau einem
+    Worker zugeteilt wird. Die Datenbankzugriffe laufen in einem Thread.
+    """
+
+    def __init__(self, path: str, lease: float = BROKER_LEASE, max_attempts: int = BROKER_MAX_ATTEMPTS):
+        super().__init__(lease, max_attempts)
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL NOT NULL DEFAULT 0, worker TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (lease_until)")
+            self._conn = conn
+        return self._conn
+
+    def _locked(self, func, *args):
+        with self._lock:
+            return func(self._connect(), *args)
+
+    async def _run(self, func, *args):
+        return await asyncio.to_thread(self._locked, func, *args)
+
+    async def put(self, job: Dict[str, Any]) -> str:
+        def insert(conn, payload):
+            return conn.execute("INSERT INTO jobs (payload) VALUES (?)", (payload,)).lastrowid
+
+        job_id = await self._run(insert, json.dumps(job))
+        self._notify()
+        return str(job_id)
+
+    async def _claim_now(self, worker, now):
+        def claim(conn):
+            dead = []
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = conn.execute(
+                        "SELECT id, payload, attempts FROM jobs WHERE lease_until < ? ORDER BY id LIMIT 1", (now,)
+                    ).fetchone()
+                    if row is None:
+                        conn.execute("COMMIT")
+                        return None, dead
+                    job_id, payload, attempts = row
+                    if attempts >= self.max_attempts:
+                        conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                        dead.append((str(job_id), attempts))
+                        continue
+                    conn.execute("UPDATE jobs SET attempts = ?, lease_until = ?, worker = ? WHERE id = ?",
+                                 (attempts + 1, now + self.lease, worker, job_id))
+                    conn.execute("COMMIT")
+                    return dict(json.loads(payload), id=str(job_id), attempts=attempts + 1, lease=self.lease), dead
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        return await self._run(claim)
+
+    async def ack(self, job_id: str) -> None:
+        await self._run(lambda conn: conn.execute("DELETE FROM jobs WHERE id = ?", (int(job_id),)))
+
+    async def release(self, job_id: str) -> None:
+        await self._run(lambda conn: conn.execute("UPDATE jobs SET lease_until = 0 WHERE id = ?", (int(job_id),)))
+        self._notify()
+
+    async def extend(self, job_id: str, attempt: int) -> bool:
+        def update(conn):
+            return conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND attempts = ?",
+                                (time.time() + self.lease, int(job_id), attempt)).rowcount
+
+        return await self._run(update) > 0
+
+    async def counts(self) -> Dict[str, int]:
+        def count(conn):
+            return conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(lease_until >= ?), 0) FROM jobs", (time.time(),)
+            ).fetchone()
+
+        total, claimed = await self._run(count)
+        return {"queued": total - claimed, "claimed": claimed}
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._close)
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class HttpBroker(JobBroker):
+    """
+    Client für den Broker eines anderen Prozesses (BrokerServer), per TCP
+    (``http://host:port``) oder Unix-Socket (``unix:///pfad/zum/socket``).
+    Abholungen warten auf der Serverseite (Long-Polling).
+    """
+
+    def __init__(self, url: str, secret: str = BROKER_SECRET):
+        self.url = url
+        self.secret = secret
+        self._session: Optional[aiohttp.ClientSession] = None
+        if url.startswith("unix://"):
+            self._socket_path: Optional[str] = url[len("unix://"):]
+            self._base = "http://broker"
+        else:
+            self._socket_path = None
+            self._base = url.rstrip("/")
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.UnixConnector(path=self._socket_path) if self._socket_path else None
+            headers = {"Authorization": f"Bearer {self.secret}"} if self.secret else None
+            self._session = aiohttp.ClientSession(connector=connector, headers=headers)
+        return self._session
+
+    async def _request(self, path: str, payload: Optional[Dict[str, Any]] = None,
+                       timeout: float = 30.0) -> Optional[Dict[str, Any]]:
+        try:
+            async with self._get_session().post(self._base + path, json=payload or {},
+                                                timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status == 204:
+                    return None
+                if response.status != 200:
+                    raise BrokerError(f"HTTP {response.status} von {self.url}{path}")
+                return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise BrokerError(f"Broker {self.url} nicht erreichbar: {e}") from e
+
+    async def put(self, job: Dict[str, Any]) -> str:
+        return (await self._request("/jobs", job))["id"]
+
+    async def claim(self, worker: str, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        timeout = min(timeout, MAX_CLAIM_WAIT)
+        return await self._request("/claim", {"worker": worker, "timeout": timeout}, timeout=timeout + 10)
+
+    async def ack(self, job_id: str) -> None:
+        await self._request(f"/jobs/{job_id}/ack")
+
+    async def release(self, job_id: str) -> None:
+        await self._request(f"/jobs/{job_id}/release")
+
+    async def extend(self, job_id: str, attempt: int) -> bool:
+        return (await self._request(f"/jobs/{job_id}/extend", {"attempt": attempt}))["extended"]
+
+    async def counts(self) -> Dict[str, int]:
+        return await self._request("/status")
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class BrokerServer:
+    """
+    Stellt einen lokalen Broker per HTTP für Worker auf anderen Hosts bereit
+    (BROKER_LISTEN, z.B. ``0.0.0.0:9110`` oder ``unix:/tmp/imagex-broker.sock``).
+    Jobs enthalten Interaction-Tokens: Auf anderen Adressen als localhost startet
+    der Endpunkt nur mit BROKER_SECRET.
+    """
+
+    def __init__(self, broker: JobBroker, listen: str = BROKER_LISTEN, secret: str = BROKER_SECRET):
+        self.broker = broker
+        self.listen = listen
+        self.secret = secret
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        if not self.listen or self._runner is not None:
+            return
+
+        app = web.Application()
+        app.router.add_post("/jobs", self._put)
+        app.router.add_post("/claim", self._claim)
+        app.router.add_post("/jobs/{job_id}/ack", self._ack)
+        app.router.add_post("/jobs/{job_id}/release", self._release)
+        app.router.add_post("/jobs/{job_id}/extend", self._extend)
+        app.router.add_post("/status", self._status)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        if self.listen.startswith("unix:"):
+            site = web.UnixSite(runner, self.listen[len("unix:"):])
+        else:
+            host, _, port = self.listen.rpartition(":")
+            host = host or "127.0.0.1"
+            if not self.secret and not is_loopback(host):
+                await runner.cleanup()
+                logger.error(f"❌ Broker-Endpunkt auf {self.listen} nicht gestartet: "
+                             f"außerhalb von localhost ist BROKER_SECRET nötig")
+                return
+            site = web.TCPSite(runner, host, int(port))
+        try:
+            await site.start()
+        except OSError as e:
+            await runner.cleanup()
+            logger.warning(f"⚠️ Broker-Endpunkt konnte nicht gestartet werden: {e}")
+            return
+        self._runner = runner
+        logger.info(f"📮 Broker für Worker erreichbar unter {self.listen}")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _authorize(self, request: web.Request) -> None:
+        if not self.secret:
+            return
+        expected = f"Bearer {self.secret}".encode()
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+            raise web.HTTPUnauthorized()
+
+    async def _put(self, request: web.Request) -> web.Response:
+        self._authorize(request)
+        job_id = await self.broker.put(await request.json())
+        return web.json_response({"id": job_id})
+
+    async def _claim(self, request: web.Request) -> web.Response:
+        self._authorize(request)
+        body = await request.json()
+        timeout = min(float(body.get("timeout", 10.0)), MAX_CLAIM_WAIT)
+        job = await self.broker.claim(str(body.get("worker", request.remote)), timeout)
+        if job is None:
+            return web.Response(status=204)
+        return web.json_response(job)
+
+    async def _ack(self, request: web.Request) -> web.Response:
+        self._authorize(request)
+        await self.broker.ack(request.match_info["job_id"])
+        return web.json_response({})
+
+    async def _release(self, request: web.Request) -> web.Response:
+        self._authorize(request)
+        await self.broker.release(request.match_info["job_id"])
+        return web.json_response({})
+
+    async def _extend(self, request: web.Request) -> web.Response:
+        self._authorize(request)
+        body = await request.json()
+        extended = await self.broker.extend(request.match_info["job_id"], int(body["attempt"]))
+        return web.json_response({"extended": extended})
+
+    async def _status(self, request: web.Request) -> web.Response:
+        self._authorize(request)
+        return web.json_response(await self.broker.counts())
+
+
+def is_loopback(host: str) -> bool:
+    """Ob eine Listen-Adresse nur lokal erreichbar ist."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+
+def open_broker(url: str) -> JobBroker:
+    """
+    Erstellt den Broker zu BROKER_URL.
+
+    ``memory://`` (nur im selben Prozess), ``sqlite:///pfad/jobs.db`` bzw.
+    ``sqlite://jobs.db`` (relativ), ``http://host:port`` oder ``unix:///pfad.sock``.
+    """
+    if url == "memory://":
+        return MemoryBroker()
+    if url.startswith("sqlite://"):
+        return SQLiteBroker(url[len("sqlite://"):])
+    if url.startswith(("http://", "https://", "unix://")):
+        return HttpBroker(url)
+    raise ValueError(f"Unbekannte Broker-URL: {url}")
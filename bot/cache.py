@@ -0,0 +1,156 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class ConversionCache:
+    """
+    LRU-Cache für konvertierte Bilder mit Speicherbudget in Bytes.
+
+    - Verdrängung in O(1): die OrderedDict-Reihenfolge ist die Zugriffsreihenfolge,
+      der am längsten nicht genutzte Eintrag steht immer vorne.
+    - Aufnahme-Regel: Ergebnisse, die größer als ``admission_ratio`` des Budgets
+      sind, werden erst beim zweiten Auftreten gecacht, damit einmalige große
+      Dateien nicht den ganzen Cache leeren.
+    - TTL-Bereinigung inkrementell: abgelaufene Einträge stehen ebenfalls vorne,
+      ``sweep()`` prüft daher nur so viele Einträge, wie tatsächlich abgelaufen sind.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float = 1800, admission_ratio: float = 0.25):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.admission_ratio = admission_ratio
+        self.current_bytes = 0
+
+        # Schlüssel -> (Daten, Zeitpunkt des letzten Zugriffs)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Schlüssel großer Ergebnisse, die einmal abgelehnt wurden ("Ghost"-Einträge)
+        self._rejected: "OrderedDict[str, None]" = OrderedDict()
+        self._max_rejected = 256
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[bytes]:
+        """
+        Holt einen Eintrag und markiert ihn als zuletzt benutzt.
+
+        Args:
+            key: Cache-Schlüssel
+            count_miss: Ob ein Fehlschlag in die Statistik eingeht
+
+        Returns:
+            Optional[bytes]: Gecachte Daten oder None
+        """
+        entry = self._entries.get(key)
+        now = time.time()
+
+        if entry is None or now - entry[1] > self.ttl:
+            if entry is not None:
+                self._remove(key)
+                self.expirations += 1
+            if count_miss:
+                self.misses += 1
+            return None
+
+        self._entries[key] = (entry[0], now)
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, data: bytes) -> bool:
+        """
+        Fügt einen Eintrag hinzu, sofern die Aufnahme-Regel es erlaubt.
+
+        Args:
+            key: Cache-Schlüssel
+            data: Zu cachende Daten
+
+        Returns:
+            bool: True, wenn der Eintrag aufgenommen wurde
+        """
+        size = len(data)
+        if size > self.max_bytes:
+            self.rejections += 1
+            return False
+
+        # Große Ergebnisse erst beim zweiten Auftreten aufnehmen
+        if size > self.max_bytes * self.admission_ratio and key not in self._entries:
+            if key not in self._rejected:
+                self._rejected[key] = None
+                if len(self._rejected) > self._max_rejected:
+                    self._rejected.popitem(last=False)
+                self.rejections += 1
+                return False
+            del self._rejected[key]
+
+        if key in self._entries:
+            self._remove(key)
+
+        # Amortisierte TTL-Bereinigung, dann LRU-Verdrängung bis das Budget passt
+        self.sweep(max_items=8)
+        while self.current_bytes + size > self.max_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+        self._entries[key] = (data, time.time())
+        self.current_bytes += size
+        return True
+
+    def sweep(self, max_items: Optional[int] = None) -> int:
+        """
+        Entfernt abgelaufene Einträge von vorne, bis ein gültiger Eintrag kommt.
+
+        Args:
+            max_items: Maximale Anzahl zu entfernender Einträge (None = unbegrenzt)
+
+        Returns:
+            int: Anzahl entfernter Einträge
+        """
+        removed = 0
+        deadline = time.time() - self.ttl
+
+        while self._entries and (max_items is None or removed < max_items):
+            oldest_key = next(iter(self._entries))
+            if self._entries[oldest_key][1] >= deadline:
+                break
+            self._remove(oldest_key)
+            self.expirations += 1
+            removed += 1
+
+        return removed
+
+    def clear(self) -> None:
+        """Leert den Cache."""
+        self._entries.clear()
+        self._rejected.clear()
+        self.current_bytes = 0
+
+    def _remove(self, key: str) -> None:
+        data, _ = self._entries.pop(key)
+        self.current_bytes -= len(data)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Gibt Zähler und Auslastung des Caches zurück."""
+        lookups = self.hits + self.misses
+        return {
+            "cache_size": len(self._entries),
+            "cache_bytes": self.current_bytes,
+            "cache_max_bytes": self.max_bytes,
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_evictions": self.evictions,
+            "cache_expirations": self.expirations,
+            "cache_rejections": self.rejections,
+            "cache_hit_rate": (self.hits / lookups * 100) if lookups > 0 else 0
+        }
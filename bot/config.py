@@ -20,8 +20,9 @@ def get_env_var(name, default=None, required=False):
         sys.exit(1)
     return value
 
-# Discord Bot Token (ERFORDERLICH)
-TOKEN = get_env_var("DISCORD_TOKEN", required=True)
+# Discord Bot Token (ERFORDERLICH, geprüft erst beim Start in bot/main.py, damit
+# Benchmarks und Worker-Prozesse die Konfiguration auch ohne Token importieren können)
+TOKEN = get_env_var("DISCORD_TOKEN")
 
 # Bot Einstellungen (optional mit Standardwerten)
 COMMAND_PREFIX = get_env_var("COMMAND_PREFIX", "/")
@@ -30,6 +31,79 @@ DEBUG_MODE = get_env_var("DEBUG_MODE", "false").lower() == "true"
 # Performance-Einstellungen
 MAX_CONCURRENT_CONVERSIONS = int(get_env_var("MAX_CONCURRENT_CONVERSIONS", "4"))
 CONVERSION_TIMEOUT = int(get_env_var("CONVERSION_TIMEOUT", "60"))  # Sekunden
+# Maximale Anzahl gleichzeitig laufender Konvertierungen pro Nutzer (faire Warteschlange)
+MAX_JOBS_PER_USER = int(get_env_var("MAX_JOBS_PER_USER", "2"))
+
+# DDS-Ausgabe: "dxt1" (BC1, ohne Alpha) oder "dxt5" (BC3), mit Mipmap-Kette
+DDS_COMPRESSION = get_env_var("DDS_COMPRESSION", "dxt5").lower()
+DDS_MIPMAPS = get_env_var("DDS_MIPMAPS", "true").lower() == "true"
+
+# Gleichzeitige ImageMagick-Prozesse und deren Ressourcen-Limits
+MAX_EXTERNAL_PROCESSES = int(get_env_var("MAX_EXTERNAL_PROCESSES", str(MAX_CONCURRENT_CONVERSIONS)))
+IMAGEMAGICK_MEMORY_LIMIT_MB = int(get_env_var("IMAGEMAGICK_MEMORY_LIMIT_MB", "256"))
+IMAGEMAGICK_AREA_LIMIT_MP = int(get_env_var("IMAGEMAGICK_AREA_LIMIT_MP", "64"))  # Megapixel
+
+# Encoder-Aufwand: "fast", "balanced", "max" oder "auto" (schaltet unter Last herunter)
+ENCODER_PROFILE = get_env_var("ENCODER_PROFILE", "auto").lower()
+
+# Auslieferung: Upload-Limit pro Nachricht (mehrere Ergebnisse teilen sich eine Nachricht)
+# und Mindestabstand zwischen zwei Bearbeitungen der Fortschrittsnachricht
+UPLOAD_LIMIT_MB = int(get_env_var("UPLOAD_LIMIT_MB", "8"))
+PROGRESS_EDIT_INTERVAL = float(get_env_var("PROGRESS_EDIT_INTERVAL", "2.0"))
+
+# Download-Einstellungen (gemeinsame HTTP-Session zum Discord-CDN)
+DOWNLOAD_TIMEOUT = int(get_env_var("DOWNLOAD_TIMEOUT", "30"))  # Sekunden
+DOWNLOAD_CONNECTION_LIMIT = int(get_env_var("DOWNLOAD_CONNECTION_LIMIT", "16"))
+
+# Cache für konvertierte Bilder
+CACHE_MAX_MB = int(get_env_var("CACHE_MAX_MB", "256"))  # Speicherbudget in MB
+CACHE_TTL = int(get_env_var("CACHE_TTL", "1800"))  # Sekunden
+# Ergebnisse über diesem Anteil des Budgets werden erst beim zweiten Auftreten gecacht
+CACHE_ADMISSION_RATIO = float(get_env_var("CACHE_ADMISSION_RATIO", "0.25"))
+
+# Persistenter Festplatten-Cache (überlebt /restart), 0 = deaktiviert
+DISK_CACHE_DIR = get_env_var("DISK_CACHE_DIR", "cache")
+DISK_CACHE_MAX_MB = int(get_env_var("DISK_CACHE_MAX_MB", "1024"))
+
+# Prometheus-Metriken unter http://METRICS_HOST:METRICS_PORT/metrics, Port 0 = deaktiviert
+METRICS_HOST = get_env_var("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(get_env_var("METRICS_PORT", "9108"))
+
+# Logging im Hintergrund-Thread: Größe der Warteschlange und wie lange WARNING/ERROR
+# bei voller Warteschlange warten dürfen (INFO/DEBUG werden dann sofort verworfen)
+LOG_QUEUE_SIZE = int(get_env_var("LOG_QUEUE_SIZE", "10000"))
+LOG_BLOCK_TIMEOUT = float(get_env_var("LOG_BLOCK_TIMEOUT", "1.0"))
+
+# Ausgabe der Logs "conversions" und "queue": "text" oder "json" (eine JSON-Zeile pro Ereignis)
+LOG_FORMAT = get_env_var("LOG_FORMAT", "text").lower()
+# Sampling häufiger Erfolgs-Ereignisse, z.B. "cache_hit=0.01,job_succeeded=1" (Fehler immer vollständig).
+# Standard-Raten (10 %) und Obergrenze gelten nur bei LOG_FORMAT=json; im Textformat wird
+# jede Zeile geschrieben, außer für die hier ausdrücklich genannten Ereignisse
+LOG_SAMPLE_RATES = get_env_var("LOG_SAMPLE_RATES", "")
+# Obergrenze pro Ereignis und Sekunde nach dem Sampling, 0 = unbegrenzt (Standard: 50 bei json, sonst 0)
+LOG_EVENT_RATE_LIMIT = int(get_env_var("LOG_EVENT_RATE_LIMIT", "50" if LOG_FORMAT == "json" else "0"))
+
+# Aufteilung in Gateway- und Worker-Prozesse (bot/broker.py, bot/worker.py). Leer =
+# alles in einem Prozess. Sonst z.B. "sqlite:///var/lib/imagex/jobs.db" (Prozesse
+# auf einem Host) oder "http://gateway-host:9110" (Broker des Gateways über HTTP)
+BROKER_URL = get_env_var("BROKER_URL", "")
+# Das Gateway stellt seinen Broker für Worker auf anderen Hosts bereit, z.B.
+# "0.0.0.0:9110" oder "unix:/tmp/imagex-broker.sock"; leer = nicht
+BROKER_LISTEN = get_env_var("BROKER_LISTEN", "")
+# Gemeinsames Geheimnis für den HTTP-Broker (Bearer-Token), leer = ohne Prüfung;
+# nur für localhost und Unix-Sockets erlaubt
+BROKER_SECRET = get_env_var("BROKER_SECRET", "")
+# Ein abgeholter Job gilt nach so vielen Sekunden ohne Verlängerung durch seinen
+# Worker als verloren (Absturz) und wird erneut vergeben, höchstens BROKER_MAX_ATTEMPTS-mal
+BROKER_LEASE = float(get_env_var("BROKER_LEASE", "300"))
+BROKER_MAX_ATTEMPTS = int(get_env_var("BROKER_MAX_ATTEMPTS", "3"))
+# Anfragen, die ein Worker-Prozess gleichzeitig bearbeitet
+WORKER_CONCURRENCY = int(get_env_var("WORKER_CONCURRENCY", "2"))
+
+# Tracing einzelner Jobs: Anteil gesampelter Jobs (0 = aus), Ziel-Datei und Format ("jsonl" oder "chrome")
+TRACE_SAMPLE_RATE = float(get_env_var("TRACE_SAMPLE_RATE", "0"))
+TRACE_FILE = get_env_var("TRACE_FILE", "Logs/traces.jsonl")
+TRACE_FORMAT = get_env_var("TRACE_FORMAT", "jsonl").lower()
 
 # Liste ALLER bekannten Bildformate (Upload & Ziel-Format)
 ALLOWED_FORMATS = [
@@ -75,5 +149,7 @@ if IS_REPLIT:
 else:
     KEEP_ALIVE = False
     TEMP_DIR = "temp"
-    if not os.path.exists(TEMP_DIR):
-        os.makedirs(TEMP_DIR)
\ No newline at end of file
+
+def create_directories():
+    """Legt die Arbeitsverzeichnisse an (beim Start des Bots, nicht beim Import)."""
+    os.makedirs(TEMP_DIR, exist_ok=True)
\ No newline at end of file
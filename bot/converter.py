@@ -1,54 +1,123 @@
 import aiohttp
-from PIL import Image
 import io
 import os
+import hashlib
 import subprocess
 import logging
 import tempfile
 import time
 import shutil
 import asyncio
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List
+from urllib.parse import urlsplit
 import mimetypes  # Standard-Bibliothek statt magic
-import piexif  # für EXIF-Daten-Handling
-import numpy as np  # für erweiterte Bildmanipulation
+
+from bot.cache import ConversionCache
+from bot.config import (
+    IMAGEMAGICK_MEMORY_LIMIT_MB, IMAGEMAGICK_AREA_LIMIT_MP,
+    DOWNLOAD_TIMEOUT, DOWNLOAD_CONNECTION_LIMIT,
+    CACHE_MAX_MB, CACHE_TTL, CACHE_ADMISSION_RATIO,
+    DISK_CACHE_DIR, DISK_CACHE_MAX_MB
+)
+from bot.disk_cache import DiskCache
+from bot.encoding import DEFAULT_ENCODER_PROFILE, ENCODER_PROFILES, MAX_DIMENSIONS, QUALITY_SETTINGS
+from bot.engine import ConversionEngine
+from bot.events import log_event
+from bot.external import ExternalToolExecutor
+from bot.tracing import current_trace, record_span, span
+from bot.metrics import (
+    CONVERSIONS, CONVERSION_FAILURES, CONVERSION_SECONDS, DOWNLOAD_SECONDS, REQUEST_SECONDS,
+    format_label, registry
+)
 
 # Logger direkt ohne Import-Loop nutzen
 logger = logging.getLogger("bot")
+# Strukturierte Ereignisse des Konvertierungspfads (Logs/conversions.log, gesampelt)
+event_logger = logging.getLogger("conversions")
 
 # ImageMagick für erweiterte Konvertierungen
 IMAGEMAGICK_PATH = "/usr/bin/convert"  # Anpassen für Replit
 
-# Temporäres Verzeichnis für Zwischendateien
+# Temporäres Verzeichnis für Zwischendateien (wird in init_converter angelegt)
 TEMP_DIR = "/tmp/imagebot"
-os.makedirs(TEMP_DIR, exist_ok=True)
 
-# Maximale Bildgrößen
+# ImageMagick-Coder, die eine seekbare Eingabe brauchen (Ghostscript-Delegates);
+# alle anderen lesen direkt von stdin
+SEEKABLE_INPUT_FORMATS = {"pdf", "eps", "ai"}
+
+# Quellformate, die PIL nicht (vollständig) lesen kann
+IMAGEMAGICK_SOURCE_FORMATS = {"psd", "pdf", "ai", "eps"}
+
+# Maximale Dateigröße der Quelle
 MAX_IMAGE_SIZE = 20 * 1024 * 1024  # 20 MB
-MAX_DIMENSIONS = (4000, 4000)      # 4000x4000 Pixel
-
-# Qualitätseinstellungen für verschiedene Formate
-QUALITY_SETTINGS = {
-    "jpg": 90,
-    "jpeg": 90,
-    "webp": 85,
-    "png": 9  # Komprimierungslevel für PNG
-}
-
-# Cache für bereits konvertierte Bilder (URL -> Format -> Bytes)
-image_cache = {}
-MAX_CACHE_SIZE = 50  # Maximale Anzahl an gecachten Bildern
-cache_timestamps = {}  # Für LRU-Cache-Implementierung
-
-# Statistiken für Leistungsüberwachung
-conversion_stats = {
-    "total_conversions": 0,
-    "successful": 0,
-    "failed": 0,
-    "total_size_processed": 0,
-    "avg_conversion_time": 0,
-    "conversion_times": []
-}
+
+# Blockgröße beim Streamen von Downloads
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Automatik: ab dieser Warteschlangenlänge bzw. mittleren Bearbeitungszeit (s)
+# wird auf das jeweils günstigere Profil gewechselt
+AUTO_PROFILE_THRESHOLDS = [
+    ("fast", 12, 15.0),
+    ("balanced", 4, 5.0)
+]
+
+# Cache für bereits konvertierte Bilder (Inhalts-Hash + Parameter -> Bytes)
+image_cache = ConversionCache(
+    max_bytes=CACHE_MAX_MB * 1024 * 1024,
+    ttl=CACHE_TTL,
+    admission_ratio=CACHE_ADMISSION_RATIO
+)
+
+# Zweite Cache-Stufe auf der Festplatte (wird in init_converter geöffnet)
+disk_cache: Optional[DiskCache] = None
+# Laufende Schreibvorgänge in den Festplatten-Cache
+pending_disk_writes = set()
+
+# Laufende Konvertierungen (Single-Flight): Schlüssel -> ConversionFlight
+inflight_conversions = {}
+
+# Vorab-Index: normalisierter Attachment-Pfad -> Inhalts-Hash der Quelldatei.
+# Erlaubt Cache-Treffer ohne erneuten Download, obwohl die CDN-Signatur wechselt.
+source_index = {}
+MAX_SOURCE_INDEX_SIZE = 1000
+
+# Statistiken für Leistungsüberwachung (Registry aus bot/metrics.py, Latenzen dort)
+SOURCE_BYTES = registry.counter("imagex_source_bytes_total", "Heruntergeladene Quelldaten in Bytes")
+CACHE_HITS_WITHOUT_DOWNLOAD = registry.counter(
+    "imagex_cache_hits_without_download_total", "Cache-Treffer über den Attachment-Pfad, ohne Download"
+)
+# Größenlimit der Ausgabe (bot/fitting.py): vollständige Kodierungen pro Bild und Proben
+ENCODES_PER_JOB = registry.histogram(
+    "imagex_encodes_per_job", "Vollständige Kodierungen pro konvertiertem Bild", ("target",),
+    buckets=(1, 2, 3, 4, 5)
+)
+PROBE_ENCODES = registry.counter("imagex_probe_encodes_total", "Kodierungen verkleinerter Proben zur Größenvorhersage")
+FITTED_OUTPUTS = registry.counter(
+    "imagex_fitted_outputs_total", "Ausgaben, deren Qualität oder Größe für das Limit reduziert wurde", ("target",)
+)
+COALESCED = registry.counter("imagex_coalesced_total", "Anfragen, die auf eine identische laufende Konvertierung warteten")
+PROFILE_USES = registry.counter("imagex_encoder_profile_total", "Konvertierungen pro Encoder-Profil", ("profile",))
+
+# Prozess-Pool für die CPU-intensive Bildverarbeitung; die Pipeline (bot/render.py)
+# samt Pillow und NumPy laden nur die Worker
+RENDER_MODULE = "bot.render"
+conversion_engine = ConversionEngine(preload=(RENDER_MODULE,))
+# Vorwärmen der Worker-Prozesse (läuft nach init_converter im Hintergrund weiter)
+warm_up_task: Optional[asyncio.Task] = None
+
+# Begrenzte, überwachte ImageMagick-Aufrufe (Parallelität, Threads, Timeout)
+imagemagick_executor = ExternalToolExecutor()
+
+# Momentanwerte, die erst beim Abruf von /metrics gelesen werden
+registry.gauge("imagex_cache_hit_ratio", "Trefferquote des Speicher-Caches (0-1)",
+               lambda: image_cache.hits / max(1, image_cache.hits + image_cache.misses))
+registry.gauge("imagex_cache_bytes", "Belegte Bytes im Speicher-Cache", lambda: image_cache.current_bytes)
+registry.gauge("imagex_cache_entries", "Einträge im Speicher-Cache", lambda: len(image_cache))
+registry.gauge("imagex_external_active", "Laufende ImageMagick-Prozesse", lambda: imagemagick_executor.active)
+registry.gauge("imagex_external_waiting", "Auf einen Platz wartende ImageMagick-Aufrufe", lambda: imagemagick_executor.waiting)
+
+# Gemeinsame HTTP-Session (Connection-Pool zum Discord-CDN)
+http_session: Optional[aiohttp.ClientSession] = None
 
 class ImageFormatError(Exception):
     """Fehler bei der Bildformat-Erkennung oder -Konvertierung"""
@@ -62,6 +131,134 @@ class ImageQualityError(Exception):
     """Fehler bei der Bildqualitätsänderung"""
     pass
 
+class ImageDownloadError(Exception):
+    """Fehler beim Herunterladen eines Bildes"""
+    pass
+
+class ConversionFlight:
+    """
+    Eine laufende Konvertierung, auf deren Ergebnis weitere Aufrufer warten können.
+    
+    Registriert wird sie unter dem Attachment-Schlüssel und, sobald bekannt, unter
+    dem Inhalts-Schlüssel, damit auch dasselbe Bild unter anderer URL mitfährt.
+    """
+    
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+        self.keys = []
+        self.waiters = 0
+    
+    def register(self, key: str) -> None:
+        inflight_conversions[key] = self
+        self.keys.append(key)
+    
+    def finish(self, result: Optional[io.IOBase]) -> None:
+        """Gibt das Ergebnis an alle Wartenden weiter und meldet die Konvertierung ab."""
+        for key in self.keys:
+            if inflight_conversions.get(key) is self:
+                del inflight_conversions[key]
+        
+        if not self.future.done():
+            if self.waiters and result is not None:
+                # Wartende bekommen eigene BytesIO-Sichten auf dieselben Bytes
+                self.future.set_result(result.getvalue())
+            else:
+                self.future.set_result(None)
+    
+    def abort(self) -> None:
+        """Meldet die Konvertierung ab, ohne ein Ergebnis zu liefern (Abbruch)."""
+        for key in self.keys:
+            if inflight_conversions.get(key) is self:
+                del inflight_conversions[key]
+        self.future.cancel()
+
+async def wait_for_flight(flight: ConversionFlight) -> Optional[io.BytesIO]:
+    """
+    Wartet auf eine laufende identische Konvertierung statt sie zu wiederholen.
+    
+    Args:
+        flight: Laufende Konvertierung
+        
+    Returns:
+        Optional[io.BytesIO]: Ergebnis der Konvertierung oder None bei Fehler
+        
+    Raises:
+        asyncio.CancelledError: Wenn die laufende Konvertierung abgebrochen wurde
+    """
+    flight.waiters += 1
+    COALESCED.inc()
+    log_event(event_logger, "coalesced", "🔗 Identische Konvertierung läuft bereits, warte auf deren Ergebnis",
+              waiters=flight.waiters)
+    
+    data = await asyncio.shield(flight.future)
+    return io.BytesIO(data) if data is not None else None
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Gibt die gemeinsame HTTP-Session zurück und erstellt sie bei Bedarf.
+    
+    Die Session hält Verbindungen zum CDN offen, sodass TCP- und TLS-Aufbau
+    nicht für jede Datei erneut anfallen.
+    
+    Returns:
+        aiohttp.ClientSession: Langlebige Session mit Connection-Pool
+    """
+    global http_session
+    
+    if http_session is None or http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=DOWNLOAD_CONNECTION_LIMIT,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+        http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
+        )
+    
+    return http_session
+
+async def download_image(image_url: str, max_size: int = MAX_IMAGE_SIZE) -> bytes:
+    """
+    Lädt ein Bild in Blöcken herunter und bricht ab, sobald es zu groß wird.
+    
+    Args:
+        image_url: URL des Bildes
+        max_size: Maximale Größe in Bytes
+        
+    Returns:
+        bytes: Rohdaten des Bildes
+        
+    Raises:
+        ImageDownloadError: Bei HTTP-Fehlern oder Zeitüberschreitung
+        ImageSizeError: Wenn das Bild größer als max_size ist
+    """
+    session = get_http_session()
+    
+    try:
+        async with session.get(image_url) as response:
+            if response.status != 200:
+                raise ImageDownloadError(f"HTTP-Fehler: {response.status} beim Abrufen des Bildes")
+            
+            # Größe vorab anhand des Headers prüfen
+            if response.content_length is not None and response.content_length > max_size:
+                raise ImageSizeError(
+                    f"Bild ist zu groß ({response.content_length / 1024 / 1024:.2f} MB, "
+                    f"max. {max_size / 1024 / 1024} MB)"
+                )
+            
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                data.extend(chunk)
+                # Laufende Größe prüfen (Header kann fehlen oder falsch sein)
+                if len(data) > max_size:
+                    raise ImageSizeError(f"Bild ist zu groß (max. {max_size / 1024 / 1024} MB)")
+            
+            return bytes(data)
+    
+    except asyncio.TimeoutError:
+        raise ImageDownloadError(f"Zeitüberschreitung beim Download nach {DOWNLOAD_TIMEOUT}s")
+
 async def detect_image_format(file_bytes: io.BytesIO) -> str:
     """
     Erkennt das Format einer Bilddatei basierend auf den Bytes.
@@ -107,7 +304,12 @@ async def detect_image_format(file_bytes: io.BytesIO) -> str:
         elif header[0:4] == b'\x49\x49\x2A\x00' or header[0:4] == b'\x4D\x4D\x00\x2A':
             return 'tiff'
         
-        # Alternativ mit PIL probieren
+        # DDS: "DDS " (auch Varianten, die PIL nicht öffnen kann)
+        elif header[0:4] == b'DDS ':
+            return 'dds'
+        
+        # Alternativ mit PIL probieren (erst hier importiert, siehe bot/render.py)
+        from PIL import Image
         file_bytes.seek(0)
         img = Image.open(file_bytes)
         file_bytes.seek(0)
@@ -117,6 +319,7 @@ async def detect_image_format(file_bytes: io.BytesIO) -> str:
         logger.error(f"❌ Fehler bei der Formaterkennung: {e}")
         # Fallback: Versuche Erkennung mit PIL
         try:
+            from PIL import Image
             file_bytes.seek(0)
             img = Image.open(file_bytes)
             file_bytes.seek(0)
@@ -127,461 +330,515 @@ async def detect_image_format(file_bytes: io.BytesIO) -> str:
             
         raise ImageFormatError(f"Format konnte nicht erkannt werden: {e}")
 
-async def extract_metadata(img: Image.Image) -> Dict[str, Any]:
+def normalize_attachment_url(url: str) -> str:
     """
-    Extrahiert Metadaten aus einem Bild.
+    Entfernt wechselnde Signatur-Parameter (ex=, is=, hm=) und den Host aus einer
+    CDN-URL. Übrig bleibt der Pfad mit Kanal-ID, Attachment-ID und Dateiname.
     
     Args:
-        img: PIL Image-Objekt
+        url: Attachment-URL
         
     Returns:
-        Dict: Metadaten des Bildes
+        str: Normalisierter Pfad
     """
-    metadata = {
-        "dimensions": img.size,
-        "mode": img.mode,
-        "format": img.format,
-        "exif": {}
-    }
-    
-    # EXIF-Daten extrahieren, falls vorhanden
-    try:
-        if "exif" in img.info:
-            exif_dict = piexif.load(img.info["exif"])
-            # Vereinfachtes EXIF-Dictionary erstellen
-            for ifd_name in exif_dict:
-                if ifd_name == "thumbnail":
-                    continue
-                for tag_id in exif_dict[ifd_name]:
-                    tag_value = exif_dict[ifd_name][tag_id]
-                    if isinstance(tag_value, bytes):
-                        # Bytes in lesbares Format umwandeln
-                        try:
-                            tag_value = tag_value.decode('utf-8', errors='replace')
-                        except:
-                            tag_value = str(tag_value)
-                    metadata["exif"][f"{ifd_name}_{tag_id}"] = tag_value
-    except Exception as e:
-        logger.warning(f"⚠️ Fehler beim Extrahieren der EXIF-Daten: {e}")
-    
-    return metadata
+    return urlsplit(url).path
 
-async def preserve_metadata(source_img: Image.Image, target_img: Image.Image, target_format: str) -> Image.Image:
+def hash_source(image_data: bytes) -> str:
     """
-    Überträgt Metadaten von einem Quellbild auf ein Zielbild.
+    Berechnet einen schnellen Inhalts-Hash der Quelldaten.
     
     Args:
-        source_img: Quell-Image-Objekt
-        target_img: Ziel-Image-Objekt
-        target_format: Zielformat
+        image_data: Rohdaten des Quellbildes
         
     Returns:
-        Image.Image: Bild mit übertragenen Metadaten
+        str: Hex-Digest (BLAKE2b, 128 Bit)
     """
-    # Nicht alle Formate unterstützen alle Metadaten
-    metadata_compatible_formats = ["jpg", "jpeg", "tiff", "webp"]
-    
-    if target_format.lower() not in metadata_compatible_formats:
-        return target_img
-    
-    # EXIF-Daten übertragen, falls vorhanden und Format unterstützt
-    try:
-        if "exif" in source_img.info and target_format.lower() in ["jpg", "jpeg", "tiff"]:
-            exif_dict = piexif.load(source_img.info["exif"])
-            exif_bytes = piexif.dump(exif_dict)
-            target_img.info["exif"] = exif_bytes
-    except Exception as e:
-        logger.warning(f"⚠️ Fehler beim Übertragen der EXIF-Daten: {e}")
-    
-    # ICC-Profil übertragen, falls vorhanden
-    if "icc_profile" in source_img.info:
-        target_img.info["icc_profile"] = source_img.info["icc_profile"]
-    
-    return target_img
+    return hashlib.blake2b(image_data, digest_size=16).hexdigest()
 
-async def resize_if_needed(img: Image.Image, max_dimensions: Tuple[int, int] = MAX_DIMENSIONS) -> Image.Image:
+def make_cache_key(source_hash: str, target_format: str, max_bytes: Optional[int] = None) -> str:
     """
-    Skaliert ein Bild, wenn es die maximalen Dimensionen überschreitet.
+    Bildet den Cache-Schlüssel aus Inhalts-Hash und allen Parametern, die das
+    Ergebnis beeinflussen (Zielformat, Qualität, Skalierungsgrenzen, Größenlimit).
     
     Args:
-        img: PIL Image-Objekt
-        max_dimensions: Tuple mit maximaler Breite und Höhe
+        source_hash: Inhalts-Hash der Quelldaten
+        target_format: Zielformat
+        max_bytes: Größenlimit der Ausgabe
         
     Returns:
-        Image.Image: Skaliertes Bild oder Original
+        str: Cache-Schlüssel
     """
-    width, height = img.size
-    max_width, max_height = max_dimensions
-    
-    if width <= max_width and height <= max_height:
-        return img
-    
-    # Seitenverhältnis beibehalten
-    aspect_ratio = width / height
-    
-    if width > max_width:
-        width = max_width
-        height = int(width / aspect_ratio)
-    
-    if height > max_height:
-        height = max_height
-        width = int(height * aspect_ratio)
-    
-    logger.info(f"🔄 Bild wird auf {width}x{height} skaliert")
-    return img.resize((width, height), Image.LANCZOS)
+    quality = QUALITY_SETTINGS.get(target_format)
+    max_width, max_height = MAX_DIMENSIONS
+    key = f"{source_hash}:{target_format}:q{quality}:{max_width}x{max_height}"
+    return f"{key}:max{max_bytes}" if max_bytes else key
 
-async def optimize_image(img: Image.Image, target_format: str) -> Image.Image:
+def remember_source(url_key: str, source_hash: str) -> None:
     """
-    Optimiert ein Bild für das Zielformat.
+    Merkt sich den Inhalts-Hash zu einem normalisierten Attachment-Pfad.
     
     Args:
-        img: PIL Image-Objekt
-        target_format: Zielformat
-        
-    Returns:
-        Image.Image: Optimiertes Bild
+        url_key: Normalisierter Attachment-Pfad
+        source_hash: Inhalts-Hash der Quelldaten
     """
-    # Format-spezifische Optimierungen
-    if target_format.lower() in ["jpg", "jpeg"]:
-        # JPG benötigt RGB-Format (kein Alpha)
-        if img.mode in ['RGBA', 'LA'] or (img.mode == 'P' and 'transparency' in img.info):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            background.paste(img, mask=img.split()[3] if img.mode == 'RGBA' else None)
-            img = background
-    
-    elif target_format.lower() == "png":
-        # PNG optimieren durch Farbpalette für bestimmte Bilder
-        if img.mode == 'RGBA' and not has_many_colors(img):
-            try:
-                img = img.quantize(colors=256, method=2)
-            except Exception as e:
-                logger.warning(f"⚠️ Fehler bei PNG-Optimierung: {e}")
-    
-    elif target_format.lower() == "gif":
-        # GIF hat nur 256 Farben
-        if img.mode != 'P':
-            img = img.convert('P', palette=Image.ADAPTIVE, colors=256)
-    
-    return img
+    source_index.pop(url_key, None)
+    if len(source_index) >= MAX_SOURCE_INDEX_SIZE:
+        # Ältesten Eintrag entfernen (Einfügereihenfolge des Dicts)
+        del source_index[next(iter(source_index))]
+    source_index[url_key] = source_hash
 
-async def update_cache(url: str, target_format: str, image_bytes: io.BytesIO) -> None:
+async def update_cache(cache_key: str, image_bytes: io.BytesIO) -> None:
     """
     Fügt ein konvertiertes Bild zum Cache hinzu.
     
     Args:
-        url: Quell-URL des Bildes
-        target_format: Zielformat
+        cache_key: Schlüssel aus make_cache_key()
         image_bytes: BytesIO mit den Bilddaten
     """
-    global image_cache, cache_timestamps
-    
-    # Alte Einträge entfernen, wenn Cache zu groß wird
-    if len(image_cache) >= MAX_CACHE_SIZE:
-        # Ältesten Eintrag entfernen (LRU)
-        oldest_url = min(cache_timestamps, key=cache_timestamps.get)
-        if oldest_url in image_cache:
-            del image_cache[oldest_url]
-            del cache_timestamps[oldest_url]
-    
-    # Neuen Eintrag hinzufügen
-    if url not in image_cache:
-        image_cache[url] = {}
-    
-    # Kopie der Bytes erstellen, um Speicherprobleme zu vermeiden
-    image_bytes.seek(0)
-    cached_bytes = io.BytesIO(image_bytes.read())
-    image_bytes.seek(0)
-    
-    image_cache[url][target_format] = cached_bytes
-    cache_timestamps[url] = time.time()
+    # Unveränderliche Bytes speichern - Leser bekommen eigene BytesIO-Sichten darauf
+    data = image_bytes.getvalue()
+    if image_cache.put(cache_key, data):
+        log_event(event_logger, "cache_stored", "💾 Bild im Cache gespeichert: {key}", logging.DEBUG,
+                  key=cache_key, bytes=len(data))
+    
+    # Festplatten-Cache im Hintergrund schreiben (fsync blockiert)
+    if disk_cache is not None:
+        task = asyncio.create_task(asyncio.to_thread(disk_cache.put, cache_key, data))
+        pending_disk_writes.add(task)
+        task.add_done_callback(pending_disk_writes.discard)
 
-def get_cached_image(url: str, target_format: str) -> Optional[io.BytesIO]:
+def get_cached_image(cache_key: str, count_miss: bool = True) -> Optional[io.RawIOBase]:
     """
-    Holt ein Bild aus dem Cache, falls vorhanden.
+    Holt ein Bild aus dem Cache, falls vorhanden. Erst wird der Speicher-Cache
+    gefragt, danach der Festplatten-Cache.
     
     Args:
-        url: Quell-URL des Bildes
-        target_format: Zielformat
+        cache_key: Schlüssel aus make_cache_key()
+        count_miss: Ob ein Fehlschlag in die Cache-Statistik eingeht
         
     Returns:
-        Optional[io.BytesIO]: Cached Bild oder None
+        Optional[io.RawIOBase]: BytesIO (Speicher) bzw. MappedBlob (Festplatte) oder None
     """
-    if url in image_cache and target_format in image_cache[url]:
-        logger.info(f"🔄 Bild aus Cache geladen: {url} -> {target_format}")
-        cache_timestamps[url] = time.time()  # Update timestamp
-        
-        # Kopie zurückgeben, um Speicherprobleme zu vermeiden
-        cached_bytes = image_cache[url][target_format]
-        cached_bytes.seek(0)
-        result = io.BytesIO(cached_bytes.read())
-        cached_bytes.seek(0)
-        return result
+    cached_data = image_cache.get(cache_key, count_miss=count_miss)
+    if cached_data is not None:
+        log_event(event_logger, "cache_hit", "🔄 Bild aus Cache geladen: {key}", key=cache_key, tier="memory")
+        # BytesIO teilt sich den Puffer mit den unveränderlichen Bytes (keine Kopie)
+        return io.BytesIO(cached_data)
+    
+    if disk_cache is not None:
+        mapped_blob = disk_cache.get(cache_key)
+        if mapped_blob is not None:
+            log_event(event_logger, "cache_hit", "💽 Bild aus Festplatten-Cache geladen: {key}", key=cache_key, tier="disk")
+            return mapped_blob
     
     return None
 
-def has_many_colors(img: Image.Image, sample_pixels: int = 1000) -> bool:
+def select_encoder_profile(setting: str, queue_depth: int, recent_latency: float) -> str:
     """
-    Prüft, ob ein Bild viele verschiedene Farben hat.
+    Löst die Profil-Einstellung auf. Bei "auto" wird abhängig von der Last auf
+    günstigere Encoder-Einstellungen heruntergeschaltet.
+
+    Args:
+        setting: Konfiguriertes Profil ("fast", "balanced", "max" oder "auto")
+        queue_depth: Anzahl wartender Jobs
+        recent_latency: Mittlere Bearbeitungszeit der letzten Jobs in Sekunden
+
+    Returns:
+        str: Name des zu verwendenden Profils
+    """
+    if setting in ENCODER_PROFILES:
+        return setting
+
+    for profile, max_depth, max_latency in AUTO_PROFILE_THRESHOLDS:
+        if queue_depth >= max_depth or recent_latency >= max_latency:
+            return profile
+    return DEFAULT_ENCODER_PROFILE
+
+def build_imagemagick_command(input_spec: str, target_format: str,
+                              profile: str = DEFAULT_ENCODER_PROFILE) -> List[str]:
+    """
+    Baut die ImageMagick-Kommandozeile. Die Ausgabe geht immer nach stdout
+    (``format:-``), die Eingabe kommt von ``input_spec``.
     
     Args:
-        img: PIL Image-Objekt
-        sample_pixels: Anzahl der zu prüfenden Pixel
+        input_spec: Eingabe im Format ``coder:pfad`` bzw. ``coder:-`` für stdin
+        target_format: Zielformat
+        profile: Encoder-Profil
         
     Returns:
-        bool: True, wenn das Bild viele verschiedene Farben hat
+        List[str]: Argumente für den Prozessaufruf
     """
-    # In Numpy-Array konvertieren und Stichprobe nehmen
-    img_array = np.array(img)
-    height, width = img_array.shape[:2]
-    
-    # Zufällige Pixel auswählen
-    x_coords = np.random.randint(0, width, sample_pixels)
-    y_coords = np.random.randint(0, height, sample_pixels)
-    
-    # Farben zählen
-    colors = set()
-    for i in range(sample_pixels):
-        pixel = tuple(img_array[y_coords[i], x_coords[i]].tolist())
-        colors.add(pixel)
-    
-    # Wenn mehr als 64 verschiedene Farben, dann "viele Farben"
-    return len(colors) > 64
+    # Ressourcen-Limits vor der Eingabe, damit sie schon beim Dekodieren gelten
+    threads = imagemagick_executor.threads_per_process
+    cmd = [
+        IMAGEMAGICK_PATH,
+        "-limit", "thread", str(threads),
+        "-limit", "memory", f"{IMAGEMAGICK_MEMORY_LIMIT_MB}MiB",
+        "-limit", "map", f"{IMAGEMAGICK_MEMORY_LIMIT_MB * 2}MiB",
+        "-limit", "area", f"{IMAGEMAGICK_AREA_LIMIT_MP}MP",
+        "-limit", "time", str(int(imagemagick_executor.timeout)),
+        input_spec
+    ]
+    effort = ENCODER_PROFILES.get(profile, ENCODER_PROFILES[DEFAULT_ENCODER_PROFILE])
+    
+    # Format-spezifische Parameter
+    if target_format.lower() == "jpg" or target_format.lower() == "jpeg":
+        quality = QUALITY_SETTINGS.get("jpg", 90)
+        cmd.extend(["-quality", str(quality)])
+        cmd.extend(["-define", f"jpeg:optimize-coding={str(effort['jpg']['optimize']).lower()}"])
+    elif target_format.lower() == "png":
+        cmd.extend(["-define", f"png:compression-level={effort['png']['compress_level']}"])
+    elif target_format.lower() == "webp":
+        quality = QUALITY_SETTINGS.get("webp", 85)
+        cmd.extend(["-quality", str(quality)])
+        cmd.extend(["-define", f"webp:method={effort['webp']['method']}"])
+    elif target_format.lower() == "dds":
+        cmd.extend(["-define", "dds:compression=dxt5"])
+    
+    cmd.append(f"{target_format.lower()}:-")
+    return cmd
 
-async def convert_with_imagemagick(input_path: str, output_path: str, target_format: str) -> bool:
+async def convert_with_imagemagick(image_data: bytes, source_format: str, target_format: str,
+                                   profile: str = DEFAULT_ENCODER_PROFILE) -> Optional[bytes]:
     """
-    Konvertiert ein Bild mit ImageMagick.
+    Konvertiert ein Bild mit ImageMagick, ohne Zwischendateien.
+    
+    Die Eingabe wird über stdin geschrieben und die Ausgabe von stdout gelesen.
+    Formate, deren Coder eine seekbare Eingabe brauchen (Ghostscript für
+    PDF/EPS/AI), bekommen stattdessen einen anonymen Speicher-Dateideskriptor
+    (memfd). Nur wo es den nicht gibt, wird auf eine temporäre Datei ausgewichen.
     
     Args:
-        input_path: Pfad zur Eingabedatei
-        output_path: Pfad zur Ausgabedatei
+        image_data: Rohdaten des Quellbildes
+        source_format: Erkanntes Quellformat
         target_format: Zielformat
+        profile: Encoder-Profil
         
     Returns:
-        bool: True bei Erfolg, False bei Fehler
+        Optional[bytes]: Ausgabedaten oder None bei Fehler
     """
+    source_format = source_format.lower()
+    stdin_data = image_data
+    pass_fds = ()
+    input_fd = None
+    temp_path = None
+    
     try:
-        cmd = [IMAGEMAGICK_PATH]
-        
-        # Format-spezifische Parameter
-        if target_format.lower() == "jpg" or target_format.lower() == "jpeg":
-            quality = QUALITY_SETTINGS.get("jpg", 90)
-            cmd.extend(["-quality", str(quality)])
-        elif target_format.lower() == "png":
-            cmd.extend(["-define", f"png:compression-level={QUALITY_SETTINGS.get('png', 9)}"])
-        elif target_format.lower() == "webp":
-            quality = QUALITY_SETTINGS.get("webp", 85)
-            cmd.extend(["-quality", str(quality)])
-        elif target_format.lower() == "dds":
-            cmd.extend(["-define", "dds:compression=dxt5"])
-        
-        # Input und Output
-        cmd.extend([input_path, output_path])
-        
-        # Prozess ausführen
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
+        if source_format in SEEKABLE_INPUT_FORMATS:
+            stdin_data = None
+            if hasattr(os, "memfd_create"):
+                input_fd = os.memfd_create(f"imagex-input.{source_format}")
+                with open(input_fd, "wb", closefd=False) as input_file:
+                    input_file.write(image_data)
+                input_spec = f"{source_format}:/dev/fd/{input_fd}"
+                pass_fds = (input_fd,)
+            else:
+                with tempfile.NamedTemporaryFile(dir=TEMP_DIR, suffix=f".{source_format}", delete=False) as input_file:
+                    input_file.write(image_data)
+                    temp_path = input_file.name
+                input_spec = f"{source_format}:{temp_path}"
+        else:
+            input_spec = f"{source_format}:-"
         
-        stdout, stderr = await process.communicate()
+        cmd = build_imagemagick_command(input_spec, target_format, profile)
         
-        if process.returncode != 0:
-            logger.error(f"❌ ImageMagick-Fehler: {stderr.decode()}")
-            return False
+        # Prozess ausführen (wartet auf einen freien Platz, bricht nach CONVERSION_TIMEOUT ab)
+        result = await imagemagick_executor.run(cmd, stdin_data, pass_fds)
+        log_event(event_logger, "imagemagick_usage", "🧮 ImageMagick: {wall_s:.2f}s Laufzeit, {cpu_s:.2f}s CPU",
+                  wall_s=result.wall_time, cpu_s=result.cpu_time)
         
-        return True
+        if result.timed_out:
+            logger.error(f"❌ ImageMagick-Zeitlimit überschritten ({imagemagick_executor.timeout}s)")
+            return None
+        if result.returncode != 0 or not result.stdout:
+            logger.error(f"❌ ImageMagick-Fehler: {result.stderr.decode(errors='replace')}")
+            return None
+        
+        return result.stdout
         
     except Exception as e:
         logger.error(f"❌ Fehler bei ImageMagick-Konvertierung: {e}")
-        return False
+        return None
+    finally:
+        if input_fd is not None:
+            os.close(input_fd)
+        if temp_path is not None:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
 
-async def convert_image(image_url: str, target_format: str) -> Optional[io.BytesIO]:
+async def convert_image(image_url: str, target_format: str,
+                        profile: str = DEFAULT_ENCODER_PROFILE,
+                        max_bytes: Optional[int] = None) -> Optional[io.BytesIO]:
     """
     Konvertiert ein Bild von einer URL in das angegebene Zielformat.
     
+    Läuft für dasselbe Attachment (oder denselben Inhalt) mit denselben Parametern
+    bereits eine Konvertierung, wird auf deren Ergebnis gewartet, statt erneut
+    herunterzuladen und zu konvertieren. Das Encoder-Profil gehört bewusst nicht
+    zum Cache-Schlüssel: Alle Profile liefern dasselbe Bild, nur unterschiedlich
+    stark komprimiert.
+    
     Args:
         image_url: URL des zu konvertierenden Bildes
         target_format: Gewünschtes Zielformat
+        profile: Encoder-Profil ("fast", "balanced" oder "max")
+        max_bytes: Größenlimit der Ausgabe, z.B. das Upload-Limit. Verlustbehaftete
+            Formate senken dafür die Qualität, alle Formate werden notfalls verkleinert.
         
     Returns:
         Optional[io.BytesIO]: Bytes des konvertierten Bildes oder None bei Fehler
     """
-    start_time = time.time()
-    
     # Format bereinigen
     target_format = target_format.lower().strip().lstrip('.')
+    if profile not in ENCODER_PROFILES:
+        profile = DEFAULT_ENCODER_PROFILE
     
-    # Aus Cache holen, falls vorhanden
-    cached_image = get_cached_image(image_url, target_format)
-    if cached_image:
-        # Statistik aktualisieren
-        conversion_stats["total_conversions"] += 1
-        conversion_stats["successful"] += 1
-        return cached_image
+    url_key = normalize_attachment_url(image_url)
+    # Labels für die Metriken: Endung des Attachments und Zielformat
+    labels = (format_label(os.path.splitext(url_key)[1]), format_label(target_format))
     
+    start_time = time.perf_counter()
+    result = await _convert_or_join(image_url, url_key, target_format, profile, labels, max_bytes)
+    
+    CONVERSIONS.inc(*labels)
+    if result is None:
+        CONVERSION_FAILURES.inc(*labels)
+    REQUEST_SECONDS.observe(time.perf_counter() - start_time, *labels)
+    return result
+
+async def _convert_or_join(image_url: str, url_key: str, target_format: str, profile: str,
+                           labels: Tuple[str, str], max_bytes: Optional[int]) -> Optional[io.BytesIO]:
+    """
+    Wartet auf eine laufende identische Konvertierung oder startet selbst eine.
+    
+    Args:
+        image_url: URL des zu konvertierenden Bildes
+        url_key: Normalisierter Attachment-Pfad
+        target_format: Bereinigtes Zielformat
+        profile: Encoder-Profil
+        labels: (Quelle, Ziel) für die Metriken
+        max_bytes: Größenlimit der Ausgabe
+        
+    Returns:
+        Optional[io.BytesIO]: Bytes des konvertierten Bildes oder None bei Fehler
+    """
+    flight_key = make_cache_key(url_key, target_format, max_bytes)
+    
+    while True:
+        running = inflight_conversions.get(flight_key)
+        if running is None:
+            break
+        try:
+            return await wait_for_flight(running)
+        except asyncio.CancelledError:
+            # Nur weiterreichen, wenn dieser Aufruf selbst abgebrochen wurde
+            if not running.future.cancelled():
+                raise
+    
+    flight = ConversionFlight()
+    flight.register(flight_key)
+    result = None
     try:
-        # Bild herunterladen
-        async with aiohttp.ClientSession() as session:
-            async with session.get(image_url) as response:
-                if response.status != 200:
-                    logger.error(f"❌ HTTP-Fehler: {response.status} beim Abrufen des Bildes")
-                    conversion_stats["total_conversions"] += 1
-                    conversion_stats["failed"] += 1
-                    return None
-                
-                image_data = await response.read()
-                
-                # Größe prüfen
-                if len(image_data) > MAX_IMAGE_SIZE:
-                    logger.error(f"❌ Bild zu groß: {len(image_data) / 1024 / 1024:.2f} MB")
-                    conversion_stats["total_conversions"] += 1
-                    conversion_stats["failed"] += 1
-                    raise ImageSizeError(f"Bild ist zu groß (max. {MAX_IMAGE_SIZE / 1024 / 1024} MB)")
-                
-                image_bytes = io.BytesIO(image_data)
-                conversion_stats["total_size_processed"] += len(image_data)
+        result = await _convert_image(image_url, url_key, target_format, profile, labels, max_bytes, flight)
+        return result
+    except BaseException:
+        flight.abort()
+        raise
+    finally:
+        flight.finish(result)
+
+async def _convert_image(image_url: str, url_key: str, target_format: str, profile: str,
+                         labels: Tuple[str, str], max_bytes: Optional[int],
+                         flight: ConversionFlight) -> Optional[io.BytesIO]:
+    """
+    Führt eine Konvertierung aus (Cache, Download, Formaterkennung, Konvertierung).
+    
+    Args:
+        image_url: URL des zu konvertierenden Bildes
+        url_key: Normalisierter Attachment-Pfad
+        target_format: Bereinigtes Zielformat
+        profile: Encoder-Profil
+        labels: (Quelle, Ziel) für die Metriken
+        max_bytes: Größenlimit der Ausgabe
+        flight: Single-Flight-Eintrag dieser Konvertierung
+        
+    Returns:
+        Optional[io.BytesIO]: Bytes des konvertierten Bildes oder None bei Fehler
+    """
+    start_time = time.time()
+    source_label, target_label = labels
+    ok = False
+    
+    # Vorab-Prüfung: dasselbe Attachment schon einmal gesehen? Dann ohne Download aus dem Cache
+    known_hash = source_index.get(url_key)
+    if known_hash:
+        cached_image = get_cached_image(make_cache_key(known_hash, target_format, max_bytes), count_miss=False)
+        if cached_image:
+            CACHE_HITS_WITHOUT_DOWNLOAD.inc()
+            ok = True
+            return cached_image
+    
+    try:
+        # Bild herunterladen (gestreamt, mit frühem Abbruch bei Übergröße)
+        download_start = time.perf_counter()
+        with span("download"):
+            image_data = await download_image(image_url)
+        DOWNLOAD_SECONDS.observe(time.perf_counter() - download_start, *labels)
+        image_bytes = io.BytesIO(image_data)
+        SOURCE_BYTES.inc(amount=len(image_data))
+        
+        # Cache anhand des Inhalts prüfen (gleiches Bild, andere URL)
+        source_hash = hash_source(image_data)
+        remember_source(url_key, source_hash)
+        cache_key = make_cache_key(source_hash, target_format, max_bytes)
+        
+        cached_image = get_cached_image(cache_key)
+        if cached_image:
+            ok = True
+            return cached_image
+        
+        # Gleicher Inhalt wird gerade unter anderer URL konvertiert? Dann mitfahren
+        running = inflight_conversions.get(cache_key)
+        if running is not None and running is not flight:
+            try:
+                result = await wait_for_flight(running)
+                ok = result is not None
+                return result
+            except asyncio.CancelledError:
+                if not running.future.cancelled():
+                    raise
+        flight.register(cache_key)
         
         # Original-Format erkennen
-        source_format = await detect_image_format(image_bytes)
-        logger.info(f"🔍 Erkanntes Format: {source_format}, Zielformat: {target_format}")
-        
-        # Gleiche Formate direkt zurückgeben
-        if source_format.lower() == target_format.lower():
-            logger.info(f"✅ Quell- und Zielformat identisch: {target_format}")
-            conversion_stats["total_conversions"] += 1
-            conversion_stats["successful"] += 1
-            await update_cache(image_url, target_format, image_bytes)
+        with span("detect"):
+            source_format = await detect_image_format(image_bytes)
+        log_event(event_logger, "format_detected", "🔍 Erkanntes Format: {source_format}, Zielformat: {target}",
+                  source_format=source_format, target=target_format, bytes=len(image_data))
+        
+        # Gleiche Formate direkt zurückgeben (sofern sie ins Größenlimit passen)
+        if source_format.lower() == target_format.lower() and (not max_bytes or len(image_data) <= max_bytes):
+            log_event(event_logger, "conversion_succeeded", "✅ Quell- und Zielformat identisch: {target}",
+                      source=source_format, target=target_format, engine="passthrough")
+            with span("cache_write"):
+                await update_cache(cache_key, image_bytes)
+            ok = True
             return image_bytes
         
-        # Tempdir für diese Konvertierung
-        with tempfile.TemporaryDirectory(dir=TEMP_DIR) as temp_dir:
-            # Bild öffnen
-            image_bytes.seek(0)
-            
-            # Spezielle Formate mit ImageMagick verarbeiten
-            if source_format.lower() in ["dds", "psd", "pdf", "ai", "eps"] or target_format.lower() in ["dds"]:
-                # Temporäre Dateien
-                input_path = os.path.join(temp_dir, f"input.{source_format}")
-                output_path = os.path.join(temp_dir, f"output.{target_format}")
-                
-                # Eingabedatei speichern
-                with open(input_path, "wb") as f:
-                    f.write(image_bytes.getvalue())
-                
-                # Mit ImageMagick konvertieren
-                success = await convert_with_imagemagick(input_path, output_path, target_format)
-                
-                if success and os.path.exists(output_path):
-                    # Ergebnis zurückgeben
-                    result = io.BytesIO()
-                    with open(output_path, "rb") as f:
-                        result.write(f.read())
-                    
-                    result.seek(0)
-                    logger.info(f"✅ Erfolgreiche Konvertierung mit ImageMagick: {source_format} -> {target_format}")
-                    conversion_stats["total_conversions"] += 1
-                    conversion_stats["successful"] += 1
-                    
-                    # In Cache speichern
-                    await update_cache(image_url, target_format, result)
-                    
-                    return result
-                else:
-                    logger.error(f"❌ ImageMagick-Konvertierung fehlgeschlagen: {source_format} -> {target_format}")
-                    conversion_stats["total_conversions"] += 1
-                    conversion_stats["failed"] += 1
-                    return None
-            
-            # Standardkonvertierung mit PIL
+        PROFILE_USES.inc(profile)
+        
+        # Nur Formate, die PIL nicht lesen kann, gehen an ImageMagick. DDS wird
+        # von PIL gelesen und vom eigenen Encoder (bot/dds.py) geschrieben.
+        use_imagemagick = source_format.lower() in IMAGEMAGICK_SOURCE_FORMATS
+        
+        # Standardkonvertierung mit PIL im Prozess-Pool
+        if not use_imagemagick:
             try:
-                image_bytes.seek(0)
-                img = Image.open(image_bytes)
-                
-                # Metadaten extrahieren
-                metadata = await extract_metadata(img)
-                logger.info(f"📊 Bildinfo: {img.format} {img.size} {img.mode}")
-                
-                # Bild bei Bedarf skalieren
-                img = await resize_if_needed(img)
-                
-                # Bild für Zielformat optimieren
-                img = await optimize_image(img, target_format)
-                
-                # Ergebnis speichern
-                output_bytes = io.BytesIO()
-                
-                # Format-spezifische Speicheroptionen
-                save_options = {}
-                
-                if target_format.lower() in ["jpg", "jpeg"]:
-                    save_options["quality"] = QUALITY_SETTINGS.get("jpg", 90)
-                    save_options["optimize"] = True
-                elif target_format.lower() == "png":
-                    save_options["optimize"] = True
-                    save_options["compress_level"] = QUALITY_SETTINGS.get("png", 9)
-                elif target_format.lower() == "webp":
-                    save_options["quality"] = QUALITY_SETTINGS.get("webp", 85)
-                    save_options["method"] = 6  # Bessere Kompression
-                elif target_format.lower() == "gif":
-                    save_options["optimize"] = True
-                
-                # Metadaten übertragen
-                img = await preserve_metadata(img, img, target_format)
-                
-                # Bild speichern
-                img.save(output_bytes, format=target_format.upper(), **save_options)
-                output_bytes.seek(0)
-                
-                # Statistik aktualisieren
-                conversion_stats["total_conversions"] += 1
-                conversion_stats["successful"] += 1
-                logger.info(f"✅ Erfolgreiche Konvertierung: {source_format} -> {target_format}")
-                
+                render_start = time.perf_counter()
+                with span("convert", engine="pil", profile=profile):
+                    output_data, info = await conversion_engine.run(
+                        f"{RENDER_MODULE}:render_image", image_bytes.getvalue(), target_format, profile, current_trace() is not None,
+                        max_bytes
+                    )
+                CONVERSION_SECONDS.observe(time.perf_counter() - render_start, *labels)
+                # Stufen aus dem Worker-Prozess (decode, resize, optimize, encode)
+                for stage, stage_start, stage_end, _ in info["spans"] or ():
+                    record_span(stage, stage_start, stage_end)
+                log_event(event_logger, "image_info", "📊 Bildinfo: {format} {size} {mode}",
+                          format=info["format"], size=info["size"], mode=info["mode"])
+                if info["resized_to"]:
+                    width, height = info["resized_to"]
+                    log_event(event_logger, "image_resized", "🔄 Bild wurde auf {width}x{height} skaliert",
+                              width=width, height=height)
+                if info.get("frames"):
+                    log_event(event_logger, "animation_converted",
+                              "🎞️ Animation: {frames} Frames, {frames_written} geschrieben (Duplikate entfernt)",
+                              target=target_format, frames=info["frames"], frames_written=info["frames_written"])
+                ENCODES_PER_JOB.observe(info["encodes"], target_label)
+                if info.get("probe_encodes"):
+                    PROBE_ENCODES.inc(amount=info["probe_encodes"])
+                if info.get("fitted"):
+                    FITTED_OUTPUTS.inc(target_label)
+                    log_event(event_logger, "output_fitted",
+                              "📐 Ausgabe an {max_mb:.1f} MB angepasst: Qualität {quality}, Skalierung {scale}, {encodes} Kodierungen",
+                              target=target_format, max_mb=max_bytes / (1024 * 1024), quality=info["quality"] or "-",
+                              scale=info["scale"], encodes=info["encodes"], probe_encodes=info.get("probe_encodes", 0),
+                              bytes=len(output_data))
+
+                output_bytes = io.BytesIO(output_data)
+
+                log_event(event_logger, "conversion_succeeded", "✅ Erfolgreiche Konvertierung: {source} -> {target}",
+                          source=source_format, target=target_format, engine="pil", profile=profile,
+                          bytes=len(output_data))
+
                 # In Cache speichern
-                await update_cache(image_url, target_format, output_bytes)
-                
+                with span("cache_write"):
+                    await update_cache(cache_key, output_bytes)
+
+                ok = True
                 return output_bytes
-                
+
             except Exception as e:
-                logger.error(f"❌ PIL-Fehler bei der Konvertierung: {e}")
-                conversion_stats["total_conversions"] += 1
-                conversion_stats["failed"] += 1
-                return None
+                if source_format.lower() != "dds":
+                    log_event(event_logger, "conversion_failed", "❌ PIL-Fehler bei der Konvertierung: {error}",
+                              logging.ERROR, exc_info=True, source=source_format, target=target_format,
+                              engine="pil", error=str(e))
+                    return None
+                # Seltene DDS-Varianten, die PIL nicht dekodiert: ImageMagick versuchen
+                log_event(event_logger, "pil_fallback", "⚠️ DDS nicht mit PIL lesbar ({error}), versuche ImageMagick",
+                          logging.WARNING, source=source_format, target=target_format, error=str(e))
+        
+        # Spezielle Formate mit ImageMagick verarbeiten (Daten über Pipes, keine Zwischendateien)
+        render_start = time.perf_counter()
+        with span("convert", engine="imagemagick", profile=profile):
+            output_data = await convert_with_imagemagick(image_bytes.getvalue(), source_format, target_format, profile)
+        CONVERSION_SECONDS.observe(time.perf_counter() - render_start, *labels)
+        
+        if output_data is not None:
+            result = io.BytesIO(output_data)
+            log_event(event_logger, "conversion_succeeded", "✅ Erfolgreiche Konvertierung mit ImageMagick: {source} -> {target}",
+                      source=source_format, target=target_format, engine="imagemagick", profile=profile,
+                      bytes=len(output_data))
+            
+            # In Cache speichern
+            with span("cache_write"):
+                await update_cache(cache_key, result)
+            
+            ok = True
+            return result
+        else:
+            log_event(event_logger, "conversion_failed", "❌ ImageMagick-Konvertierung fehlgeschlagen: {source} -> {target}",
+                      logging.ERROR, source=source_format, target=target_format, engine="imagemagick")
+            return None
 
     except aiohttp.ClientError as e:
-        logger.error(f"❌ Netzwerkfehler: {e}")
-        conversion_stats["total_conversions"] += 1
-        conversion_stats["failed"] += 1
+        _log_failure("❌ Netzwerkfehler: {error}", e, labels)
+        return None
+    except ImageDownloadError as e:
+        _log_failure("❌ Downloadfehler: {error}", e, labels)
         return None
     except ImageFormatError as e:
-        logger.error(f"❌ Formatfehler: {e}")
-        conversion_stats["total_conversions"] += 1
-        conversion_stats["failed"] += 1
+        _log_failure("❌ Formatfehler: {error}", e, labels)
         return None
     except ImageSizeError as e:
-        logger.error(f"❌ Größenfehler: {e}")
-        conversion_stats["total_conversions"] += 1
-        conversion_stats["failed"] += 1
+        _log_failure("❌ Größenfehler: {error}", e, labels)
         return None
     except Exception as e:
-        logger.error(f"❌ Unerwarteter Fehler: {e}")
-        conversion_stats["total_conversions"] += 1
-        conversion_stats["failed"] += 1
+        # Unerwartet: mit vollständigem Traceback
+        _log_failure("❌ Unerwarteter Fehler: {error}", e, labels, exc_info=True)
         return None
     finally:
-        # Konversionszeit messen und statistik aktualisieren
+        # Gesamtdauer wird in convert_image als imagex_request_seconds erfasst
         conversion_time = time.time() - start_time
-        conversion_stats["conversion_times"].append(conversion_time)
-        
-        # Durchschnittliche Konversionszeit berechnen
-        if conversion_stats["conversion_times"]:
-            conversion_stats["avg_conversion_time"] = sum(conversion_stats["conversion_times"]) / len(conversion_stats["conversion_times"])
-            # Maximum 100 Zeitwerte speichern
-            if len(conversion_stats["conversion_times"]) > 100:
-                conversion_stats["conversion_times"] = conversion_stats["conversion_times"][-100:]
-        
-        logger.info(f"⏱️ Konvertierung in {conversion_time:.2f}s abgeschlossen")
+        log_event(event_logger, "conversion_finished", "⏱️ Konvertierung in {seconds:.2f}s abgeschlossen",
+                  source=source_label, target=target_label, seconds=conversion_time, ok=ok)
+
+def _log_failure(template: str, error: Exception, labels: Tuple[str, str], exc_info: bool = False) -> None:
+    """Fehler einer Konvertierung: immer vollständig, nie gesampelt."""
+    source, target = labels
+    log_event(event_logger, "conversion_failed", template, logging.ERROR, exc_info=exc_info,
+              source=source, target=target, error_type=type(error).__name__, error=str(error))
 
 # Hilfsfunktion zur Überprüfung, ob ImageMagick verfügbar ist
 async def check_imagemagick():
@@ -604,31 +861,22 @@ async def check_imagemagick():
             logger.info(f"✅ ImageMagick gefunden: {version}")
             return True
         else:
-            logger.warning("⚠️ ImageMagick nicht gefunden. DDS-Konvertierung wird nicht verfügbar sein.")
+            logger.warning("⚠️ ImageMagick nicht gefunden. PSD-, PDF-, EPS- und AI-Konvertierung wird nicht verfügbar sein.")
             return False
     except Exception:
-        logger.warning("⚠️ ImageMagick nicht gefunden. DDS-Konvertierung wird nicht verfügbar sein.")
+        logger.warning("⚠️ ImageMagick nicht gefunden. PSD-, PDF-, EPS- und AI-Konvertierung wird nicht verfügbar sein.")
         return False
 
 # Cache-Cleanup-Funktion
-async def cleanup_cache():
-    """Entfernt alte Einträge aus dem Cache."""
-    global image_cache, cache_timestamps
-    
-    # Einträge, die älter als 30 Minuten sind, entfernen
-    current_time = time.time()
-    urls_to_remove = []
-    
-    for url, timestamp in cache_timestamps.items():
-        if current_time - timestamp > 1800:  # 30 Minuten
-            urls_to_remove.append(url)
-    
-    for url in urls_to_remove:
-        if url in image_cache:
-            del image_cache[url]
-        del cache_timestamps[url]
+async def cleanup_cache(max_items: Optional[int] = 256):
+    """
+    Entfernt abgelaufene Einträge aus dem Cache (inkrementell).
     
-    logger.info(f"🧹 Cache bereinigt: {len(urls_to_remove)} Einträge entfernt, {len(image_cache)} verbleibend")
+    Args:
+        max_items: Maximale Anzahl zu entfernender Einträge pro Aufruf
+    """
+    removed = image_cache.sweep(max_items=max_items)
+    logger.info(f"🧹 Cache bereinigt: {removed} Einträge entfernt, {len(image_cache)} verbleibend")
 
 # Statistikfunktion
 def get_conversion_stats():
@@ -638,23 +886,46 @@ def get_conversion_stats():
     Returns:
         Dict: Statistiken über durchgeführte Konvertierungen
     """
-    stats = conversion_stats.copy()
-    stats["cache_size"] = len(image_cache)
-    stats["avg_conversion_time_ms"] = stats["avg_conversion_time"] * 1000 if "avg_conversion_time" in stats else 0
-    stats["success_rate"] = (stats["successful"] / stats["total_conversions"] * 100) if stats["total_conversions"] > 0 else 0
+    total = int(CONVERSIONS.total())
+    failed = int(CONVERSION_FAILURES.total())
+    stats = {
+        "total_conversions": total,
+        "successful": total - failed,
+        "failed": failed,
+        "total_size_processed": int(SOURCE_BYTES.total()),
+        "cache_hits_without_download": int(CACHE_HITS_WITHOUT_DOWNLOAD.total()),
+        "coalesced": int(COALESCED.total()),
+        # Aus den Histogramm-Buckets, unabhängig von der Anzahl der Konvertierungen
+        "avg_conversion_time": REQUEST_SECONDS.mean(),
+        "p50_conversion_time": REQUEST_SECONDS.quantile(0.5),
+        "p95_conversion_time": REQUEST_SECONDS.quantile(0.95)
+    }
+    for profile in ENCODER_PROFILES:
+        stats[f"profile_{profile}"] = int(PROFILE_USES.value(profile))
+    
+    stats.update(image_cache.get_stats())
+    if disk_cache is not None:
+        stats.update(disk_cache.get_stats())
+    stats.update(imagemagick_executor.get_status())
+    stats["avg_conversion_time_ms"] = stats["avg_conversion_time"] * 1000
+    stats["success_rate"] = (stats["successful"] / total * 100) if total > 0 else 0
     stats["total_size_processed_mb"] = stats["total_size_processed"] / 1024 / 1024
     
-    # Aktuelle Conversion Times entfernen (zu groß für Log/Anzeige)
-    if "conversion_times" in stats:
-        del stats["conversion_times"]
-    
     return stats
 
 # Initialisierungsfunktion
 async def init_converter():
-    """Initialisiert den Konverter und prüft Abhängigkeiten."""
+    """
+    Initialisiert den Konverter und prüft Abhängigkeiten.
+    
+    Läuft vor der Verbindung zum Gateway und wartet deshalb nur auf das Nötigste:
+    Die Worker-Prozesse laden die Bildpipeline im Hintergrund, ImageMagick-Check
+    und Festplatten-Cache laufen parallel.
+    """
+    global disk_cache, warm_up_task
+    
     # ImageMagick Check
-    has_imagemagick = await check_imagemagick()
+    imagemagick_check = asyncio.create_task(check_imagemagick())
     
     # Temp-Verzeichnis erstellen
     os.makedirs(TEMP_DIR, exist_ok=True)
@@ -670,5 +941,41 @@ async def init_converter():
         except Exception as e:
             logger.warning(f"⚠️ Fehler beim Bereinigen von {item_path}: {e}")
     
+    # Prozess-Pool für die Bildverarbeitung und HTTP-Session starten
+    conversion_engine.start()
+    get_http_session()
+    
+    # Festplatten-Cache öffnen (liest nur das Journal, nicht jede Datei)
+    if DISK_CACHE_MAX_MB > 0 and disk_cache is None:
+        try:
+            cache = DiskCache(DISK_CACHE_DIR, DISK_CACHE_MAX_MB * 1024 * 1024)
+            await asyncio.to_thread(cache.open)
+            disk_cache = cache
+        except OSError as e:
+            logger.warning(f"⚠️ Festplatten-Cache nicht verfügbar: {e}")
+    
+    has_imagemagick = await imagemagick_check
+    
+    # Worker-Prozesse erst jetzt starten: das Forken läuft dann, während der Bot
+    # auf die Antworten von Login und Gateway wartet
+    warm_up_task = asyncio.create_task(conversion_engine.warm_up())
     logger.info("🚀 Bild-Konverter initialisiert")
-    return has_imagemagick
\ No newline at end of file
+    return has_imagemagick
+
+async def shutdown_converter():
+    """Gibt die Ressourcen des Konverters frei (Prozess-Pool, HTTP-Session, Festplatten-Cache)."""
+    global http_session, disk_cache
+    
+    # Ausstehende Cache-Schreibvorgänge abschließen
+    if pending_disk_writes:
+        await asyncio.gather(*pending_disk_writes, return_exceptions=True)
+    if disk_cache is not None:
+        disk_cache.close()
+        disk_cache = None
+    
+    if http_session is not None and not http_session.closed:
+        await http_session.close()
+    http_session = None
+    
+    conversion_engine.shutdown()
+    logger.info("🛑 Bild-Konverter beendet")
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+DDS-Encoder für DXT1 (BC1) und DXT5 (BC3) mit NumPy.
+
+Die Blockkompression läuft vektorisiert über alle 4x4-Blöcke gleichzeitig, damit
+DDS-Ausgaben ohne ImageMagick-Prozess erzeugt werden können. Dekodiert wird
+weiterhin über Pillows DDS-Reader.
+"""
+
+import struct
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+# DDS-Header-Flags (siehe DDS_HEADER / DDS_PIXELFORMAT)
+DDSD_CAPS = 0x1
+DDSD_HEIGHT = 0x2
+DDSD_WIDTH = 0x4
+DDSD_PIXELFORMAT = 0x1000
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_LINEARSIZE = 0x80000
+DDPF_FOURCC = 0x4
+DDSCAPS_COMPLEX = 0x8
+DDSCAPS_TEXTURE = 0x1000
+DDSCAPS_MIPMAP = 0x400000
+
+# Bytes pro 4x4-Block
+BLOCK_SIZES = {"dxt1": 8, "dxt5": 16}
+
+# So viele Blöcke werden auf einmal verarbeitet (begrenzt den Speicherbedarf)
+BLOCKS_PER_CHUNK = 1 << 16
+
+# Lineare Farbstufe (0 = color1 ... 3 = color0) -> BC1-Index im 4-Farben-Modus
+_COLOR_INDEX = np.array([1, 3, 2, 0], dtype=np.uint32)
+
+# Lineare Alpha-Stufe (0 = Minimum ... 7 = Maximum) -> BC3-Index bei alpha0 > alpha1
+_ALPHA_INDEX = np.array([1, 7, 6, 5, 4, 3, 2, 0], dtype=np.uint64)
+
+
+def _to_blocks(pixels: np.ndarray) -> np.ndarray:
+    """Zerlegt ein (H, W, C)-Array in (Blöcke, 16, C); Ränder werden aufgefüllt."""
+    height, width, channels = pixels.shape
+    pad_h = (-height) % 4
+    pad_w = (-width) % 4
+    if pad_h or pad_w:
+        pixels = np.pad(pixels, ((0, pad_h), (0, pad_w), (0, 0)), mode="edge")
+        height, width = pixels.shape[:2]
+
+    blocks = pixels.reshape(height // 4, 4, width // 4, 4, channels).swapaxes(1, 2)
+    return blocks.reshape(-1, 16, channels)
+
+
+def _to_565(colors: np.ndarray) -> np.ndarray:
+    """RGB (0-255, float) -> gepacktes RGB565."""
+    r = np.clip(np.rint(colors[..., 0] * 31 / 255), 0, 31).astype(np.uint16)
+    g = np.clip(np.rint(colors[..., 1] * 63 / 255), 0, 63).astype(np.uint16)
+    b = np.clip(np.rint(colors[..., 2] * 31 / 255), 0, 31).astype(np.uint16)
+    return (r << 11) | (g << 5) | b
+
+
+def _from_565(packed: np.ndarray) -> np.ndarray:
+    """Gepacktes RGB565 -> RGB (0-255, float) wie beim Dekodieren auf der GPU."""
+    r = (packed >> 11) & 31
+    g = (packed >> 5) & 63
+    b = packed & 31
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1).astype(np.float32)
+
+
+def _encode_color_blocks(colors: np.ndarray) -> np.ndarray:
+    """
+    BC1-Farbblöcke (4-Farben-Modus) für (N, 16, 3)-Farben.
+
+    Die Endpunkte liegen auf der Hauptachse der Blockfarben (Potenziteration über
+    die Kovarianzmatrix), begrenzt durch die äußersten Projektionen.
+    """
+    count = colors.shape[0]
+    mean = colors.mean(axis=1, keepdims=True)
+    centered = colors - mean
+    covariance = np.matmul(centered.transpose(0, 2, 1), centered)
+
+    # Startvektor: Diagonale der Bounding-Box, dann einige Potenziterationen
+    axis = colors.max(axis=1) - colors.min(axis=1)
+    axis[np.all(axis == 0, axis=1)] = 1.0
+    for _ in range(4):
+        axis = np.matmul(covariance, axis[:, :, None])[:, :, 0]
+        norm = np.linalg.norm(axis, axis=1, keepdims=True)
+        axis = np.where(norm > 1e-6, axis / np.maximum(norm, 1e-6), 1 / np.sqrt(3))
+
+    projection = np.matmul(centered, axis[:, :, None])[:, :, 0]
+    low = mean[:, 0] + axis * projection.min(axis=1, keepdims=True)
+    high = mean[:, 0] + axis * projection.max(axis=1, keepdims=True)
+
+    color0 = _to_565(high)
+    color1 = _to_565(low)
+
+    # 4-Farben-Modus verlangt color0 > color1
+    swap = color0 < color1
+    color0, color1 = np.where(swap, color1, color0), np.where(swap, color0, color1)
+
+    # Die vier Palettenfarben liegen gleichmäßig auf einer Geraden; die nächste
+    # Farbe ergibt sich daher direkt aus der Projektion auf diese Gerade
+    end0 = _from_565(color0)
+    end1 = _from_565(color1)
+    direction = end0 - end1
+    length = np.maximum((direction * direction).sum(axis=1, keepdims=True), 1e-6)
+    position = np.matmul(colors - end1[:, None, :], direction[:, :, None])[:, :, 0] / length
+    indices = _COLOR_INDEX[np.clip(np.rint(position * 3), 0, 3).astype(np.intp)]
+    # Einfarbige Blöcke (color0 == color1) wären sonst im 3-Farben-Modus
+    indices[color0 == color1] = 0
+
+    shifts = np.arange(16, dtype=np.uint32) * 2
+    packed_indices = (indices << shifts).sum(axis=1, dtype=np.uint32)
+
+    out = np.empty((count, 8), dtype=np.uint8)
+    out[:, 0:2] = color0.astype("<u2").view(np.uint8).reshape(count, 2)
+    out[:, 2:4] = color1.astype("<u2").view(np.uint8).reshape(count, 2)
+    out[:, 4:8] = packed_indices.astype("<u4").view(np.uint8).reshape(count, 4)
+    return out
+
+
+def _encode_alpha_blocks(alpha: np.ndarray) -> np.ndarray:
+    """BC3-Alphablöcke (8-Stufen-Modus) für (N, 16)-Alphawerte."""
+    count = alpha.shape[0]
+    alpha0 = alpha.max(axis=1)
+    alpha1 = alpha.min(axis=1)
+    span = np.maximum(alpha0 - alpha1, 1)
+
+    linear = np.rint((alpha - alpha1[:, None]) * 7 / span[:, None]).astype(np.int64)
+    indices = _ALPHA_INDEX[np.clip(linear, 0, 7)]
+    indices[alpha0 == alpha1] = 0
+
+    shifts = np.arange(16, dtype=np.uint64) * 3
+    bits = (indices << shifts).sum(axis=1, dtype=np.uint64)
+
+    out = np.empty((count, 8), dtype=np.uint8)
+    out[:, 0] = alpha0
+    out[:, 1] = alpha1
+    out[:, 2:8] = bits.astype("<u8").view(np.uint8).reshape(count, 8)[:, :6]
+    return out
+
+
+def compress_image(img: Image.Image, compression: str = "dxt5") -> bytes:
+    """
+    Komprimiert eine einzelne Bildebene blockweise.
+
+    Args:
+        img: PIL Image-Objekt
+        compression: "dxt1" (BC1, ohne Alpha) oder "dxt5" (BC3, mit Alpha)
+
+    Returns:
+        bytes: Komprimierte Blöcke in Zeilenreihenfolge
+    """
+    if compression not in BLOCK_SIZES:
+        raise ValueError(f"Nicht unterstützte DDS-Kompression: {compression}")
+
+    pixels = np.asarray(img.convert("RGBA"))
+    blocks = _to_blocks(pixels)
+    chunks: List[bytes] = []
+
+    for start in range(0, blocks.shape[0], BLOCKS_PER_CHUNK):
+        chunk = blocks[start:start + BLOCKS_PER_CHUNK]
+        color = _encode_color_blocks(chunk[:, :, :3].astype(np.float32))
+        if compression == "dxt5":
+            alpha = _encode_alpha_blocks(chunk[:, :, 3].astype(np.int64))
+            chunks.append(np.concatenate([alpha, color], axis=1).tobytes())
+        else:
+            chunks.append(color.tobytes())
+
+    return b"".join(chunks)
+
+
+def mipmap_chain(img: Image.Image) -> List[Image.Image]:
+    """Alle Mipmap-Stufen bis 1x1, jeweils per Box-Filter aus der vorherigen Stufe."""
+    levels = [img]
+    while img.width > 1 or img.height > 1:
+        img = img.resize((max(1, img.width // 2), max(1, img.height // 2)), Image.BOX)
+        levels.append(img)
+    return levels
+
+
+def build_header(width: int, height: int, compression: str, mipmap_count: int) -> bytes:
+    """Erzeugt Magic und 124-Byte-DDS-Header."""
+    flags = DDSD_CAPS | DDSD_HEIGHT | DDSD_WIDTH | DDSD_PIXELFORMAT | DDSD_LINEARSIZE
+    caps = DDSCAPS_TEXTURE
+    if mipmap_count > 1:
+        flags |= DDSD_MIPMAPCOUNT
+        caps |= DDSCAPS_COMPLEX | DDSCAPS_MIPMAP
+
+    linear_size = max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * BLOCK_SIZES[compression]
+    pixel_format = struct.pack("<II4s5I", 32, DDPF_FOURCC, compression.upper().encode("ascii"), 0, 0, 0, 0, 0)
+
+    header = struct.pack("<7I", 124, flags, height, width, linear_size, 0, mipmap_count)
+    header += b"\0" * 44  # dwReserved1[11]
+    header += pixel_format
+    header += struct.pack("<5I", caps, 0, 0, 0, 0)
+    return b"DDS " + header
+
+
+def encode_dds(img: Image.Image, compression: str = "dxt5", mipmaps: bool = True) -> bytes:
+    """
+    Kodiert ein Bild als DDS-Textur.
+
+    Args:
+        img: PIL Image-Objekt
+        compression: "dxt1" (BC1) oder "dxt5" (BC3)
+        mipmaps: Vollständige Mipmap-Kette erzeugen
+
+    Returns:
+        bytes: Vollständige DDS-Datei
+    """
+    compression = compression.lower()
+    if compression not in BLOCK_SIZES:
+        raise ValueError(f"Nicht unterstützte DDS-Kompression: {compression}")
+
+    img = img.convert("RGBA")
+    levels = mipmap_chain(img) if mipmaps else [img]
+
+    parts = [build_header(img.width, img.height, compression, len(levels))]
+    parts.extend(compress_image(level, compression) for level in levels)
+    return b"".join(parts)
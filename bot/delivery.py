@@ -0,0 +1,273 @@
+import asyncio
+import io
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import discord
+
+from bot.config import UPLOAD_LIMIT_MB, PROGRESS_EDIT_INTERVAL
+from bot.events import log_event
+from bot.metrics import UPLOAD_SECONDS, WEBHOOK_CALLS, WEBHOOK_CALLS_SAVED
+from bot.tracing import span
+
+# Logger direkt ohne Import-Loop nutzen
+logger = logging.getLogger("bot")
+event_logger = logging.getLogger("queue")
+
+# Discord erlaubt höchstens 10 Anhänge pro Nachricht
+MAX_FILES_PER_MESSAGE = 10
+# Zeichenlimit einer Nachricht (mit etwas Reserve)
+MAX_MESSAGE_LENGTH = 1900
+
+UPLOAD_LIMIT_BYTES = UPLOAD_LIMIT_MB * 1024 * 1024
+
+
+def output_size(fp: io.IOBase) -> int:
+    """Größe einer Ausgabe (BytesIO oder MappedBlob) in Bytes."""
+    size = fp.seek(0, io.SEEK_END)
+    fp.seek(0)
+    return size
+
+
+def pack_uploads(sizes: List[Tuple[str, int]], limit: int = UPLOAD_LIMIT_BYTES,
+                 max_files: int = MAX_FILES_PER_MESSAGE) -> Tuple[List[List[str]], List[str]]:
+    """
+    Verteilt Ausgaben auf möglichst wenige Nachrichten. Eine neue Nachricht
+    beginnt nur, wenn die Summe der Dateigrößen das Upload-Limit (oder die
+    Anzahl erlaubter Anhänge) überschreiten würde.
+
+    Args:
+        sizes: (Schlüssel, Größe in Bytes) in Reihenfolge der Anfrage
+        limit: Upload-Limit pro Nachricht in Bytes
+        max_files: Anhänge pro Nachricht
+
+    Returns:
+        Tuple: (Gruppen von Schlüsseln, Schlüssel, die allein schon über dem Limit liegen)
+    """
+    groups: List[List[str]] = []
+    oversized: List[str] = []
+    current: List[str] = []
+    current_size = 0
+    for key, size in sizes:
+        if size > limit:
+            oversized.append(key)
+            continue
+        if current and (current_size + size > limit or len(current) >= max_files):
+            groups.append(current)
+            current, current_size = [], 0
+        current.append(key)
+        current_size += size
+    if current:
+        groups.append(current)
+    return groups, oversized
+
+
+class ConversionBatch:
+    """
+    Fasst alle Jobs eines /convert-Aufrufs zusammen.
+
+    Statt pro Datei eine Status- und eine Ergebnisnachricht zu schicken, wird die
+    erste Antwort der Interaction höchstens alle ``progress_interval`` Sekunden
+    mit dem Fortschritt bearbeitet. Sind alle Jobs fertig, gehen sämtliche
+    Ergebnisse in einer Nachricht mit mehreren Anhängen hinaus (aufgeteilt nur,
+    wenn das Upload-Limit überschritten wird).
+
+    Ablauf: ``add_job`` für jeden eingereihten Job, ``skip`` für übersprungene
+    Dateien, danach ``close``. Die Worker melden ``job_succeeded``/``job_failed``;
+    wer den letzten Job abschließt, liefert aus.
+    """
+
+    def __init__(self, interaction: discord.Interaction, target_format: str,
+                 upload_limit: int = UPLOAD_LIMIT_BYTES, progress_interval: float = PROGRESS_EDIT_INTERVAL,
+                 max_output_bytes: Optional[int] = None):
+        self.interaction = interaction
+        self.target_format = target_format
+        self.upload_limit = upload_limit
+        # Größenlimit pro Ausgabe für convert_image; nie größer als das Upload-Limit
+        self.max_output_bytes = min(max_output_bytes or upload_limit, upload_limit)
+        self.progress_interval = progress_interval
+        # task_id -> Dateiname der Quelle, in Reihenfolge der Anfrage
+        self.jobs: Dict[str, str] = {}
+        # task_id -> (Dateiname der Ausgabe, Datei-Objekt, Größe, Metrik-Labels)
+        self.outputs: Dict[str, Tuple[str, Any, int, Tuple[str, str]]] = {}
+        self.failures: Dict[str, str] = {}
+        self.skipped: List[Tuple[str, str]] = []
+        self.closed = False
+        self.delivered = False
+        self.started = time.monotonic()
+        # Webhook-Aufrufe dieser Anfrage und wie viele es früher gewesen wären
+        self.calls = 0
+        self.edits = 0
+        self.legacy_calls = 0
+        self._last_edit = self.started
+        self._progress_task: Optional[asyncio.Task] = None
+        self._delivered_event = asyncio.Event()
+
+    @property
+    def finished(self) -> int:
+        return len(self.outputs) + len(self.failures)
+
+    def add_job(self, task_id: str, filename: str) -> None:
+        self.jobs[task_id] = filename
+        # Bisher: "wird konvertiert" plus Ergebnis pro Datei
+        self.legacy_calls += 2
+
+    def skip(self, filename: str, reason: str) -> None:
+        """Datei, die gar nicht erst eingereiht wurde (bisher eine eigene Nachricht)."""
+        self.skipped.append((filename, reason))
+        self.legacy_calls += 1
+
+    async def close(self) -> None:
+        """Alle Jobs sind eingereiht; sind sie schon fertig, wird sofort ausgeliefert."""
+        self.closed = True
+        await self._maybe_deliver()
+
+    async def job_succeeded(self, task_id: str, filename: str, fp: Any, labels: Tuple[str, str]) -> None:
+        self.outputs[task_id] = (filename, fp, output_size(fp), labels)
+        await self._job_finished()
+
+    async def job_failed(self, task_id: str, error: str, legacy_calls: int = 1) -> None:
+        """
+        Args:
+            legacy_calls: Zusätzliche Nachrichten, die dieser Fehler bisher gekostet hat
+                (Fehler des letzten Versuchs plus "fehlgeschlagen nach N Versuchen")
+        """
+        self.failures[task_id] = error
+        self.legacy_calls += legacy_calls
+        await self._job_finished()
+
+    async def _job_finished(self) -> None:
+        if not await self._maybe_deliver():
+            self._schedule_progress()
+
+    async def _maybe_deliver(self) -> bool:
+        if self.delivered or not self.closed or self.finished < len(self.jobs):
+            return False
+        self.delivered = True
+        if self._progress_task is not None:
+            self._progress_task.cancel()
+        try:
+            await self.deliver()
+        finally:
+            self._delivered_event.set()
+        return True
+
+    async def wait(self) -> None:
+        """Wartet, bis alle Ergebnisse ausgeliefert sind (Worker-Prozesse, bot/worker.py)."""
+        await self._delivered_event.wait()
+
+    def _schedule_progress(self) -> None:
+        """Plant eine Bearbeitung der Fortschrittsnachricht, höchstens eine gleichzeitig."""
+        if self._progress_task is None or self._progress_task.done():
+            self._progress_task = asyncio.create_task(self._edit_progress())
+
+    async def _edit_progress(self) -> None:
+        delay = self._last_edit + self.progress_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.delivered:
+            return
+        await self._edit(self.render_progress())
+
+    async def _edit(self, content: str) -> None:
+        self._last_edit = time.monotonic()
+        self.calls += 1
+        self.edits += 1
+        WEBHOOK_CALLS.inc("edit")
+        try:
+            await self.interaction.edit_original_response(content=content)
+        except Exception as e:
+            logger.error(f"📤 Konnte Fortschrittsnachricht nicht bearbeiten: {e}")
+
+    def render_progress(self) -> str:
+        lines = [f"⏳ **{self.finished}/{len(self.jobs)} {_files(len(self.jobs))} nach `{self.target_format.upper()}` konvertiert...**"]
+        for task_id, filename in self.jobs.items():
+            if task_id in self.outputs:
+                lines.append(f"✅ `{filename}`")
+            elif task_id in self.failures:
+                lines.append(f"❌ `{filename}`")
+            else:
+                lines.append(f"⏳ `{filename}`")
+        return _truncate("\n".join(lines))
+
+    def render_summary(self, oversized: List[str], upload_errors: List[str]) -> str:
+        converted = len(self.outputs) - len(oversized) - len(upload_errors)
+        elapsed = time.monotonic() - self.started
+        icon = "✅" if converted else "❌"
+        lines = [f"{icon} **{converted}/{len(self.jobs)} {_files(len(self.jobs))} nach `{self.target_format.upper()}` konvertiert** ({elapsed:.1f}s)"]
+        for task_id, error in self.failures.items():
+            lines.append(f"❌ `{self.jobs[task_id]}`: {error}")
+        for filename in oversized:
+            lines.append(f"❌ `{filename}`: zu groß für den Upload (max. {self.upload_limit // (1024 * 1024)} MB)")
+        for filename in upload_errors:
+            lines.append(f"❌ `{filename}`: Upload fehlgeschlagen")
+        for filename, reason in self.skipped:
+            lines.append(f"⚠️ `{filename}` übersprungen: {reason}")
+        return _truncate("\n".join(lines))
+
+    async def deliver(self) -> None:
+        """Schickt alle Ergebnisse in so wenigen Nachrichten wie möglich."""
+        sizes = [(task_id, self.outputs[task_id][2]) for task_id in self.jobs if task_id in self.outputs]
+        groups, oversized = pack_uploads(sizes, self.upload_limit)
+        oversized_names = [self.outputs[task_id][0] for task_id in oversized]
+        upload_errors: List[str] = []
+        # Nicht hochgeladene Ausgaben; discord.py schließt nur die gesendeten Dateien,
+        # ein MappedBlob hielte sonst sein mmap bis zur Garbage Collection
+        unsent = list(oversized)
+
+        try:
+            summary = self.render_summary(oversized_names, upload_errors)
+            if not groups:
+                await self._followup(summary, [])
+            for index, group in enumerate(groups):
+                content = summary if index == 0 else f"📎 Teil {index + 1}/{len(groups)}"
+                if not await self._followup(content, group):
+                    upload_errors.extend(self.outputs[task_id][0] for task_id in group)
+                    unsent.extend(group)
+
+            # Die Fortschrittsnachricht soll nicht bei "2/4" stehen bleiben, und
+            # fehlgeschlagene Uploads müssen irgendwo sichtbar werden
+            if self.edits or upload_errors:
+                await self._edit(self.render_summary(oversized_names, upload_errors))
+        finally:
+            for task_id in unsent:
+                self.outputs[task_id][1].close()
+
+        saved = self.legacy_calls - self.calls
+        if saved > 0:
+            WEBHOOK_CALLS_SAVED.inc(amount=saved)
+        log_event(event_logger, "batch_delivered", "📦 {files} Ergebnisse in {calls} Webhook-Aufrufen ausgeliefert ({saved} gespart)",
+                  files=len(sizes), failed=len(self.failures), skipped=len(self.skipped),
+                  messages=len(groups), calls=self.calls, legacy_calls=self.legacy_calls, saved=saved)
+
+    async def _followup(self, content: str, group: List[str]) -> bool:
+        self.calls += 1
+        WEBHOOK_CALLS.inc("followup")
+        outputs = [self.outputs[task_id] for task_id in group]
+        upload_start = time.perf_counter()
+        files = [discord.File(fp, filename=filename) for filename, fp, _, _ in outputs]
+        try:
+            with span("upload", files=len(outputs)):
+                await self.interaction.followup.send(content, files=files)
+        except Exception as e:
+            logger.error(f"📤 Konnte Ergebnisse nicht senden: {e}")
+            # discord.File ersetzt fp.close(); erst File.close() stellt es wieder her
+            for file in files:
+                file.close()
+            return False
+        # Jede Datei war so lange unterwegs wie die ganze Nachricht
+        elapsed = time.perf_counter() - upload_start
+        for _, _, _, labels in outputs:
+            UPLOAD_SECONDS.observe(elapsed, *labels)
+        return True
+
+
+def _files(count: int) -> str:
+    return "Datei" if count == 1 else "Dateien"
+
+
+def _truncate(text: str) -> str:
+    if len(text) <= MAX_MESSAGE_LENGTH:
+        return text
+    return text[:MAX_MESSAGE_LENGTH - 1] + "…"
@@ -0,0 +1,311 @@
+import hashlib
+import io
+import logging
+import mmap
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Logger direkt ohne Import-Loop nutzen
+logger = logging.getLogger("bot")
+
+
+class MappedBlob(io.RawIOBase):
+    """
+    Lesbares, seekbares Dateiobjekt über einer per mmap eingeblendeten Cache-Datei.
+
+    Die Daten werden nicht in ein neues BytesIO kopiert: Lesezugriffe (z.B. durch
+    discord.File beim Upload) kommen direkt aus dem Page-Cache des Betriebssystems.
+    """
+
+    def __init__(self, mapped: mmap.mmap):
+        super().__init__()
+        self._mmap = mapped
+        self._view = memoryview(mapped)
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        size = min(len(buffer), len(self._view) - self._pos)
+        if size <= 0:
+            return 0
+        buffer[:size] = self._view[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._pos + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f"Ungültiger whence-Wert: {whence}")
+        self._pos = max(0, position)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def getbuffer(self) -> memoryview:
+        """Gibt eine Sicht auf die Daten ohne Kopie zurück."""
+        return self._view
+
+    def getvalue(self) -> bytes:
+        """Gibt die Daten als Bytes zurück (erzeugt eine Kopie)."""
+        return bytes(self._view)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+            self._mmap.close()
+        super().close()
+
+
+class DiskCache:
+    """
+    Persistente zweite Cache-Stufe auf der lokalen Festplatte.
+
+    Aufbau des Verzeichnisses:
+        blobs/      Eine Datei pro Eintrag, Name = Hash des Cache-Schlüssels
+        tmp/        Halbfertige Schreibvorgänge (werden beim Start verworfen)
+        index.log   Append-only Journal ("P <name> <größe>" / "D <name>")
+
+    Schreiben ist absturzsicher: Daten landen zuerst in tmp/, werden per fsync
+    gesichert und dann atomar nach blobs/ umbenannt; erst danach folgt der
+    Journal-Eintrag. Beim Start wird nur das Journal gelesen, nicht jede Datei.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+
+        self._blob_dir = os.path.join(directory, "blobs")
+        self._tmp_dir = os.path.join(directory, "tmp")
+        self._index_path = os.path.join(directory, "index.log")
+
+        # Name -> Größe in Bytes, Reihenfolge = LRU
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._journal = None
+        self._journal_lines = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writes = 0
+
+    def open(self) -> None:
+        """Legt die Verzeichnisse an und lädt den Index aus dem Journal."""
+        start_time = time.time()
+        os.makedirs(self._blob_dir, exist_ok=True)
+
+        # Abgebrochene Schreibvorgänge verwerfen
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+        self._load_index()
+        self._remove_orphans()
+        self._journal = open(self._index_path, "a", encoding="ascii")
+
+        # Budget könnte seit dem letzten Lauf verkleinert worden sein
+        with self._lock:
+            self._evict_locked()
+
+        logger.info(
+            f"💽 Festplatten-Cache geladen: {len(self._entries)} Einträge, "
+            f"{self.current_bytes / 1024 / 1024:.1f} MB in {(time.time() - start_time) * 1000:.0f}ms"
+        )
+
+    def close(self) -> None:
+        """Sichert das Journal per fsync und schließt es."""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
+
+    def _load_index(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+        self._journal_lines = 0
+
+        if not os.path.exists(self._index_path):
+            return
+
+        with open(self._index_path, "r", encoding="ascii", errors="replace") as journal:
+            for line in journal:
+                # Unvollständige letzte Zeile nach einem Absturz ignorieren
+                if not line.endswith("\n"):
+                    break
+                parts = line.split()
+                self._journal_lines += 1
+                if len(parts) == 3 and parts[0] == "P" and parts[2].isdigit():
+                    name, size = parts[1], int(parts[2])
+                    if name in self._entries:
+                        self.current_bytes -= self._entries.pop(name)
+                    self._entries[name] = size
+                    self.current_bytes += size
+                elif len(parts) == 2 and parts[0] == "D" and parts[1] in self._entries:
+                    self.current_bytes -= self._entries.pop(parts[1])
+
+    def _remove_orphans(self) -> None:
+        """
+        Löscht Dateien in blobs/ ohne Journal-Eintrag. Sie entstehen, wenn der
+        Prozess zwischen Umbenennen und Journal-Eintrag (oder vor dem Sichern
+        des Journals) endet, und würden sonst nie wieder freigegeben.
+        """
+        removed = 0
+        with os.scandir(self._blob_dir) as blobs:
+            for blob in blobs:
+                name, ext = os.path.splitext(blob.name)
+                if ext == ".bin" and name in self._entries:
+                    continue
+                try:
+                    os.unlink(blob.path)
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"🧹 {removed} verwaiste Dateien aus dem Festplatten-Cache entfernt")
+
+    @staticmethod
+    def _blob_name(key: str) -> str:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _blob_path(self, name: str) -> str:
+        return os.path.join(self._blob_dir, f"{name}.bin")
+
+    def get(self, key: str) -> Optional[MappedBlob]:
+        """
+        Liefert einen Eintrag als eingeblendete Datei.
+
+        Args:
+            key: Cache-Schlüssel
+
+        Returns:
+            Optional[MappedBlob]: Dateiobjekt über den Daten oder None
+        """
+        name = self._blob_name(key)
+
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+
+        try:
+            with open(self._blob_path(name), "rb") as blob_file:
+                mapped = mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Datei fehlt oder ist leer - Index korrigieren
+            with self._lock:
+                if name in self._entries:
+                    self.current_bytes -= self._entries.pop(name)
+                    self._append_journal_locked(f"D {name}")
+                self.misses += 1
+            return None
+
+        self.hits += 1
+        return MappedBlob(mapped)
+
+    def put(self, key: str, data: bytes) -> bool:
+        """
+        Speichert einen Eintrag absturzsicher. Blockiert (fsync) und sollte daher
+        außerhalb des Event-Loops aufgerufen werden.
+
+        Args:
+            key: Cache-Schlüssel
+            data: Zu speichernde Daten
+
+        Returns:
+            bool: True, wenn der Eintrag gespeichert wurde
+        """
+        if not data or len(data) > self.max_bytes or self._journal is None:
+            return False
+
+        name = self._blob_name(key)
+        tmp_path = os.path.join(self._tmp_dir, f"{name}.{threading.get_ident()}")
+
+        with open(tmp_path, "wb") as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, self._blob_path(name))
+
+        with self._lock:
+            if name in self._entries:
+                self.current_bytes -= self._entries.pop(name)
+            self._entries[name] = len(data)
+            self.current_bytes += len(data)
+            self._append_journal_locked(f"P {name} {len(data)}")
+            self._evict_locked()
+            self.writes += 1
+
+            # Journal verdichten, wenn es deutlich mehr Zeilen als Einträge hat
+            if self._journal_lines > 2 * len(self._entries) + 1000:
+                self._compact_locked()
+
+        return True
+
+    def _evict_locked(self) -> None:
+        while self.current_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            try:
+                os.unlink(self._blob_path(name))
+            except FileNotFoundError:
+                pass
+            self._append_journal_locked(f"D {name}")
+            self.evictions += 1
+
+    def _append_journal_locked(self, line: str) -> None:
+        if self._journal is None:
+            return
+        self._journal.write(line + "\n")
+        self._journal.flush()
+        self._journal_lines += 1
+
+    def _compact_locked(self) -> None:
+        tmp_index = os.path.join(self._tmp_dir, "index.log")
+        with open(tmp_index, "w", encoding="ascii") as compacted:
+            for name, size in self._entries.items():
+                compacted.write(f"P {name} {size}\n")
+            compacted.flush()
+            os.fsync(compacted.fileno())
+
+        # Alte Zeilen sichern, falls die Umbenennung nicht mehr ankommt
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal.close()
+        os.replace(tmp_index, self._index_path)
+        self._journal = open(self._index_path, "a", encoding="ascii")
+        self._journal_lines = len(self._entries)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Gibt Zähler und Auslastung des Festplatten-Caches zurück."""
+        return {
+            "disk_cache_size": len(self._entries),
+            "disk_cache_bytes": self.current_bytes,
+            "disk_cache_max_bytes": self.max_bytes,
+            "disk_cache_hits": self.hits,
+            "disk_cache_misses": self.misses,
+            "disk_cache_evictions": self.evictions,
+            "disk_cache_writes": self.writes
+        }
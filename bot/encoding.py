@@ -0,0 +1,97 @@
+"""
+Encoder-Einstellungen und Zielgrößen, geteilt vom Bot-Prozess (bot/converter.py,
+ImageMagick-Aufrufe) und den Worker-Prozessen (bot/render.py). Ohne Abhängigkeiten,
+damit die Worker beim Import weder aiohttp noch die Metriken laden.
+"""
+
+from typing import Any, Dict, Tuple
+
+# Maximale Bildgröße
+MAX_DIMENSIONS = (4000, 4000)      # 4000x4000 Pixel
+
+# Qualitätseinstellungen für verschiedene Formate
+QUALITY_SETTINGS = {
+    "jpg": 90,
+    "jpeg": 90,
+    "webp": 85,
+    "png": 9  # Komprimierungslevel für PNG
+}
+
+# Encoder-Aufwand pro Profil. Die Qualität bleibt gleich, nur die Kompressions-
+# Anstrengung ändert sich: "max" spart ein paar Prozent Bytes, kostet aber ein
+# Vielfaches an CPU-Zeit.
+ENCODER_PROFILES = {
+    "fast": {
+        "jpg": {"optimize": False},
+        "png": {"optimize": False, "compress_level": 1},
+        "webp": {"method": 2}
+    },
+    "balanced": {
+        "jpg": {"optimize": True},
+        "png": {"optimize": False, "compress_level": 6},
+        "webp": {"method": 4}
+    },
+    "max": {
+        "jpg": {"optimize": True},
+        "png": {"optimize": True, "compress_level": QUALITY_SETTINGS["png"]},
+        "webp": {"method": 6}
+    }
+}
+DEFAULT_ENCODER_PROFILE = "max"
+
+def fit_within(size: Tuple[int, int], max_dimensions: Tuple[int, int] = MAX_DIMENSIONS) -> Tuple[int, int]:
+    """
+    Berechnet die Zielgröße, damit ein Bild in die maximalen Dimensionen passt.
+    
+    Args:
+        size: Aktuelle Breite und Höhe
+        max_dimensions: Tuple mit maximaler Breite und Höhe
+        
+    Returns:
+        Tuple[int, int]: Neue Größe oder ``size``, wenn das Bild bereits passt
+    """
+    width, height = size
+    max_width, max_height = max_dimensions
+    
+    if width <= max_width and height <= max_height:
+        return size
+    
+    # Seitenverhältnis beibehalten
+    aspect_ratio = width / height
+    
+    if width > max_width:
+        width = max_width
+        height = int(width / aspect_ratio)
+    
+    if height > max_height:
+        height = max_height
+        width = int(height * aspect_ratio)
+    
+    return width, height
+
+def get_save_options(target_format: str, profile: str = DEFAULT_ENCODER_PROFILE) -> Dict[str, Any]:
+    """
+    Liefert die Format-spezifischen Speicheroptionen für PIL.
+
+    Args:
+        target_format: Zielformat
+        profile: Encoder-Profil ("fast", "balanced" oder "max")
+
+    Returns:
+        Dict: Optionen für Image.save()
+    """
+    save_options = {}
+    effort = ENCODER_PROFILES.get(profile, ENCODER_PROFILES[DEFAULT_ENCODER_PROFILE])
+
+    if target_format.lower() in ["jpg", "jpeg"]:
+        save_options["quality"] = QUALITY_SETTINGS.get("jpg", 90)
+        save_options.update(effort["jpg"])
+    elif target_format.lower() == "png":
+        save_options.update(effort["png"])
+    elif target_format.lower() == "webp":
+        save_options["quality"] = QUALITY_SETTINGS.get("webp", 85)
+        save_options.update(effort["webp"])
+    elif target_format.lower() == "gif":
+        save_options["optimize"] = True
+
+    return save_options
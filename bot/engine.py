@@ -0,0 +1,147 @@
+import asyncio
+import importlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Sequence, Union
+
+from bot.config import MAX_CONCURRENT_CONVERSIONS
+
+# Logger direkt ohne Import-Loop nutzen
+logger = logging.getLogger("bot")
+
+
+def resolve(name: str) -> Callable[..., Any]:
+    """Löst eine Funktionsreferenz der Form ``"paket.modul:funktion"`` auf."""
+    module_name, _, attribute = name.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def call_by_name(name: str, *args: Any) -> Any:
+    """
+    Ruft eine Funktion per Name im Worker-Prozess auf. So muss der Bot-Prozess
+    das Modul (und dessen Abhängigkeiten wie Pillow oder NumPy) nie importieren.
+    """
+    return resolve(name)(*args)
+
+
+def preload_modules(modules: Sequence[str]) -> None:
+    """Initializer der Worker: importiert die Module vor dem ersten Job."""
+    for module_name in modules:
+        importlib.import_module(module_name)
+
+
+def _ready() -> bool:
+    return True
+
+
+class ConversionEngine:
+    """
+    Führt die CPU-intensive Bildverarbeitung (Dekodieren, Skalieren,
+    Optimieren, Kodieren) in einem Prozess-Pool aus.
+
+    Der Event-Loop wartet nur noch auf das Ergebnis, sodass Gateway-Heartbeat,
+    Slash-Command-Antworten und andere Konvertierungen nicht blockiert werden.
+
+    Module aus ``preload`` importieren die Worker gleich beim Start, nicht der
+    Bot-Prozess; Funktionen daraus werden per Name (``"modul:funktion"``) an
+    ``run`` übergeben.
+    """
+
+    def __init__(self, max_workers: int = MAX_CONCURRENT_CONVERSIONS, preload: Sequence[str] = ()):
+        self.max_workers = max(1, max_workers)
+        self.preload = tuple(preload)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.active_jobs = 0
+        self.completed_jobs = 0
+        self.failed_jobs = 0
+
+    @property
+    def running(self) -> bool:
+        """True, wenn der Prozess-Pool gestartet ist."""
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Startet den Prozess-Pool, falls er noch nicht läuft."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, initializer=preload_modules, initargs=(self.preload,)
+            )
+            logger.info(f"⚙️ Konvertierungs-Engine gestartet mit {self.max_workers} Worker-Prozessen")
+
+    async def warm_up(self) -> None:
+        """
+        Startet die Worker-Prozesse und lässt sie ``preload`` importieren, bevor
+        der erste Job kommt. Läuft beim Start im Hintergrund, damit der Bot
+        nicht darauf wartet, bevor er sich mit dem Gateway verbindet.
+        """
+        if self._executor is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            # Ein Aufruf pro Worker (zählt nicht als Job); er läuft erst nach dem Initializer
+            await asyncio.gather(*(loop.run_in_executor(self._executor, _ready) for _ in range(self.max_workers)))
+        except Exception as e:
+            logger.warning(f"⚠️ Vorwärmen der Worker-Prozesse fehlgeschlagen: {e}")
+            return
+        elapsed = loop.time() - start
+        logger.info(f"⚙️ Worker-Prozesse bereit nach {elapsed:.2f}s")
+
+    async def run(self, func: Union[str, Callable[..., Any]], *args: Any) -> Any:
+        """
+        Führt eine Funktion in einem Worker-Prozess aus.
+
+        Args:
+            func: Modulweite (picklebare) Funktion oder ihr Name als ``"modul:funktion"``
+            *args: Picklebare Argumente für die Funktion
+
+        Returns:
+            Der Rückgabewert der Funktion
+        """
+        if self._executor is None:
+            self.start()
+        if isinstance(func, str):
+            func, args = call_by_name, (func, *args)
+
+        loop = asyncio.get_running_loop()
+        self.active_jobs += 1
+        try:
+            result = await loop.run_in_executor(self._executor, func, *args)
+            self.completed_jobs += 1
+            return result
+        except BrokenProcessPool:
+            # Ein Worker ist abgestürzt (z.B. OOM-Kill) - Pool für folgende Jobs neu aufbauen
+            self.failed_jobs += 1
+            logger.error("💥 Worker-Prozess abgestürzt, Prozess-Pool wird neu gestartet")
+            self.shutdown(wait=False)
+            self.start()
+            raise
+        except Exception:
+            self.failed_jobs += 1
+            raise
+        finally:
+            self.active_jobs -= 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Beendet den Prozess-Pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+            logger.info("🛑 Konvertierungs-Engine beendet")
+
+    def worker_pids(self) -> list:
+        """PIDs der laufenden Worker-Prozesse (z.B. für Speichermessungen)."""
+        if self._executor is None:
+            return []
+        return [process.pid for process in (self._executor._processes or {}).values()]
+
+    def get_status(self) -> dict:
+        """Gibt Statusinformationen über den Prozess-Pool zurück."""
+        return {
+            "workers": self.max_workers,
+            "running": self.running,
+            "active_jobs": self.active_jobs,
+            "completed_jobs": self.completed_jobs,
+            "failed_jobs": self.failed_jobs
+        }
@@ -0,0 +1,166 @@
+import datetime
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from bot.config import LOG_FORMAT, LOG_SAMPLE_RATES, LOG_EVENT_RATE_LIMIT
+
+# Standard-Sampling für häufige Erfolgs-Ereignisse (1.0 = immer), nur bei
+# LOG_FORMAT=json. Über LOG_SAMPLE_RATES ("ereignis=rate,...") einzeln überschreibbar.
+DEFAULT_SAMPLE_RATES = {
+    "format_detected": 0.1,
+    "image_info": 0.1,
+    "image_resized": 0.1,
+    "cache_hit": 0.1,
+    "cache_stored": 0.1,
+    "coalesced": 0.1,
+    "imagemagick_usage": 0.1,
+    "conversion_succeeded": 0.1,
+    "conversion_finished": 0.1,
+    "job_started": 0.1,
+    "job_succeeded": 0.1
+}
+
+
+class EventMessage:
+    """
+    Strukturierte Log-Nachricht: Ereignisname, Textvorlage und Felder.
+
+    Felder dürfen Funktionen ohne Argumente sein; sie werden erst ausgewertet,
+    wenn das Ereignis tatsächlich geschrieben wird. Der Text entsteht erst im
+    Schreib-Thread (``str()`` durch den Formatter).
+    """
+
+    __slots__ = ("event", "template", "fields", "_resolved")
+
+    def __init__(self, event: str, template: str, fields: Dict[str, Any]):
+        self.event = event
+        self.template = template
+        self.fields = fields
+        self._resolved = False
+
+    def resolve(self) -> Dict[str, Any]:
+        """Wertet verzögerte Felder aus (einmalig, im Thread des Aufrufers)."""
+        if not self._resolved:
+            for key, value in self.fields.items():
+                if callable(value):
+                    self.fields[key] = value()
+            self._resolved = True
+        return self.fields
+
+    def __str__(self) -> str:
+        fields = self.resolve()
+        try:
+            return self.template.format(**fields)
+        except (KeyError, IndexError, ValueError):
+            return f"{self.template} {fields}"
+
+
+class EventSampler:
+    """
+    Entscheidet, ob ein Erfolgs-Ereignis geschrieben wird: zuerst per
+    Zufalls-Sampling (Rate pro Ereignis), dann über eine Obergrenze pro Sekunde
+    und Ereignis, damit das Log-Volumen auch bei hohem Durchsatz flach bleibt.
+    """
+
+    def __init__(self, rates: Dict[str, float], rate_limit: float = LOG_EVENT_RATE_LIMIT):
+        self.rates = rates
+        self.rate_limit = rate_limit
+        self.emitted: Dict[str, int] = {}
+        self.suppressed: Dict[str, int] = {}
+        # Ereignis -> (Sekunde, Anzahl in dieser Sekunde)
+        self._windows: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def rate(self, event: str) -> float:
+        return self.rates.get(event, 1.0)
+
+    def allow(self, event: str) -> bool:
+        rate = self.rate(event)
+        allowed = rate >= 1.0 or (rate > 0 and random.random() < rate)
+
+        if allowed and self.rate_limit > 0:
+            second = int(time.monotonic())
+            with self._lock:
+                window_second, count = self._windows.get(event, (second, 0))
+                if window_second != second:
+                    count = 0
+                allowed = count < self.rate_limit
+                self._windows[event] = (second, count + 1 if allowed else count)
+
+        counter = self.emitted if allowed else self.suppressed
+        counter[event] = counter.get(event, 0) + 1
+        return allowed
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {"emitted": dict(self.emitted), "suppressed": dict(self.suppressed)}
+
+
+def _parse_rates(spec: str, defaults: Dict[str, float]) -> Dict[str, float]:
+    rates = dict(defaults)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        try:
+            rates[name.strip()] = max(0.0, min(1.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+# Im Textformat liest ein Mensch mit: dort fehlt ohne ausdrückliche Raten keine Zeile
+sampler = EventSampler(_parse_rates(LOG_SAMPLE_RATES, DEFAULT_SAMPLE_RATES if LOG_FORMAT == "json" else {}))
+
+
+def log_event(logger: logging.Logger, event: str, template: str, level: int = logging.INFO,
+              exc_info: Any = None, **fields: Any) -> None:
+    """
+    Schreibt ein strukturiertes Ereignis.
+
+    Nichts wird formatiert oder ausgewertet, wenn das Level gefiltert wird oder
+    das Sampling das Ereignis verwirft. WARNING und höher werden nie gesampelt.
+
+    Args:
+        logger: Ziel-Logger
+        event: Ereignisname (Schlüssel für das Sampling, Feld "event" im JSON)
+        template: Textvorlage mit {feld}-Platzhaltern für die Textausgabe
+        level: Log-Level
+        exc_info: Wie bei logging (z.B. True innerhalb von except)
+        **fields: Felder; Funktionen ohne Argumente werden verzögert ausgewertet
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if level < logging.WARNING and not sampler.allow(event):
+        return
+
+    rate = sampler.rate(event)
+    if level < logging.WARNING and rate < 1.0:
+        fields["sample_rate"] = rate
+    logger.log(level, EventMessage(event, template, fields), exc_info=exc_info, stacklevel=2)
+
+
+class JsonFormatter(logging.Formatter):
+    """Eine JSON-Zeile pro Eintrag; strukturierte Ereignisse behalten ihre Felder."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name
+        }
+        message: Optional[EventMessage] = record.msg if isinstance(record.msg, EventMessage) else None
+        if message is not None:
+            data["event"] = message.event
+            data["msg"] = str(message)
+            for key, value in message.resolve().items():
+                data.setdefault(key, value)
+        else:
+            data["msg"] = record.getMessage()
+
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from bot.config import CONVERSION_TIMEOUT, MAX_EXTERNAL_PROCESSES
+
+# Logger direkt ohne Import-Loop nutzen
+logger = logging.getLogger("bot")
+
+
+class ToolResult:
+    """Ergebnis eines externen Programmaufrufs."""
+
+    __slots__ = ("returncode", "stdout", "stderr", "wall_time", "cpu_time", "timed_out")
+
+    def __init__(self, returncode: int, stdout: bytes, stderr: bytes,
+                 wall_time: float, cpu_time: float, timed_out: bool):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.timed_out = timed_out
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+class ExternalToolExecutor:
+    """
+    Führt externe Programme (ImageMagick, Ghostscript als dessen Delegate) kontrolliert aus.
+
+    - Höchstens ``max_processes`` Aufrufe laufen gleichzeitig, der Rest wartet.
+    - Jeder Prozess bekommt nur ``threads_per_process`` Threads (OpenMP), sodass
+      alle zusammen nicht mehr Threads als CPU-Kerne belegen.
+    - Prozesse laufen in einer eigenen Prozessgruppe und werden nach ``timeout``
+      Sekunden samt Kindprozessen (z.B. hängendes Ghostscript) beendet.
+    - Wand- und CPU-Zeit jedes Aufrufs werden über wait4() erfasst und schließen
+      die vom Programm selbst gestarteten Kindprozesse mit ein.
+    """
+
+    def __init__(self, max_processes: int = MAX_EXTERNAL_PROCESSES, timeout: float = CONVERSION_TIMEOUT):
+        self.max_processes = max(1, max_processes)
+        self.timeout = timeout
+        self.threads_per_process = max(1, (os.cpu_count() or 1) // self.max_processes)
+        self._semaphore = asyncio.Semaphore(self.max_processes)
+
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.active = 0
+        self.waiting = 0
+        self.total_wall_time = 0.0
+        self.total_cpu_time = 0.0
+
+    def environment(self) -> Dict[str, str]:
+        """Umgebung für Kindprozesse mit begrenzter Thread-Anzahl."""
+        env = dict(os.environ)
+        threads = str(self.threads_per_process)
+        env["OMP_NUM_THREADS"] = threads
+        env["MAGICK_THREAD_LIMIT"] = threads
+        return env
+
+    async def run(self, cmd: List[str], input_data: Optional[bytes] = None,
+                  pass_fds: Sequence[int] = ()) -> ToolResult:
+        """
+        Führt ein Programm aus, sobald ein Platz frei ist.
+
+        Args:
+            cmd: Programm und Argumente
+            input_data: Daten für stdin (None = kein stdin)
+            pass_fds: Zusätzliche Dateideskriptoren, die der Prozess erbt
+
+        Returns:
+            ToolResult: Rückgabecode, Ausgaben und Laufzeiten
+
+        Raises:
+            OSError: Wenn das Programm nicht gestartet werden konnte
+        """
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            start_time = time.perf_counter()
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE if input_data is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                pass_fds=tuple(pass_fds),
+                env=self.environment(),
+                start_new_session=True
+            )
+
+            # Ab "finished" darf kein killpg mehr kommen: nach dem Ernten könnte die
+            # PID (und damit die Prozessgruppe) schon neu vergeben sein
+            guard = threading.Lock()
+            finished = threading.Event()
+            try:
+                result = await asyncio.to_thread(self._communicate, process, input_data, start_time, guard, finished)
+            except asyncio.CancelledError:
+                # Aufrufer bricht ab - Prozess nicht weiterlaufen lassen
+                self._kill(process, guard, finished)
+                raise
+
+            self.runs += 1
+            self.total_wall_time += result.wall_time
+            self.total_cpu_time += result.cpu_time
+            if result.timed_out:
+                self.timeouts += 1
+                logger.warning(f"⏱️ {os.path.basename(cmd[0])} nach {self.timeout}s abgebrochen")
+            elif result.returncode != 0:
+                self.failures += 1
+            return result
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def _communicate(self, process: subprocess.Popen, input_data: Optional[bytes], start_time: float,
+                     guard: threading.Lock, finished: threading.Event) -> ToolResult:
+        """Blockierender Teil: Ein-/Ausgabe pumpen, Timeout überwachen, mit wait4 ernten."""
+        output = {}
+
+        def read(name, pipe):
+            output[name] = pipe.read()
+            pipe.close()
+
+        def write(pipe, data):
+            try:
+                pipe.write(data)
+            except (BrokenPipeError, OSError):
+                pass
+            finally:
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+
+        threads = [
+            threading.Thread(target=read, args=("stdout", process.stdout), daemon=True),
+            threading.Thread(target=read, args=("stderr", process.stderr), daemon=True)
+        ]
+        if input_data is not None:
+            threads.append(threading.Thread(target=write, args=(process.stdin, input_data), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        timed_out = threading.Event()
+
+        def on_timeout():
+            if self._kill(process, guard, finished):
+                timed_out.set()
+
+        timer = threading.Timer(self.timeout, on_timeout)
+        timer.daemon = True
+        timer.start()
+        try:
+            # Erst ohne Ernten warten: als Zombie hält der Prozess seine PID, bis
+            # "finished" gesetzt ist und kein killpg mehr nachkommen kann
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            with guard:
+                finished.set()
+            # wait4 statt Popen.wait, um die Ressourcennutzung des Prozesses zu erhalten
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+        finally:
+            timer.cancel()
+
+        for thread in threads:
+            thread.join()
+
+        return ToolResult(
+            returncode=process.returncode,
+            stdout=output.get("stdout", b""),
+            stderr=output.get("stderr", b""),
+            wall_time=time.perf_counter() - start_time,
+            cpu_time=usage.ru_utime + usage.ru_stime,
+            timed_out=timed_out.is_set()
+        )
+
+    @staticmethod
+    def _kill(process: subprocess.Popen, guard: threading.Lock, finished: threading.Event) -> bool:
+        """
+        Beendet den Prozess und alle seine Kindprozesse, solange er noch nicht beendet ist.
+
+        Returns:
+            bool: False, wenn der Prozess schon beendet war
+        """
+        with guard:
+            if finished.is_set():
+                return False
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            return True
+
+    def get_status(self) -> Dict[str, float]:
+        """Gibt Zähler und Laufzeiten der externen Aufrufe zurück."""
+        return {
+            "external_max_processes": self.max_processes,
+            "external_threads_per_process": self.threads_per_process,
+            "external_active": self.active,
+            "external_waiting": self.waiting,
+            "external_runs": self.runs,
+            "external_failures": self.failures,
+            "external_timeouts": self.timeouts,
+            "external_wall_time": round(self.total_wall_time, 2),
+            "external_cpu_time": round(self.total_cpu_time, 2)
+        }
@@ -0,0 +1,180 @@
+import math
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+# Verlustbehaftete Zielformate: hier wird zuerst die Qualität gesenkt, dann skaliert
+LOSSY_FORMATS = {"jpg", "jpeg", "webp"}
+
+# Formate, deren Ausgabe ohnehin klein ist (ICO: höchstens 256x256)
+FIT_EXEMPT_FORMATS = {"ico"}
+
+# Zielgröße mit Sicherheitsabstand zum Limit, damit Vorhersagefehler selten eine
+# weitere Kodierung kosten
+FIT_TARGET_RATIO = 0.92
+
+# Untergrenze der Qualität, bevor stattdessen verkleinert wird
+MIN_FIT_QUALITY = 40
+# Abbruch der Qualitätssuche, wenn das Intervall so klein ist
+QUALITY_TOLERANCE = 2
+
+# Höchstzahl vollständiger Kodierungen pro Bild
+MAX_FIT_ENCODES = 5
+
+# Pixelzahl der verkleinerten Probe, an der die Ausgabegröße vorhergesagt wird
+PROBE_PIXELS = 512 * 512
+# Zweite Probe nur, wenn die erste Schätzung über diesem Anteil der Zielgröße liegt
+SECOND_PROBE_MARGIN = 0.5
+
+def scale_image(img: Image.Image, scale: float) -> Image.Image:
+    """Verkleinert ein Bild um ``scale`` (Kantenlänge); Paletten-Bilder per NEAREST."""
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    if size == img.size:
+        return img
+    if img.mode in ("P", "1"):
+        return img.resize(size, Image.NEAREST)
+    return img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+
+def raw_size_bound(img: Image.Image) -> float:
+    """
+    Obergrenze der Ausgabegröße für jedes Zielformat: 4 Bytes pro Pixel plus
+    Reserve für Header, Filterbytes (PNG) und Mipmaps (DDS).
+    """
+    return img.width * img.height * 4 * 1.34 + 64 * 1024
+
+
+def fit_to_size(source: Image.Image,
+                prepare: Callable[[Image.Image], Image.Image],
+                encode: Callable[[Image.Image, Optional[int]], bytes],
+                max_bytes: int, quality: Optional[int] = None) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Kodiert ein Bild so, dass die Ausgabe höchstens ``max_bytes`` groß wird.
+
+    Die Größe wird an einer verkleinerten Probe (etwa PROBE_PIXELS Pixel)
+    vorhergesagt, deren Kodierung nur einen Bruchteil kostet. Bei verlustbehafteten
+    Formaten (``quality`` gesetzt) sucht eine Bisektion auf der Probe die höchste
+    Qualität, die passt; reicht MIN_FIT_QUALITY nicht, wird zusätzlich verkleinert.
+    Verlustfreie Formate werden vor der ersten vollständigen Kodierung verkleinert,
+    wenn die Vorhersage über dem Limit liegt.
+
+    Liegt eine vollständige Kodierung doch darüber, wird nachgeregelt: bei der
+    Qualität mit dem gemessenen Verhältnis zur Vorhersage, bei der Skalierung per
+    Sekante in log-log (Größe ~ Skalierung^alpha, alpha aus den letzten zwei
+    Messungen, anfangs Probe und erste Kodierung). So reichen meist ein bis zwei
+    vollständige Kodierungen.
+
+    Args:
+        source: Bild vor der Format-Optimierung (Grundlage fürs Verkleinern)
+        prepare: Format-Optimierung für ein (verkleinertes) Bild
+        encode: Kodiert ein vorbereitetes Bild mit der angegebenen Qualität (None = Standard)
+        max_bytes: Größenlimit der Ausgabe
+        quality: Standardqualität verlustbehafteter Formate, None bei verlustfreien
+
+    Returns:
+        Tuple[bytes, Dict]: Ausgabedaten und ``encodes``, ``probe_encodes``,
+        ``quality``, ``scale`` und ``fitted`` (ob vom Standard abgewichen wurde)
+    """
+    stats = {"encodes": 1, "probe_encodes": 0, "quality": quality, "scale": 1.0, "fitted": False}
+
+    # Passt das Bild sogar unkomprimiert, ist keine Vorhersage nötig
+    if raw_size_bound(source) <= max_bytes:
+        return encode(prepare(source), quality), stats
+
+    target = max_bytes * FIT_TARGET_RATIO
+    pixels = source.width * source.height
+    probe_scale = min(1.0, math.sqrt(PROBE_PIXELS / pixels))
+    probe = prepare(scale_image(source, probe_scale))
+    probe_scale = probe.width / source.width
+    probe_outputs: Dict[Optional[int], bytes] = {}
+
+    def probe_size(q: Optional[int]) -> int:
+        if q not in probe_outputs:
+            probe_outputs[q] = encode(probe, q)
+            stats["probe_encodes"] += 1
+        return len(probe_outputs[q])
+
+    # Wie stark die Größe mit der Skalierung wächst (Größe ~ Skalierung^alpha):
+    # glatte Bilder komprimieren in voller Auflösung besser als die Probe (alpha < 2),
+    # verrauschte schlechter (alpha > 2). Gemessen an einer zweiten, doppelt so
+    # großen Probe, außer das Bild ist dafür zu klein oder passt auch bei
+    # pixelproportionaler Schätzung (alpha = 2) mit viel Abstand.
+    alpha = 2.0
+    last_point = (probe_scale, probe_size(quality))
+    if probe_scale <= 0.5 and last_point[1] / (probe_scale * probe_scale) > target * SECOND_PROBE_MARGIN:
+        second_scale = 2 * probe_scale
+        second = prepare(scale_image(source, second_scale))
+        second_scale = second.width / source.width
+        second_size = len(encode(second, quality))
+        stats["probe_encodes"] += 1
+        alpha = _exponent(last_point, (second_scale, second_size))
+        last_point = (second_scale, second_size)
+
+    def predict(q: Optional[int], scale: float, correction: float = 1.0) -> float:
+        """Vorhergesagte Größe bei Qualität q und Skalierung scale."""
+        return probe_size(q) * (scale / probe_scale) ** alpha * correction
+
+    def choose_quality(correction: float) -> Optional[int]:
+        """Höchste Qualität, deren Vorhersage in voller Auflösung passt (sonst MIN_FIT_QUALITY)."""
+        if quality is None or predict(quality, 1.0, correction) <= target:
+            return quality
+        low, high = MIN_FIT_QUALITY, quality
+        if low >= high or predict(low, 1.0, correction) > target:
+            return min(low, high)
+        while high - low > QUALITY_TOLERANCE:
+            middle = (low + high) // 2
+            if predict(middle, 1.0, correction) <= target:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def choose_scale(q: Optional[int], correction: float) -> float:
+        predicted = predict(q, 1.0, correction)
+        return 1.0 if predicted <= target else (target / predicted) ** (1 / alpha)
+
+    q = choose_quality(1.0)
+    scale = choose_scale(q, 1.0)
+    if q != quality:
+        last_point = (probe_scale, probe_size(q))
+
+    stats["encodes"] = 0
+    data = b""
+    for _ in range(MAX_FIT_ENCODES):
+        if scale >= 1.0 and probe_scale >= 1.0:
+            # Kleines Bild: die Probe war bereits die vollständige Kodierung
+            data = probe_outputs[q]
+        else:
+            candidate = prepare(source) if scale >= 1.0 else prepare(scale_image(source, scale))
+            data = encode(candidate, q)
+        stats["encodes"] += 1
+        stats["quality"], stats["scale"] = q, round(scale, 4)
+        size = len(data)
+        if size <= max_bytes:
+            break
+
+        # Erst die Qualität nachregeln, solange noch nicht verkleinert wurde
+        if scale >= 1.0 and quality is not None and q > MIN_FIT_QUALITY:
+            correction = size / predict(q, 1.0)
+            new_q = choose_quality(correction)
+            if new_q < q:
+                q = new_q
+                scale = choose_scale(q, correction)
+                last_point = (probe_scale, probe_size(q))
+                continue
+
+        # Sekante in log-log zwischen letzter und aktueller Messung
+        point = (scale, size)
+        scale = min(scale * (target / size) ** (1 / _exponent(last_point, point)), scale * 0.98)
+        last_point = point
+
+    stats["fitted"] = stats["quality"] != quality or stats["scale"] < 1.0
+    return data, stats
+
+
+def _exponent(first: Tuple[float, int], second: Tuple[float, int]) -> float:
+    """alpha aus zwei Messungen (Skalierung, Größe), begrenzt auf 1 bis 4."""
+    (scale_a, size_a), (scale_b, size_b) = first, second
+    if scale_a == scale_b or size_a <= 0 or size_b <= 0 or size_a == size_b:
+        return 2.0
+    return min(max(math.log(size_b / size_a) / math.log(scale_b / scale_a), 1.0), 4.0)
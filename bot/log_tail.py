@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import re
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+# Blockgröße beim Rückwärtslesen; pro Datei liegt höchstens ein Block im Speicher
+BLOCK_SIZE = 64 * 1024
+# Längere Zeilen werden gekürzt (der Anfang mit Zeitstempel und Level bleibt erhalten)
+MAX_LINE_BYTES = 16 * 1024
+# Folgezeilen (Tracebacks) pro Eintrag; weitere werden ausgelassen
+MAX_RECORD_LINES = 50
+
+# Kopf einer Zeile von file_formatter: "2024-01-01 12:00:00,000 - [INFO] - bot - ..."
+_HEADER = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3} - \[(\w+)\] - (\S+) - ")
+
+
+def rotated_paths(path: str) -> List[str]:
+    """Log-Datei und ihre Backups von RotatingFileHandler, neueste zuerst."""
+    paths = [path]
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        paths.append(f"{path}.{index}")
+        index += 1
+    return paths
+
+
+def read_lines_reverse(path: str, block_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    Liefert die Zeilen einer Datei vom Ende her, ohne sie ganz zu lesen.
+
+    Es wird blockweise von hinten gelesen; im Speicher liegen nur der aktuelle
+    Block und der Rest einer angeschnittenen Zeile (höchstens MAX_LINE_BYTES).
+    """
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            # Die erste Teilzeile kann im davorliegenden Block weitergehen
+            remainder = lines[0][:MAX_LINE_BYTES]
+            for line in reversed(lines[1:]):
+                yield line[:MAX_LINE_BYTES]
+        yield remainder
+
+
+def parse_header(line: str) -> Optional[Tuple[str, str]]:
+    """
+    Erkennt den Beginn eines Log-Eintrags (Text- oder JSON-Format).
+
+    Returns:
+        Optional[Tuple[str, str]]: (Level, Logger) oder None bei Folgezeilen
+    """
+    if line.startswith("{"):
+        try:
+            data = json.loads(line)
+        except ValueError:
+            return None
+        if isinstance(data, dict) and "level" in data:
+            return data["level"], data.get("logger", "")
+        return None
+    match = _HEADER.match(line)
+    return (match.group(1), match.group(2)) if match else None
+
+
+def iter_records_reverse(paths: Sequence[str]) -> Iterator[Tuple[Optional[str], Optional[str], str]]:
+    """
+    Liefert ganze Log-Einträge (mit Traceback-Zeilen) vom neuesten zum ältesten.
+
+    Yields:
+        Tuple: (Level, Logger, Text); Level und Logger sind None für Zeilen ohne Kopf
+    """
+    for path in paths:
+        # Folgezeilen des gerade zusammengesetzten Eintrags, rückwärts gesammelt
+        continuation: List[str] = []
+        skipped = 0
+        try:
+            lines = read_lines_reverse(path)
+            for raw in lines:
+                line = raw.decode("utf-8", errors="replace").rstrip("\r")
+                if not line:
+                    continue
+                header = parse_header(line)
+                if header is None:
+                    if len(continuation) < MAX_RECORD_LINES:
+                        continuation.append(line)
+                    else:
+                        skipped += 1
+                    continue
+
+                record_lines = [line]
+                if skipped:
+                    record_lines.append(f"... ({skipped} Zeilen ausgelassen)")
+                record_lines.extend(reversed(continuation))
+                yield header[0], header[1], "\n".join(record_lines)
+                continuation, skipped = [], 0
+        except FileNotFoundError:
+            # Zwischen Auflisten und Öffnen rotiert
+            continue
+
+        if continuation:
+            yield None, None, "\n".join(reversed(continuation))
+
+
+def tail_log(path: str, amount: int, min_level: Optional[str] = None,
+             logger_name: Optional[str] = None) -> List[str]:
+    """
+    Die letzten ``amount`` Einträge einer Log-Datei, bei Bedarf auch aus den
+    rotierten Backups. Laufzeit und Speicher hängen nur von ``amount`` ab,
+    nicht von der Größe der Logs.
+
+    Args:
+        path: Pfad der aktuellen Log-Datei
+        amount: Anzahl der Einträge
+        min_level: Mindest-Level (z.B. "WARNING"), None = alle
+        logger_name: Nur Einträge dieses Loggers (und seiner Kind-Logger)
+
+    Returns:
+        List[str]: Einträge in zeitlicher Reihenfolge
+    """
+    threshold = logging.getLevelName(min_level.upper()) if min_level else None
+    if not isinstance(threshold, int):
+        threshold = None
+
+    records: List[str] = []
+    if amount <= 0:
+        return records
+
+    for level, name, text in iter_records_reverse(rotated_paths(path)):
+        if threshold is not None:
+            level_number = logging.getLevelName(level) if level else None
+            if not isinstance(level_number, int) or level_number < threshold:
+                continue
+        if logger_name and not (name == logger_name or (name or "").startswith(logger_name + ".")):
+            continue
+        records.append(text)
+        if len(records) >= amount:
+            break
+
+    records.reverse()
+    return records
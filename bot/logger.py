@@ -1,11 +1,17 @@
+import atexit
+import copy
 import logging
 import os
 import datetime
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
+from bot.config import LOG_QUEUE_SIZE, LOG_BLOCK_TIMEOUT, LOG_FORMAT
+from bot.events import EventMessage, JsonFormatter
+
+# Verzeichnis der Log-Dateien (wird erst in init_logging angelegt)
 LOG_DIR = "Logs"
-if not os.path.exists(LOG_DIR):
-    os.makedirs(LOG_DIR)
 
 # Log-Format mit Farben für die Konsole
 class ColoredFormatter(logging.Formatter):
@@ -34,8 +40,94 @@ console_handler = logging.StreamHandler()
 console_handler.setFormatter(console_formatter)
 console_handler.setLevel(logging.INFO)
 
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Reicht Log-Einträge an den Schreib-Thread weiter, statt auf dem Event-Loop
+    auf Datei und Konsole zu schreiben.
+    
+    Die Warteschlange ist begrenzt. Ist sie voll, werden INFO/DEBUG-Zeilen
+    verworfen (und später als Anzahl gemeldet), während WARNING und höher bis
+    zu ``block_timeout`` Sekunden warten (Gegendruck), bevor auch sie verworfen werden.
+    """
+    
+    def __init__(self, log_queue, block_timeout=LOG_BLOCK_TIMEOUT):
+        super().__init__(log_queue)
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._unreported = 0
+        self._lock = threading.Lock()
+    
+    def prepare(self, record):
+        """
+        Im Gegensatz zu QueueHandler.prepare wird hier nicht formatiert: das
+        erledigt der Schreib-Thread. Nur Argumente und verzögerte Felder werden
+        jetzt aufgelöst, damit der Eintrag den Zustand zum Log-Zeitpunkt zeigt.
+        """
+        record = copy.copy(record)
+        if isinstance(record.msg, EventMessage):
+            record.msg.resolve()
+        elif record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            if record.levelno >= logging.WARNING and self.block_timeout > 0:
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                self._unreported += 1
+            return
+        
+        if self._unreported:
+            self._report_dropped(record.name)
+    
+    def _report_dropped(self, name):
+        with self._lock:
+            count, self._unreported = self._unreported, 0
+        notice = logging.LogRecord(
+            name, logging.WARNING, __file__, 0,
+            f"⚠️ {count} Log-Zeilen verworfen (Log-Warteschlange voll)", None, None
+        )
+        try:
+            self.queue.put_nowait(notice)
+        except queue.Full:
+            with self._lock:
+                self._unreported += count
+
+class RoutingQueueListener(QueueListener):
+    """Ein Schreib-Thread für alle Logger; jeder Eintrag geht an die Handler seines Loggers."""
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue, respect_handler_level=True)
+        self.routes = {}
+    
+    def enqueue_sentinel(self):
+        # Blockierend: auch bei voller Warteschlange muss das Ende ankommen
+        self.queue.put(self._sentinel)
+    
+    def add_route(self, name, handlers):
+        self.routes[name] = tuple(handlers)
+    
+    def handle(self, record):
+        record = self.prepare(record)
+        for handler in self.routes.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+# Gemeinsame, begrenzte Warteschlange und der Schreib-Thread dahinter
+log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+log_listener = RoutingQueueListener(log_queue)
+queue_handlers = []
+# Logger-Name -> Pfad der Log-Datei (für /logs)
+log_files = {}
+
 # Log-Dateien mit Rotation (max 5 MB, 3 Backups)
-def setup_logger(name, filename, level=logging.INFO):
+def setup_logger(name, filename, level=logging.INFO, structured=False):
     """
     Erstellt einen Logger mit Datei- und Konsolenausgabe.
     
@@ -43,6 +135,7 @@ def setup_logger(name, filename, level=logging.INFO):
         name (str): Name des Loggers
         filename (str): Dateiname für die Log-Datei
         level (int): Log-Level (Standard: INFO)
+        structured (bool): Datei bei LOG_FORMAT=json als JSON Lines schreiben
         
     Returns:
         logging.Logger: Konfigurierter Logger
@@ -54,24 +147,70 @@ def setup_logger(name, filename, level=logging.INFO):
         backupCount=3,
         encoding='utf-8'
     )
-    file_handler.setFormatter(file_formatter)
+    file_handler.setFormatter(JsonFormatter() if structured and LOG_FORMAT == "json" else file_formatter)
     file_handler.setLevel(level)
     
     # Logger konfigurieren
     logger = logging.getLogger(name)
     logger.setLevel(level)
     
-    # Handler nur hinzufügen, wenn sie noch nicht existieren
+    # Handler nur hinzufügen, wenn sie noch nicht existieren. Der Logger selbst
+    # bekommt nur den Queue-Handler, geschrieben wird im Hintergrund-Thread.
     if not logger.handlers:
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        log_files[name] = file_handler.baseFilename
+        route_logger(logger, [file_handler, console_handler])
     
     return logger
 
-# Einzelne Log-Dateien
-bot_logger = setup_logger("bot", "bot.log")
-error_logger = setup_logger("errors", "errors.log")
-conversion_logger = setup_logger("conversions", "conversions.log")
+def route_logger(logger, handlers):
+    """
+    Leitet einen Logger über die Warteschlange an ``handlers`` im Schreib-Thread
+    weiter (auch für Einträge, die keine Log-Zeilen sind, z.B. Traces).
+    """
+    log_listener.add_route(logger.name, handlers)
+    handler = NonBlockingQueueHandler(log_queue)
+    queue_handlers.append(handler)
+    logger.addHandler(handler)
+
+def dropped_log_records():
+    """Anzahl der wegen voller Warteschlange verworfenen Log-Einträge."""
+    return sum(handler.dropped for handler in queue_handlers)
+
+def shutdown_logging():
+    """
+    Schreibt alle noch wartenden Einträge und beendet den Schreib-Thread.
+    Wird bei Programmende und vor /restart (execv) aufgerufen; mehrfacher Aufruf ist harmlos.
+    """
+    if log_listener._thread is not None:
+        log_listener.stop()
+    for handlers in log_listener.routes.values():
+        for handler in handlers:
+            handler.flush()
+
+def _restart_after_fork():
+    """
+    Worker-Prozesse (fork) erben weder den Schreib-Thread noch einen sicheren
+    Zustand der Warteschlange: beides neu anlegen.
+
+    Die Log-Dateien schreibt nur der Hauptprozess. Würden mehrere Prozesse
+    dieselben Dateien schreiben und unabhängig rotieren, benennten sie sich die
+    Dateien gegenseitig um und Zeilen gingen verloren. Worker loggen deshalb nur
+    auf die Konsole.
+    """
+    global log_queue
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    for handler in queue_handlers:
+        handler.queue = log_queue
+    log_listener.queue = log_queue
+    log_listener.routes = {name: (console_handler,) for name in log_files}
+    log_listener._thread = None
+    log_listener.start()
+
+# Einzelne Logger; Handler und Log-Dateien bekommen sie erst in init_logging
+bot_logger = logging.getLogger("bot")
+error_logger = logging.getLogger("errors")
+conversion_logger = logging.getLogger("conversions")
+queue_logger = logging.getLogger("queue")
 
 # Fehler-Logging mit automatischem Cleanup
 def cleanup_old_logs(max_age_days=7, max_size_mb=10):
@@ -108,11 +247,39 @@ def cleanup_old_logs(max_age_days=7, max_size_mb=10):
                 except OSError as e:
                     bot_logger.error(f"❌ Fehler beim Löschen der Datei {file}: {e}")
 
-# Cleanup starten
-cleanup_old_logs()
-
 # Globaler Logger, um ihn überall zu verwenden
 logger = bot_logger
 
-# Initialisierungsnachricht
-logger.info("🔧 Logger erfolgreich initialisiert")
\ No newline at end of file
+_initialized = False
+
+def init_logging():
+    """
+    Richtet die Log-Dateien ein, startet den Schreib-Thread und bereinigt alte Logs.
+
+    Wird beim Start des Bots einmal aufgerufen (siehe bot/main.py), nicht beim
+    Import: Benchmarks und Worker-Prozesse, die nur einzelne Module brauchen,
+    legen so weder Logs/ an noch löschen sie Dateien. Mehrfacher Aufruf ist harmlos.
+    """
+    global _initialized
+    if _initialized:
+        return
+    _initialized = True
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    setup_logger("bot", "bot.log")
+    setup_logger("errors", "errors.log")
+    setup_logger("conversions", "conversions.log", structured=True)
+    setup_logger("queue", "queue.log", structured=True)
+
+    # Traces (TRACE_FILE) schreibt derselbe Thread, siehe bot/tracing.py
+    from bot.tracing import TraceFileHandler, recorder, trace_logger
+    if not trace_logger.handlers:
+        route_logger(trace_logger, [TraceFileHandler(recorder)])
+
+    # Schreib-Thread starten und bei Programmende alles Ausstehende schreiben
+    log_listener.start()
+    atexit.register(shutdown_logging)
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+    cleanup_old_logs()
+    logger.info("🔧 Logger erfolgreich initialisiert")
\ No newline at end of file
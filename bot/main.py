@@ -4,6 +4,7 @@ from discord.ext import commands
 import asyncio
 import time
 import os
+import signal
 import sys
 import traceback
 from typing import List, Optional
@@ -11,12 +12,14 @@ import io
 import platform
 import datetime
 import random
-import psutil  # You might need to add this to your dependencies
 
-from bot.converter import convert_image
-from bot.config import ALLOWED_FORMATS, MAX_FILES_PER_REQUEST
+from bot.converter import convert_image, init_converter, shutdown_converter, get_conversion_stats
+from bot.metrics import metrics_server, QUEUE_WAIT_SECONDS, LOOP_LAG_SECONDS
+from bot.config import ALLOWED_FORMATS, BROKER_URL, MAX_FILES_PER_REQUEST, TOKEN, create_directories
+from bot.delivery import ConversionBatch
 from bot.task_queue import ImageQueue
-from bot.logger import bot_logger as logger
+from bot.logger import bot_logger as logger, init_logging, log_files, shutdown_logging
+from bot.log_tail import tail_log
 
 # Optional keep_alive import (will be added later)
 try:
@@ -28,22 +31,29 @@ except ImportError:
 # Create the conversion queue
 queue = ImageQueue()
 
-# Safely read token from environment variable
-TOKEN = os.getenv("DISCORD_TOKEN")
-if not TOKEN:
-    logger.error("❌ DISCORD_TOKEN not found! Please set the environment variable.")
-    sys.exit(1)
+# Job broker when running as gateway for separate workers (BROKER_URL, see bot/worker.py)
+broker = None
+broker_server = None
 
 # Discord Intents and Bot initialization
 intents = discord.Intents.default()
 intents.message_content = True  # Enables reading message content
 
-bot = commands.Bot(command_prefix="/", intents=intents, help_command=None)
+class ImageXBot(commands.Bot):
+    async def close(self):
+        """Stops the conversion services before disconnecting (normal stop, SIGINT, SIGTERM)"""
+        await shutdown_services()
+        await super().close()
+
+bot = ImageXBot(command_prefix="/", intents=intents, help_command=None)
 
 # Rate limiting for users
 user_cooldowns = {}
 COOLDOWN_TIME = 5  # Seconds between requests
 
+# Upper limit for /logs (entries are read from the end of the file)
+MAX_LOG_ENTRIES = 500
+
 # Global statistics
 start_time = time.time()
 conversion_count = 0
@@ -84,6 +94,62 @@ def has_permission(interaction, permission_name="attach_files"):
         return False
     return permission
 
+def has_allowed_extension(filename):
+    """Check if a file name ends with one of the supported formats"""
+    return any(filename.lower().endswith(f".{ext}") for ext in ALLOWED_FORMATS)
+
+# Background startup tasks (kept referenced until they finish)
+startup_tasks = set()
+
+async def setup_hook():
+    """
+    Initializes the converter once before connecting to the gateway. The metrics
+    endpoint is not needed for that and starts in the background.
+
+    With BROKER_URL set, this process only acts as gateway: /convert requests go
+    to the broker and the workers convert and deliver them, so no converter is
+    started here.
+    """
+    global broker, broker_server
+    if BROKER_URL:
+        from bot.broker import BrokerServer, open_broker  # aiohttp.web only in gateway mode
+        broker = open_broker(BROKER_URL)
+        broker_server = BrokerServer(broker)
+        await broker_server.start()
+    else:
+        await init_converter()
+    task = asyncio.create_task(metrics_server.start())
+    startup_tasks.add(task)
+    task.add_done_callback(startup_tasks.discard)
+
+    # SIGTERM (docker stop, systemd) ends the bot like Ctrl+C, through bot.close()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, request_close)
+    except NotImplementedError:
+        pass  # Windows: no signal handlers in the event loop
+
+def request_close():
+    task = asyncio.create_task(bot.close())
+    startup_tasks.add(task)
+    task.add_done_callback(startup_tasks.discard)
+
+bot.setup_hook = setup_hook
+
+async def shutdown_services():
+    """
+    Stops the metrics endpoint, the broker and the converter (process pool, download
+    session, disk cache). Shared by bot.close() and /restart; repeated calls are harmless.
+    """
+    global broker, broker_server
+    await metrics_server.stop()
+    if broker_server is not None:
+        await broker_server.stop()
+        broker_server = None
+    if broker is not None:
+        await broker.close()
+        broker = None
+    await shutdown_converter()
+
 # Bot Events
 @bot.event
 async def on_ready():
@@ -175,7 +241,8 @@ async def on_app_command_error(interaction: discord.Interaction, error: app_comm
     file1="First file to convert",
     file2="Second file to convert (optional)",
     file3="Third file to convert (optional)",
-    file4="Fourth file to convert (optional)"
+    file4="Fourth file to convert (optional)",
+    max_mb="Fit each converted file under this many MB (default: the upload limit)"
 )
 async def convert(
     interaction: discord.Interaction, 
@@ -183,7 +250,8 @@ async def convert(
     file1: discord.Attachment,
     file2: Optional[discord.Attachment] = None,
     file3: Optional[discord.Attachment] = None,
-    file4: Optional[discord.Attachment] = None
+    file4: Optional[discord.Attachment] = None,
+    max_mb: Optional[app_commands.Range[float, 0.1, 25.0]] = None
 ):
     """Convert images to another format"""
     # Check rate limiting
@@ -234,7 +302,7 @@ async def convert(
         )
         files = files[:MAX_FILES_PER_REQUEST]
 
-    # Send initial response (will be updated later with followup.send)
+    # Send initial response (edited in place with the progress later)
     await interaction.response.send_message(
         f"⏳ **Processing {len(files)} {'file' if len(files) == 1 else 'files'} for conversion to `{target_format}`...**", 
         ephemeral=False  # Visible to everyone so others can see the bot is working
@@ -244,20 +312,42 @@ async def convert(
     global conversion_count
     conversion_count += len(files)
 
-    # Queue conversion tasks
+    max_output_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+    if broker is not None:
+        # Gateway mode: one job for the whole request, a worker converts the files
+        # and edits the response above through the interaction webhook
+        from bot.broker import make_job
+        accepted = [image for image in files if has_allowed_extension(image.filename)]
+        skipped = [(image.filename, "unbekanntes Format") for image in files if not has_allowed_extension(image.filename)]
+        try:
+            job_id = await broker.put(make_job(interaction, accepted, target_format, max_output_bytes, skipped))
+        except Exception as e:
+            # No worker will ever see this request, so don't leave the user at "Processing..."
+            logger.error(f"❌ Could not send job from {interaction.user} ({interaction.user.id}) to broker: {e}")
+            try:
+                await interaction.edit_original_response(
+                    content="❌ **The conversion could not be started. Please try again later.**"
+                )
+            except Exception as edit_error:
+                logger.error(f"❌ Could not edit response: {edit_error}")
+            return
+        logger.info(f"✅ Job {job_id} with {len(accepted)} conversions from {interaction.user} ({interaction.user.id}) sent to broker")
+        return
+
+    # Queue conversion tasks; the batch edits the response above with the progress
+    # and delivers all results of this request in one followup
+    batch = ConversionBatch(interaction, target_format, max_output_bytes=max_output_bytes)
     task_ids = []
     for image in files:
         # Check file extension
-        if not any(image.filename.lower().endswith(f".{ext}") for ext in ALLOWED_FORMATS):
-            await interaction.followup.send(
-                f"⚠️ `{image.filename}` has an unknown format and will be skipped.",
-                ephemeral=True
-            )
+        if not has_allowed_extension(image.filename):
+            batch.skip(image.filename, "unbekanntes Format")
             continue
             
         # Add to queue
-        task_id = await queue.add(interaction, image, target_format)
+        task_id = await queue.add(interaction, image, target_format, batch)
         task_ids.append(task_id)
+    await batch.close()
     
     logger.info(f"✅ {len(task_ids)} conversions from {interaction.user} ({interaction.user.id}) added to queue")
 
@@ -316,8 +406,9 @@ async def formats(interaction: discord.Interaction):
 @bot.tree.command(name="status", description="Show current queue and bot status")
 async def status(interaction: discord.Interaction):
     """Show current queue and bot status"""
-    # Get queue status
+    # Get queue status and conversion metrics
     queue_status = await queue.get_status()
+    conversion_stats = get_conversion_stats()
     
     # Calculate uptime
     uptime = time.time() - start_time
@@ -327,6 +418,7 @@ async def status(interaction: discord.Interaction):
     uptime_str = f"{int(days)}d {int(hours)}h {int(minutes)}m {int(seconds)}s"
     
     # System resources
+    import psutil  # loaded on first use, not at startup
     memory_usage = psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024  # MB
     
     # Create status embed
@@ -341,16 +433,42 @@ async def status(interaction: discord.Interaction):
         name="🖼️ Conversion Queue:",
         value=f"• Waiting images: `{queue_status['queue_size']}`\n"
               f"• Current status: `{'✅ Active' if queue_status['processing'] else '⏲️ Ready'}`\n"
-              f"• Average processing time: `{queue_status['average_processing_time']}s`",
+              f"• Average processing time: `{queue_status['average_processing_time']}s`\n"
+              f"• Encoder profile: `{queue_status['encoder_profile']}`\n"
+              f"• Busy workers: `{queue_status['active_tasks']}/{len(queue_status['workers'])}`"
+              + "".join(
+                  f"\n  └ Worker {w['id']}: `{w['utilization']}%` busy, `{w['jobs']}` jobs"
+                  for w in queue_status['workers']
+              ),
         inline=False
     )
-    
+
+    # Broker status (gateway mode, the workers run elsewhere)
+    if broker is not None:
+        broker_counts = await broker.counts()
+        embed.add_field(
+            name="📮 Job Broker:",
+            value=f"• Waiting jobs: `{broker_counts['queued']}`\n"
+                  f"• Jobs at workers: `{broker_counts['claimed']}`",
+            inline=False
+        )
+
     # Performance statistics
     embed.add_field(
         name="📈 Statistics:",
         value=f"• Successfully converted: `{queue_status['processed_count']}`\n"
               f"• Failed conversions: `{queue_status['failed_count']}`\n"
-              f"• Total requests: `{conversion_count}`",
+              f"• Total requests: `{conversion_count}`\n"
+              f"• Cache hit rate: `{conversion_stats['cache_hit_rate']:.1f}%`",
+        inline=True
+    )
+    
+    # Latencies from the metrics histograms
+    embed.add_field(
+        name="⏱️ Latency (p50 / p95):",
+        value=f"• Conversion: `{conversion_stats['p50_conversion_time']:.2f}s` / `{conversion_stats['p95_conversion_time']:.2f}s`\n"
+              f"• Queue wait: `{QUEUE_WAIT_SECONDS.quantile(0.5):.2f}s` / `{QUEUE_WAIT_SECONDS.quantile(0.95):.2f}s`\n"
+              f"• Event loop lag (p99): `{LOOP_LAG_SECONDS.quantile(0.99) * 1000:.1f}ms`",
         inline=True
     )
     
@@ -376,8 +494,23 @@ async def status(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="logs", description="Show recent logs (admin only)")
-@app_commands.describe(amount="Number of log lines to show")
-async def logs(interaction: discord.Interaction, amount: int = 10):
+@app_commands.describe(
+    amount="Number of log entries to show",
+    log="Which log file to read",
+    level="Only show entries at or above this level",
+    logger_name="Only show entries from this logger"
+)
+@app_commands.choices(
+    log=[app_commands.Choice(name=name, value=name) for name in ("bot", "conversions", "queue", "errors")],
+    level=[app_commands.Choice(name=name, value=name) for name in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")]
+)
+async def logs(
+    interaction: discord.Interaction,
+    amount: int = 10,
+    log: str = "bot",
+    level: Optional[str] = None,
+    logger_name: Optional[str] = None
+):
     """Show recent logs (admin only)"""
     if not has_permission(interaction, "administrator"):
         await interaction.response.send_message(
@@ -387,19 +520,18 @@ async def logs(interaction: discord.Interaction, amount: int = 10):
         return
 
     # Validate logs
-    log_path = "Logs/bot.log"
-    if not os.path.exists(log_path):
+    log_path = log_files.get(log)
+    if log_path is None or not os.path.exists(log_path):
         await interaction.response.send_message(
             "🚫 **No logs exist yet!**", 
             ephemeral=True
         )
         return
 
-    # Read logs (with error handling)
+    # Read only the tail of the log (and rotated backups if needed), off the event loop
+    amount = max(1, min(amount, MAX_LOG_ENTRIES))
     try:
-        with open(log_path, "r", encoding="utf-8") as log_file:
-            log_lines = log_file.readlines()
-            log_lines = log_lines[-min(amount, len(log_lines)):]  # Only the last X lines
+        entries = await asyncio.to_thread(tail_log, log_path, amount, level, logger_name)
     except Exception as e:
         await interaction.response.send_message(
             f"❌ **Error reading logs:** `{e}`", 
@@ -407,26 +539,21 @@ async def logs(interaction: discord.Interaction, amount: int = 10):
         )
         return
 
-    # Split logs into chunks (Discord has a 2000 character limit)
-    chunks = []
-    current_chunk = ""
-    
-    for line in log_lines:
-        line = line.strip()
-        if len(current_chunk) + len(line) + 6 > 1900:  # Leave space for ```log ... ```
-            chunks.append(current_chunk)
-            current_chunk = line
-        else:
-            current_chunk += "\n" + line if current_chunk else line
-    
-    if current_chunk:
-        chunks.append(current_chunk)
-    
-    # Send logs
-    await interaction.response.send_message(f"📜 **Last {len(log_lines)} logs:**", ephemeral=True)
-    
-    for i, chunk in enumerate(chunks):
-        await interaction.followup.send(f"```log\n{chunk}```", ephemeral=True)
+    if not entries:
+        await interaction.response.send_message("🔍 **No matching log entries.**", ephemeral=True)
+        return
+
+    # One message: inline if it fits Discord's 2000 character limit, otherwise as a file
+    header = f"📜 **Last {len(entries)} entries from `{log}.log`:**"
+    text = "\n".join(entries)
+    if len(header) + len(text) + 12 <= 2000:
+        await interaction.response.send_message(f"{header}\n```log\n{text}```", ephemeral=True)
+    else:
+        await interaction.response.send_message(
+            header,
+            file=discord.File(io.BytesIO(text.encode("utf-8")), filename=f"{log}-tail.log"),
+            ephemeral=True
+        )
 
 @bot.tree.command(name="restart", description="Restart the bot (admin only)")
 async def restart(interaction: discord.Interaction):
@@ -456,6 +583,12 @@ async def restart(interaction: discord.Interaction):
                 ephemeral=True
             )
 
+    # Shut down conversion workers and free the metrics and broker ports before replacing the process
+    await shutdown_services()
+    
+    # execv skips atexit handlers: write out pending log lines now
+    shutdown_logging()
+
     # Make sure the current Python executable is used
     os.execv(sys.executable, [sys.executable] + sys.argv)
 
@@ -525,8 +658,9 @@ async def ping(interaction: discord.Interaction):
 @bot.tree.command(name="stats", description="Show bot usage statistics")
 async def stats(interaction: discord.Interaction):
     """Show bot usage statistics"""
-    # Get queue status
+    # Get queue status and conversion metrics
     queue_status = await queue.get_status()
+    conversion_stats = get_conversion_stats()
     
     # Calculate uptime
     uptime = time.time() - start_time
@@ -548,7 +682,8 @@ async def stats(interaction: discord.Interaction):
         value=f"• Processed images: `{queue_status['processed_count']}`\n"
               f"• Failed conversions: `{queue_status['failed_count']}`\n"
               f"• Total requests: `{conversion_count}`\n"
-              f"• Avg. processing time: `{queue_status['average_processing_time']}s`",
+              f"• Avg. conversion time: `{conversion_stats['avg_conversion_time']:.2f}s`\n"
+              f"• Data processed: `{conversion_stats['total_size_processed_mb']:.1f} MB`",
         inline=True
     )
     
@@ -562,6 +697,7 @@ async def stats(interaction: discord.Interaction):
     )
     
     # System statistics
+    import psutil  # loaded on first use, not at startup
     cpu_percent = psutil.cpu_percent()
     memory_usage = psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024  # MB
     
@@ -651,11 +787,22 @@ def format_uptime(seconds):
     return " ".join(parts)
 
 # Run the bot
-if __name__ == "__main__":
+def main():
+    """Startup phase: everything with side effects (log files, directories, token check) happens here, not at import"""
+    init_logging()
+    create_directories()
+
+    if not TOKEN:
+        logger.error("❌ DISCORD_TOKEN not found! Please set the environment variable.")
+        sys.exit(1)
+
     try:
         logger.info("🚀 Starting ImageX Bot...")
         bot.run(TOKEN)
     except Exception as e:
         logger.critical(f"❌ Fatal error: {e}")
         logger.critical(traceback.format_exc())
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,356 @@
+import asyncio
+import bisect
+import logging
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+from bot.config import ALLOWED_FORMATS, METRICS_HOST, METRICS_PORT
+
+# Logger direkt ohne Import-Loop nutzen
+logger = logging.getLogger("bot")
+
+# Bucket-Grenzen in Sekunden für Latenzen von Download bis Upload
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Bucket-Grenzen in Sekunden für die Verspätung des Event-Loops
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Content-Type des Prometheus-Textformats
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def format_label(name: Optional[str]) -> str:
+    """
+    Formatname als Label-Wert. Unbekannte Werte werden zu "other", damit die
+    Anzahl der Zeitreihen begrenzt bleibt.
+    """
+    if not name:
+        return "unknown"
+    name = name.lower().lstrip(".")
+    return name if name in ALLOWED_FORMATS else "other"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Gemeinsame Basis: Name, Beschreibung, Label-Namen."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} erwartet Labels {self.labelnames}, erhalten {tuple(labels)}")
+        return tuple(labels)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """Liefert (Suffix, Label-Text, Wert) für die Textausgabe."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monoton steigender Zähler; die Summe über alle Labels ist in O(1) abrufbar."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._total = 0.0
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+        self._total += amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        return self._total
+
+    def samples(self):
+        if not self.labelnames and not self._values:
+            yield "", "", 0
+        for key, value in self._values.items():
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class Gauge(Metric):
+    """
+    Momentaufnahme eines Werts. Statt ``set()`` kann eine Funktion hinterlegt
+    werden, die erst beim Abruf ausgewertet wird (z.B. Länge der Warteschlange).
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation)
+        self._value = 0.0
+        self._function = function
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception as e:
+                logger.warning(f"⚠️ Metrik {self.name} konnte nicht gelesen werden: {e}")
+                return float("nan")
+        return self._value
+
+    def samples(self):
+        yield "", "", self.value()
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    """
+    Histogramm mit festen Buckets. Eine Beobachtung kostet eine binäre Suche
+    über die Bucket-Grenzen; Mittelwert und Quantile werden aus den Buckets
+    berechnet, unabhängig von der Anzahl der Beobachtungen. Zusätzlich zu den
+    einzelnen Label-Kombinationen wird eine Gesamtreihe geführt.
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+        self._all = _HistogramSeries(len(self.buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(len(self.buckets))
+
+        index = bisect.bisect_left(self.buckets, value)
+        for target in (series, self._all):
+            target.counts[index] += 1
+            target.sum += value
+            target.count += 1
+
+    def count(self) -> int:
+        return self._all.count
+
+    def mean(self) -> float:
+        return self._all.sum / self._all.count if self._all.count else 0.0
+
+    def quantile(self, q: float, *labels: str) -> float:
+        """
+        Schätzt ein Quantil (0-1) durch lineare Interpolation innerhalb des
+        Buckets, wie ``histogram_quantile`` in Prometheus. Ohne Labels über alle Reihen.
+        """
+        series = self._series.get(self._key(labels)) if labels else self._all
+        if series is None or series.count == 0:
+            return 0.0
+
+        rank = q * series.count
+        cumulative = 0
+        for index, count in enumerate(series.counts):
+            if cumulative + count >= rank and count > 0:
+                upper = self.buckets[index]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-2]
+
+    def samples(self):
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                yield "_bucket", _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"'), cumulative
+            yield "_sum", _format_labels(self.labelnames, key), series.sum
+            yield "_count", _format_labels(self.labelnames, key), series.count
+
+
+class MetricsRegistry:
+    """Sammelt alle Metriken des Prozesses und gibt sie im Prometheus-Textformat aus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric):
+                raise ValueError(f"Metrik {metric.name} existiert bereits als {existing.type_name}")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None) -> Gauge:
+        gauge = self._register(Gauge(name, documentation))
+        if function is not None:
+            gauge.set_function(function)
+        return gauge
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Prozessweite Registry, in die alle Module schreiben
+registry = MetricsRegistry()
+
+# Latenzen der einzelnen Stufen eines Jobs
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "imagex_queue_wait_seconds", "Wartezeit in der Warteschlange bis zum Start eines Jobs", ("source", "target")
+)
+DOWNLOAD_SECONDS = registry.histogram(
+    "imagex_download_seconds", "Dauer des Downloads vom CDN", ("source", "target")
+)
+CONVERSION_SECONDS = registry.histogram(
+    "imagex_conversion_seconds", "Dauer der eigentlichen Konvertierung (PIL oder ImageMagick)", ("source", "target")
+)
+UPLOAD_SECONDS = registry.histogram(
+    "imagex_upload_seconds", "Dauer des Uploads der konvertierten Datei zu Discord", ("source", "target")
+)
+REQUEST_SECONDS = registry.histogram(
+    "imagex_request_seconds", "Gesamtdauer von convert_image inklusive Cache-Treffern", ("source", "target")
+)
+
+# Ergebnisse
+CONVERSIONS = registry.counter(
+    "imagex_conversions_total", "Abgeschlossene Konvertierungsanfragen", ("source", "target")
+)
+CONVERSION_FAILURES = registry.counter(
+    "imagex_conversion_failures_total", "Fehlgeschlagene Konvertierungsanfragen", ("source", "target")
+)
+
+# Discord-Webhook-Aufrufe pro Art ("edit", "followup") und durch Bündelung eingesparte Aufrufe
+WEBHOOK_CALLS = registry.counter(
+    "imagex_webhook_calls_total", "Webhook-Aufrufe für Fortschritt und Ergebnisse", ("kind",)
+)
+WEBHOOK_CALLS_SAVED = registry.counter(
+    "imagex_webhook_calls_saved_total", "Eingesparte Webhook-Aufrufe gegenüber zwei Nachrichten pro Datei"
+)
+
+# Event-Loop
+LOOP_LAG_SECONDS = registry.histogram(
+    "imagex_event_loop_lag_seconds", "Verspätung des Event-Loops gegenüber dem geplanten Aufwachen",
+    buckets=LOOP_LAG_BUCKETS
+)
+LOOP_LAG_LAST = registry.gauge("imagex_event_loop_lag_last_seconds", "Zuletzt gemessene Verspätung des Event-Loops")
+
+
+async def monitor_loop_lag(interval: float = 0.5) -> None:
+    """Misst dauerhaft, wie viel später als geplant der Event-Loop aufwacht."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        LOOP_LAG_SECONDS.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+
+
+class MetricsServer:
+    """Lokaler HTTP-Endpunkt ``/metrics`` plus Messung der Event-Loop-Verspätung."""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._runner: Optional["web.AppRunner"] = None
+        self._lag_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._lag_task is None:
+            self._lag_task = asyncio.create_task(monitor_loop_lag())
+
+        if self.port <= 0 or self._runner is not None:
+            return
+
+        # Der Server-Teil von aiohttp wird nur geladen, wenn der Endpunkt aktiv ist
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError as e:
+            await runner.cleanup()
+            logger.warning(f"⚠️ Metrik-Endpunkt konnte nicht gestartet werden: {e}")
+            return
+        self._runner = runner
+        logger.info(f"📈 Metriken unter http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: "web.Request") -> "web.Response":
+        from aiohttp import web
+
+        return web.Response(body=registry.render().encode("utf-8"),
+                            headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+
+# Wird von main.py beim Start geöffnet
+metrics_server = MetricsServer()
@@ -0,0 +1,342 @@
+"""
+CPU-Pipeline der Bildkonvertierung (Dekodieren, Skalieren, Optimieren, Kodieren).
+
+Läuft in den Worker-Prozessen der ConversionEngine und wird dort beim Start
+vorgeladen (siehe bot/engine.py). Der Bot-Prozess selbst importiert dieses Modul
+nicht, damit Pillow, NumPy und piexif den Start nicht verzögern.
+"""
+
+import io
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import piexif  # für EXIF-Daten-Handling
+from PIL import Image
+
+from bot.animation import ANIMATED_TARGETS, is_animated, render_animation
+from bot.config import DDS_COMPRESSION, DDS_MIPMAPS
+from bot.encoding import DEFAULT_ENCODER_PROFILE, MAX_DIMENSIONS, fit_within, get_save_options
+from bot.dds import encode_dds
+from bot.fitting import FIT_EXEMPT_FORMATS, LOSSY_FORMATS, fit_to_size
+from bot.tracing import StageTimer
+
+# Logger direkt ohne Import-Loop nutzen
+logger = logging.getLogger("bot")
+
+# Zweistufiges Skalieren: erst ganzzahlig verkleinern (reduce), dann LANCZOS.
+# Ab 3.0 ist das Ergebnis praktisch nicht vom reinen LANCZOS zu unterscheiden.
+RESIZE_REDUCING_GAP = 3.0
+
+# Dateiendung -> Pillow-Formatname, wo beide voneinander abweichen
+PIL_SAVE_FORMATS = {
+    "jpg": "JPEG",
+    "tif": "TIFF",
+    "jp2": "JPEG2000"
+}
+
+def extract_metadata(img: Image.Image) -> Dict[str, Any]:
+    """
+    Extrahiert Metadaten aus einem Bild.
+    
+    Args:
+        img: PIL Image-Objekt
+        
+    Returns:
+        Dict: Metadaten des Bildes
+    """
+    metadata = {
+        "dimensions": img.size,
+        "mode": img.mode,
+        "format": img.format,
+        "exif": {}
+    }
+    
+    # EXIF-Daten extrahieren, falls vorhanden
+    try:
+        if "exif" in img.info:
+            exif_dict = piexif.load(img.info["exif"])
+            # Vereinfachtes EXIF-Dictionary erstellen
+            for ifd_name in exif_dict:
+                if ifd_name == "thumbnail":
+                    continue
+                for tag_id in exif_dict[ifd_name]:
+                    tag_value = exif_dict[ifd_name][tag_id]
+                    if isinstance(tag_value, bytes):
+                        # Bytes in lesbares Format umwandeln
+                        try:
+                            tag_value = tag_value.decode('utf-8', errors='replace')
+                        except:
+                            tag_value = str(tag_value)
+                    metadata["exif"][f"{ifd_name}_{tag_id}"] = tag_value
+    except Exception as e:
+        logger.warning(f"⚠️ Fehler beim Extrahieren der EXIF-Daten: {e}")
+    
+    return metadata
+
+def preserve_metadata(source_img: Image.Image, target_img: Image.Image, target_format: str) -> Image.Image:
+    """
+    Überträgt Metadaten von einem Quellbild auf ein Zielbild.
+    
+    Args:
+        source_img: Quell-Image-Objekt
+        target_img: Ziel-Image-Objekt
+        target_format: Zielformat
+        
+    Returns:
+        Image.Image: Bild mit übertragenen Metadaten
+    """
+    # Nicht alle Formate unterstützen alle Metadaten
+    metadata_compatible_formats = ["jpg", "jpeg", "tiff", "webp"]
+    
+    if target_format.lower() not in metadata_compatible_formats:
+        return target_img
+    
+    # EXIF-Daten übertragen, falls vorhanden und Format unterstützt
+    try:
+        if "exif" in source_img.info and target_format.lower() in ["jpg", "jpeg", "tiff"]:
+            exif_dict = piexif.load(source_img.info["exif"])
+            exif_bytes = piexif.dump(exif_dict)
+            target_img.info["exif"] = exif_bytes
+    except Exception as e:
+        logger.warning(f"⚠️ Fehler beim Übertragen der EXIF-Daten: {e}")
+    
+    # ICC-Profil übertragen, falls vorhanden
+    if "icc_profile" in source_img.info:
+        target_img.info["icc_profile"] = source_img.info["icc_profile"]
+    
+    return target_img
+
+def draft_for_size(img: Image.Image, size: Tuple[int, int]) -> None:
+    """
+    JPEG: schon beim Dekodieren per DCT-Skalierung (1/2, 1/4, 1/8) verkleinern.
+    draft() wirkt nur, solange das Bild noch nicht geladen ist (sonst No-op), und
+    wählt den größten Faktor, bei dem das Bild nicht kleiner als das Ziel wird.
+    """
+    if img.format == "JPEG" and img.width >= 2 * size[0]:
+        img.draft(img.mode, size)
+
+def resize_if_needed(img: Image.Image, max_dimensions: Tuple[int, int] = MAX_DIMENSIONS) -> Image.Image:
+    """
+    Skaliert ein Bild, wenn es die maximalen Dimensionen überschreitet.
+    
+    Args:
+        img: PIL Image-Objekt
+        max_dimensions: Tuple mit maximaler Breite und Höhe
+        
+    Returns:
+        Image.Image: Skaliertes Bild oder Original
+    """
+    size = fit_within(img.size, max_dimensions)
+    if size == img.size:
+        return img
+    
+    draft_for_size(img, size)
+    return img.resize(size, Image.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
+
+def optimize_image(img: Image.Image, target_format: str) -> Image.Image:
+    """
+    Optimiert ein Bild für das Zielformat.
+    
+    Args:
+        img: PIL Image-Objekt
+        target_format: Zielformat
+        
+    Returns:
+        Image.Image: Optimiertes Bild
+    """
+    # Format-spezifische Optimierungen
+    if target_format.lower() in ["jpg", "jpeg"]:
+        # JPG benötigt RGB-Format (kein Alpha)
+        if img.mode in ['RGBA', 'LA'] or (img.mode == 'P' and 'transparency' in img.info):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[3] if img.mode == 'RGBA' else None)
+            img = background
+        elif img.mode not in ('RGB', 'L', 'CMYK'):
+            # z.B. GIF (Palette) oder 16-Bit-PNG kann JPEG nicht direkt schreiben
+            img = img.convert('RGB')
+
+    elif target_format.lower() == "png":
+        # PNG optimieren durch Farbpalette, sofern das ohne Farbverlust geht
+        if img.mode in ('RGB', 'RGBA'):
+            try:
+                img = to_palette_lossless(img) or img
+            except Exception as e:
+                logger.warning(f"⚠️ Fehler bei PNG-Optimierung: {e}")
+    
+    elif target_format.lower() == "gif":
+        # GIF hat nur 256 Farben
+        if img.mode != 'P':
+            img = img.convert('P', palette=Image.ADAPTIVE, colors=256)
+    
+    return img
+
+def _pack_colors(img: Image.Image) -> np.ndarray:
+    """
+    Packt die Pixel eines (kleinen) Bildes als RGBA in je einen uint32-Wert,
+    damit Farben per np.unique statt über Python-Tupel gezählt werden können.
+    """
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    return np.frombuffer(img.tobytes(), dtype=np.uint32)
+
+def has_many_colors(img: Image.Image, sample_pixels: int = 4096, threshold: int = 64,
+                    exact: bool = False) -> bool:
+    """
+    Prüft, ob ein Bild viele verschiedene Farben hat.
+    
+    Standardmäßig wird geschätzt: Die Stichprobe ist ein gleichmäßiges Raster, das
+    per NEAREST-Skalierung direkt aus dem Bildpuffer gelesen wird - das Vollbild
+    wird dabei nicht kopiert. Mit ``exact`` zählt getcolors() alle Pixel, bricht
+    aber ab, sobald mehr als ``threshold`` Farben gefunden wurden.
+    
+    Args:
+        img: PIL Image-Objekt
+        sample_pixels: Ungefähre Anzahl der zu prüfenden Pixel
+        threshold: Ab wie vielen Farben das Bild als "bunt" gilt
+        exact: Exakt zählen statt schätzen
+        
+    Returns:
+        bool: True, wenn das Bild (bzw. die Stichprobe) mehr als ``threshold`` Farben hat
+    """
+    if exact:
+        return img.getcolors(threshold) is None
+
+    side = max(1, int(sample_pixels ** 0.5))
+    sample = img.resize((min(side, img.width), min(side, img.height)), Image.NEAREST)
+    return np.unique(_pack_colors(sample)).size > threshold
+
+def to_palette_lossless(img: Image.Image) -> Optional[Image.Image]:
+    """
+    Wandelt ein RGB/RGBA-Bild mit höchstens 256 Farben verlustfrei in ein
+    Palettenbild um. Anders als quantize() bleibt jeder Pixelwert exakt erhalten.
+    
+    Args:
+        img: PIL Image-Objekt (RGB oder RGBA)
+        
+    Returns:
+        Optional[Image.Image]: Palettenbild oder None, wenn das Bild mehr als 256 Farben hat
+    """
+    if img.mode not in ('RGB', 'RGBA'):
+        return None
+
+    # Billige Vorprüfung per Stichprobe, dann exakt zählen (getcolors bricht früh ab)
+    if has_many_colors(img, threshold=256):
+        return None
+    colors = img.getcolors(256)
+    if colors is None:
+        return None
+
+    values = np.array([color for _, color in colors], dtype=np.uint8)
+    if img.mode == 'RGB':
+        values = np.hstack([values, np.full((len(values), 1), 255, dtype=np.uint8)])
+    palette = np.ascontiguousarray(values).view(np.uint32).ravel()
+
+    # Pixel -> Palettenindex über eine kollisionsfreie Modulo-Tabelle; das ist bei
+    # großen Bildern rund 10x schneller als np.searchsorted
+    keys = palette.tolist()
+    modulus = next((m for m in range(len(keys), 1 << 16) if len({k % m for k in keys}) == len(keys)), None)
+    packed = _pack_colors(img)
+    if modulus is None:
+        order = np.argsort(palette)
+        indices = order[np.searchsorted(palette[order], packed)]
+    else:
+        table = np.zeros(modulus, dtype=np.uint8)
+        table[palette % modulus] = np.arange(len(keys))
+        indices = table[packed % np.uint32(modulus)]
+
+    result = Image.fromarray(indices.astype(np.uint8, copy=False).reshape(img.height, img.width), 'P')
+    if (values[:, 3] != 255).any():
+        result.putpalette(values.tobytes(), rawmode='RGBA')
+    else:
+        result.putpalette(values[:, :3].tobytes(), rawmode='RGB')
+    return result
+
+def render_image(image_data: bytes, target_format: str,
+                 profile: str = DEFAULT_ENCODER_PROFILE, trace: bool = False,
+                 max_bytes: Optional[int] = None) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Führt die komplette CPU-Pipeline (Dekodieren, Skalieren, Optimieren,
+    Kodieren) aus. Läuft in einem Worker-Prozess der ConversionEngine.
+
+    Args:
+        image_data: Rohdaten des Quellbildes
+        target_format: Zielformat (lowercase)
+        profile: Encoder-Profil
+        trace: Dauer der einzelnen Stufen messen (``info["spans"]``)
+        max_bytes: Größenlimit der Ausgabe (siehe bot/fitting.py), None = unbegrenzt
+
+    Returns:
+        Tuple[bytes, Dict]: Kodierte Ausgabedaten und Bildinformationen
+    """
+    timer = StageTimer(trace)
+
+    with timer.stage("decode"):
+        img = Image.open(io.BytesIO(image_data))
+        info = {
+            "format": img.format,
+            "size": img.size,
+            "mode": img.mode,
+            "resized_to": None
+        }
+        # Zielgröße vor dem Laden bestimmen, damit JPEG verkleinert dekodiert werden kann
+        target_size = fit_within(img.size)
+        animated = target_format in ANIMATED_TARGETS and is_animated(img)
+        if target_size != img.size:
+            draft_for_size(img, target_size)
+        if not animated:
+            img.load()
+
+    if animated:
+        # Animationen Frame für Frame (bot/animation.py) statt nur den ersten Frame
+        with timer.stage("animation"):
+            output_data, animation = render_animation(
+                img, target_format, target_size, get_save_options(target_format, profile), max_bytes
+            )
+        info.update(animation)
+        if target_size != info["size"]:
+            info["resized_to"] = target_size
+        info["spans"] = timer.spans
+        return output_data, info
+
+    # Bild bei Bedarf skalieren
+    with timer.stage("resize"):
+        if target_size != info["size"]:
+            if img.size != target_size:
+                img = img.resize(target_size, Image.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
+            info["resized_to"] = target_size
+
+    def prepare(image: Image.Image) -> Image.Image:
+        # Bild für Zielformat optimieren und Metadaten übertragen
+        image = optimize_image(image, target_format)
+        return preserve_metadata(image, image, target_format)
+
+    save_options = get_save_options(target_format, profile)
+
+    def encode(image: Image.Image, quality: Optional[int] = None) -> bytes:
+        output_bytes = io.BytesIO()
+        if target_format == "dds":
+            # Eigener BC1/BC3-Encoder statt ImageMagick-Prozess
+            output_bytes.write(encode_dds(image, DDS_COMPRESSION, mipmaps=DDS_MIPMAPS))
+        else:
+            options = dict(save_options, quality=quality) if quality is not None else save_options
+            save_format = PIL_SAVE_FORMATS.get(target_format, target_format.upper())
+            image.save(output_bytes, format=save_format, **options)
+        return output_bytes.getvalue()
+
+    if max_bytes and target_format not in FIT_EXEMPT_FORMATS:
+        # Größenlimit: Vorhersage an einer Probe, ggf. weniger Qualität/Pixel
+        # (Optimieren und Kodieren wechseln sich dabei ab)
+        with timer.stage("encode"):
+            quality = save_options.get("quality") if target_format in LOSSY_FORMATS else None
+            output_data, fit = fit_to_size(img, prepare, encode, max_bytes, quality)
+            info.update(fit)
+    else:
+        with timer.stage("optimize"):
+            prepared = prepare(img)
+        with timer.stage("encode"):
+            output_data = encode(prepared)
+            info["encodes"] = 1
+
+    info["spans"] = timer.spans
+    return output_data, info
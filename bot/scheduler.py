@@ -0,0 +1,211 @@
+import asyncio
+import math
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+# Kosten-Einheiten, die eine Gilde pro Runde gutgeschrieben bekommt
+DEFAULT_QUANTUM = 1.0
+
+# Rundungsfehler beim Berechnen der nötigen Runden ausgleichen
+_ROUNDS_EPSILON = 1e-9
+
+
+class _Flow:
+    """Warteschlange eines Nutzers innerhalb einer Gilde."""
+
+    __slots__ = ("items", "deficit")
+
+    def __init__(self):
+        self.items = deque()
+        self.deficit = 0.0
+
+
+class FairScheduler:
+    """
+    Faire Warteschlange mit gewichtetem Deficit Round Robin über (Gilde, Nutzer).
+
+    Jede Gilde bekommt pro Runde ein Kosten-Guthaben (``quantum``), das gleichmäßig
+    auf ihre wartenden Nutzer verteilt wird. Ein Job wird erst ausgegeben, wenn das
+    Guthaben seines Nutzers die geschätzten Kosten deckt. Wer viele oder große
+    Dateien schickt, kommt dadurch seltener dran, und einzelne kleine Jobs anderer Nutzer warten nicht
+    hinter ihm. Zusätzlich begrenzt ``max_active_per_user``, wie viele Jobs eines
+    Nutzers gleichzeitig laufen dürfen.
+
+    Die Schnittstelle entspricht weitgehend asyncio.Queue (put/get/task_done/join),
+    ``task_done`` erwartet aber den fertigen Job, damit der Nutzer-Zähler stimmt.
+    """
+
+    def __init__(
+        self,
+        key_func: Callable[[Any], Tuple[Hashable, Hashable, float]],
+        max_active_per_user: int = 2,
+        quantum: float = DEFAULT_QUANTUM
+    ):
+        """
+        Args:
+            key_func: Liefert für einen Job (Gilden-Schlüssel, Nutzer-Schlüssel, Kosten)
+            max_active_per_user: Maximale Anzahl gleichzeitig laufender Jobs pro Nutzer
+            quantum: Guthaben pro Runde in Kosten-Einheiten
+        """
+        self.key_func = key_func
+        self.max_active_per_user = max(1, max_active_per_user)
+        self.quantum = quantum
+
+        # (Gilde, Nutzer) -> Warteschlange, Reihenfolge = Round-Robin-Ring
+        self._flows: "OrderedDict[Tuple[Hashable, Hashable], _Flow]" = OrderedDict()
+        # Gilde -> Anzahl wartender Nutzer (Gewichtung des Guthabens)
+        self._guild_users: Dict[Hashable, int] = {}
+        self._active: Dict[Hashable, int] = {}
+        self._size = 0
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self._waiters = []
+
+    def qsize(self) -> int:
+        """Anzahl wartender (noch nicht ausgegebener) Jobs."""
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def waiting_users(self) -> int:
+        """Anzahl der Nutzer mit wartenden Jobs."""
+        return len(self._flows)
+
+    def put_nowait(self, item: Any) -> None:
+        """Reiht einen Job in die Warteschlange seines Nutzers ein."""
+        guild_key, user_key, _ = self.key_func(item)
+
+        flow = self._flows.get((guild_key, user_key))
+        if flow is None:
+            flow = self._flows[(guild_key, user_key)] = _Flow()
+            self._guild_users[guild_key] = self._guild_users.get(guild_key, 0) + 1
+
+        flow.items.append(item)
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        self._wake()
+
+    async def put(self, item: Any) -> None:
+        self.put_nowait(item)
+
+    def get_nowait(self) -> Any:
+        """
+        Gibt den nächsten fälligen Job zurück.
+
+        Raises:
+            asyncio.QueueEmpty: Wenn kein Job wartet oder alle Nutzer ihr Limit erreicht haben
+        """
+        item = self._select()
+        if item is None:
+            raise asyncio.QueueEmpty()
+        return item
+
+    async def get(self) -> Any:
+        """Wartet, bis ein Job fällig ist, und gibt ihn zurück."""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = self._select()
+            if item is not None:
+                return item
+
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+
+    def task_done(self, item: Any) -> None:
+        """Markiert einen ausgegebenen Job als erledigt und gibt den Nutzer-Slot frei."""
+        _, user_key, _ = self.key_func(item)
+
+        active = self._active.get(user_key, 0) - 1
+        if active > 0:
+            self._active[user_key] = active
+        else:
+            self._active.pop(user_key, None)
+
+        self._unfinished -= 1
+        if self._unfinished <= 0:
+            self._unfinished = 0
+            self._finished.set()
+        self._wake()
+
+    async def join(self) -> None:
+        """Wartet, bis alle eingereihten Jobs erledigt sind."""
+        await self._finished.wait()
+
+    def _wake(self) -> None:
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    def _eligible(self, user_key: Hashable) -> bool:
+        return self._active.get(user_key, 0) < self.max_active_per_user
+
+    def _select(self) -> Any:
+        """
+        Deficit Round Robin über alle (Gilde, Nutzer)-Warteschlangen.
+
+        Statt Runde für Runde Guthaben zu verteilen, bis ein Job gedeckt ist,
+        wird die Zahl der nötigen Runden direkt berechnet: Der erste Nutzer im
+        Ring mit den wenigsten fehlenden Runden ist dran. Alle berechtigten
+        Nutzer bekommen diese Runden auf einmal gutgeschrieben, die vor ihm im
+        Ring eine mehr. Das Ergebnis entspricht dem rundenweisen Verfahren, kostet
+        aber nur einen Durchlauf über die wartenden Nutzer.
+        """
+        flows = list(self._flows.items())
+        credits = []  # (Position, Warteschlange, Guthaben pro Runde) der berechtigten Nutzer
+        winner = None
+        rounds = 0
+        winner_cost = 0.0
+        for position, (flow_key, flow) in enumerate(flows):
+            guild_key, user_key = flow_key
+            if not self._eligible(user_key):
+                # Nutzer überspringen, ohne Guthaben gutzuschreiben
+                continue
+
+            _, _, cost = self.key_func(flow.items[0])
+            credit = self.quantum / self._guild_users[guild_key]
+            credits.append((position, flow, credit))
+            needed = max(0, math.ceil((cost - flow.deficit) / credit - _ROUNDS_EPSILON))
+            if winner is None or needed < rounds:
+                winner, rounds, winner_cost = position, needed, cost
+                if not needed:
+                    break
+
+        # Mindestens ein Nutzer muss unter seinem Limit sein
+        if winner is None:
+            return None
+
+        for position, flow, credit in credits:
+            flow.deficit += credit * (rounds + 1 if position < winner else rounds)
+        # Nutzer vor dem Gewinner waren in der letzten Runde schon dran
+        for flow_key, _ in flows[:winner]:
+            self._flows.move_to_end(flow_key)
+
+        flow_key, flow = flows[winner]
+        guild_key, user_key = flow_key
+
+        # Job ausgeben
+        item = flow.items.popleft()
+        flow.deficit -= winner_cost
+        if flow.deficit < 0:
+            # Rundungsfehler aus der Rundenberechnung nicht als Schuld mitnehmen
+            flow.deficit = 0.0
+        self._size -= 1
+        self._active[user_key] = self._active.get(user_key, 0) + 1
+
+        if not flow.items:
+            del self._flows[flow_key]
+            self._guild_users[guild_key] -= 1
+            if not self._guild_users[guild_key]:
+                del self._guild_users[guild_key]
+
+        return item
@@ -1,16 +1,51 @@
 import asyncio
-import discord
+import itertools
+import logging
 import time
 from typing import Tuple, List, Any
 import os
 
+from bot.config import MAX_JOBS_PER_USER, ENCODER_PROFILE
+from bot.events import log_event
+from bot.delivery import ConversionBatch
+from bot.metrics import QUEUE_WAIT_SECONDS, format_label, registry
+from bot.scheduler import FairScheduler
+from bot.tracing import record_span, recorder
+
+# Formats handled by ImageMagick are considerably more expensive to convert
+EXPENSIVE_FORMATS = {"dds", "psd", "pdf", "ai", "eps"}
+
 def get_logger():
     from bot.logger import logger
     return logger
 
+# Structured per-job events (Logs/queue.log); success events are sampled
+event_logger = logging.getLogger("queue")
+
+def estimate_job_cost(image, target_format):
+    """Rough cost estimate in scheduler units (about 1 per MB, at least 1)"""
+    cost = 1 + (image.size or 0) / (1024 * 1024)
+    source_format = os.path.splitext(image.filename)[1].lstrip(".").lower()
+    if source_format in EXPENSIVE_FORMATS or target_format in EXPENSIVE_FORMATS:
+        cost *= 3
+    return cost
+
+def job_labels(image, target_format):
+    """Metric labels for a job: (source, target)"""
+    return format_label(os.path.splitext(image.filename)[1]), format_label(target_format)
+
+def job_keys(job):
+    """Scheduler keys for a queued job: (guild, user, cost)"""
+    interaction, image, target_format, task_id, retry_count, enqueued_at, batch = job
+    user_id = interaction.user.id
+    # Direct messages get their own "guild" so they don't share one slot
+    guild_key = interaction.guild_id if interaction.guild_id is not None else f"dm:{user_id}"
+    return guild_key, user_id, estimate_job_cost(image, target_format)
+
 class ImageQueue:
     def __init__(self):
-        self.queue = asyncio.Queue()
+        # Fair scheduling across guilds and users instead of a plain FIFO
+        self.queue = FairScheduler(job_keys, max_active_per_user=MAX_JOBS_PER_USER)
         self.processing = False
         self.max_concurrent_tasks = 4
         self.processing_times = []  # Track processing times for performance monitoring
@@ -18,23 +53,83 @@ class ImageQueue:
         self.failed_count = 0
         self.last_error = None
         self.max_retries = 2  # Number of retries for failed conversions
+        self.workers = []  # Long-lived worker tasks
+        self.worker_stats = []  # Busy/idle bookkeeping per worker
+        self.active_tasks = 0
+        self.task_ids = itertools.count(1)
         
-    async def add(self, interaction, image, target_format="png"):
-        """Add an image to the processing queue"""
-        task_id = f"task_{int(time.time())}_{self.queue.qsize()}"
-        await self.queue.put((interaction, image, target_format, task_id, 0))  # 0 = retry count
+        registry.gauge("imagex_queue_depth", "Jobs waiting in the conversion queue", self.queue.qsize)
+        registry.gauge("imagex_queue_active_jobs", "Jobs currently being converted", lambda: self.active_tasks)
         
-        # Start processing if not already running
-        if not self.processing:
-            self.processing = True
-            asyncio.create_task(self.process_queue())
-            get_logger().info(f"🚀 Queue processor started with {self.queue.qsize()} items")
+    async def add(self, interaction, image, target_format="png", batch=None):
+        """
+        Add an image to the processing queue.
+        
+        All jobs of one /convert share a ConversionBatch, which delivers their
+        results together; the caller closes it after adding the last job. Without
+        a batch the job gets its own, already closed one.
+        """
+        task_id = f"task_{int(time.time())}_{next(self.task_ids)}"
+        single = batch is None
+        if single:
+            batch = ConversionBatch(interaction, target_format)
+        batch.add_job(task_id, image.filename)
+        # 0 = retry count, enqueue time for the queue wait metric
+        await self.queue.put((interaction, image, target_format, task_id, 0, time.monotonic(), batch))
+        if single:
+            await batch.close()
+        
+        # Start the worker pool if not already running
+        self.start_workers()
         
         return task_id
     
+    def start_workers(self):
+        """Start the long-lived workers (idempotent)"""
+        if self.workers and not all(worker.done() for worker in self.workers):
+            return
+        
+        now = time.monotonic()
+        self.worker_stats = [
+            {"jobs": 0, "busy": False, "busy_time": 0.0, "idle_time": 0.0, "since": now}
+            for _ in range(self.max_concurrent_tasks)
+        ]
+        self.workers = [
+            asyncio.create_task(self.worker(worker_id))
+            for worker_id in range(self.max_concurrent_tasks)
+        ]
+        get_logger().info(f"🚀 Queue processor started with {self.max_concurrent_tasks} workers")
+    
+    def recent_processing_time(self, count=10):
+        """Average processing time of the last jobs in seconds"""
+        recent = self.processing_times[-count:]
+        return sum(recent) / len(recent) if recent else 0
+    
+    def encoder_profile(self):
+        """Encoder effort for the next job, stepped down under load in auto mode"""
+        from bot.converter import select_encoder_profile
+        return select_encoder_profile(ENCODER_PROFILE, self.queue.qsize(), self.recent_processing_time())
+    
     async def get_status(self):
         """Return current status information about the queue"""
-        avg_time = sum(self.processing_times[-10:]) / max(len(self.processing_times[-10:]), 1) if self.processing_times else 0
+        avg_time = self.recent_processing_time()
+        
+        now = time.monotonic()
+        workers = []
+        for worker_id, stats in enumerate(self.worker_stats):
+            # Include the interval that is still running
+            current = now - stats["since"]
+            busy_time = stats["busy_time"] + (current if stats["busy"] else 0)
+            idle_time = stats["idle_time"] + (0 if stats["busy"] else current)
+            total_time = busy_time + idle_time
+            workers.append({
+                "id": worker_id,
+                "busy": stats["busy"],
+                "jobs": stats["jobs"],
+                "busy_time": round(busy_time, 2),
+                "idle_time": round(idle_time, 2),
+                "utilization": round(busy_time / total_time * 100, 1) if total_time > 0 else 0
+            })
         
         return {
             "queue_size": self.queue.qsize(),
@@ -42,100 +137,106 @@ class ImageQueue:
             "processed_count": self.processed_count,
             "failed_count": self.failed_count,
             "average_processing_time": round(avg_time, 2),
-            "last_error": str(self.last_error) if self.last_error else None
+            "last_error": str(self.last_error) if self.last_error else None,
+            "active_tasks": self.active_tasks,
+            "waiting_users": self.queue.waiting_users(),
+            "encoder_profile": self.encoder_profile(),
+            "workers": workers
         }
 
-    async def process_queue(self):
-        """Process all items in the queue"""
-        try:
-            while not self.queue.empty():
-                # Process up to max_concurrent_tasks images simultaneously
-                batch_size = min(self.max_concurrent_tasks, self.queue.qsize())
-                tasks = []
-                task_data = []
-                
-                for _ in range(batch_size):
-                    data = await self.queue.get()
-                    task_data.append(data)
-                    tasks.append(self.handle_conversion(*data))
-                
-                # Process batch of tasks concurrently
-                start_time = time.time()
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                batch_time = time.time() - start_time
+    async def worker(self, worker_id):
+        """Pull the next job as soon as the previous one is finished"""
+        stats = self.worker_stats[worker_id]
+        
+        while True:
+            data = await self.queue.get()
+            
+            now = time.monotonic()
+            _, image, target_format, task_id, retry_count, enqueued_at, _ = data
+            labels = job_labels(image, target_format)
+            QUEUE_WAIT_SECONDS.observe(now - enqueued_at, *labels)
+            
+            # Sampled jobs get a trace that follows them into convert_image
+            trace_token = recorder.start(
+                "job", start=enqueued_at, task_id=task_id, source=labels[0], target=labels[1],
+                attempt=retry_count + 1, worker=worker_id
+            )
+            record_span("queue_wait", enqueued_at, now)
+            
+            stats["idle_time"] += now - stats["since"]
+            stats["since"] = now
+            stats["busy"] = True
+            self.active_tasks += 1
+            self.processing = True
+            
+            try:
+                await self.process_item(data)
+            except Exception as e:
+                # Never let a worker die on unexpected errors
+                self.last_error = e
+                get_logger().error(f"💥 Unexpected error in queue worker {worker_id}: {e}")
+            finally:
+                now = time.monotonic()
+                processing_time = now - stats["since"]
+                stats["busy_time"] += processing_time
+                stats["since"] = now
+                stats["busy"] = False
+                stats["jobs"] += 1
+                self.active_tasks -= 1
+                self.processing = self.active_tasks > 0
                 
                 # Record processing time
-                if batch_time > 0:
-                    self.processing_times.append(batch_time / batch_size)
-                    # Keep only the last 100 processing times
-                    if len(self.processing_times) > 100:
-                        self.processing_times = self.processing_times[-100:]
-                
-                # Handle results
-                for i, result in enumerate(results):
-                    interaction, image, target_format, task_id, retry_count = task_data[i]
-                    
-                    if isinstance(result, Exception):
-                        # Handle failed conversion
-                        self.last_error = result
-                        get_logger().error(f"❌ Task {task_id} failed: {result}")
-                        
-                        # Retry if under max retries
-                        if retry_count < self.max_retries:
-                            get_logger().info(f"🔄 Retrying task {task_id} (attempt {retry_count+1})")
-                            await self.queue.put((interaction, image, target_format, task_id, retry_count + 1))
-                        else:
-                            self.failed_count += 1
-                            try:
-                                await interaction.followup.send(f"❌ Konvertierung von `{image.filename}` nach `{target_format}` fehlgeschlagen nach {self.max_retries+1} Versuchen.")
-                            except Exception as e:
-                                get_logger().error(f"📤 Konnte Fehlermeldung nicht senden: {e}")
-                    else:
-                        # Successful conversion
-                        self.processed_count += 1
-                
-                    # Mark task as done
-                    self.queue.task_done()
+                self.processing_times.append(processing_time)
+                # Keep only the last 100 processing times
+                if len(self.processing_times) > 100:
+                    self.processing_times = self.processing_times[-100:]
                 
-                # Prevent CPU overload with very small delay
-                await asyncio.sleep(0.1)
-                
-            # Queue is empty, update processing status
-            self.processing = False
-            get_logger().info(f"✅ Queue processor finished. Processed: {self.processed_count}, Failed: {self.failed_count}")
-            
-        except Exception as e:
-            # Catch any unexpected errors in queue processing
-            self.processing = False
-            self.last_error = e
-            get_logger().error(f"💥 Unexpected error in queue processor: {e}")
+                # Mark task as done (frees the user's slot in the scheduler)
+                self.queue.task_done(data)
+                recorder.finish(trace_token)
+
+    async def process_item(self, data):
+        """Run one job and handle retries"""
+        interaction, image, target_format, task_id, retry_count, enqueued_at, batch = data
+        
+        try:
+            await self.handle_conversion(image, target_format, task_id, retry_count, batch)
+        except Exception as result:
+            # Handle failed conversion
+            self.last_error = result
+            log_event(event_logger, "job_failed", "❌ Task {task_id} failed: {error}", logging.ERROR,
+                      task_id=task_id, attempt=retry_count + 1, error=str(result))
             
-            # Try to restart queue processing
-            if not self.queue.empty():
-                self.processing = True
-                asyncio.create_task(self.process_queue())
+            # Retry if under max retries
+            if retry_count < self.max_retries:
+                log_event(event_logger, "job_retry", "🔄 Retrying task {task_id} (attempt {attempt})",
+                          task_id=task_id, attempt=retry_count + 1)
+                await self.queue.put((interaction, image, target_format, task_id, retry_count + 1, time.monotonic(), batch))
+            else:
+                self.failed_count += 1
+                # Reported together with the other results of the request
+                await batch.job_failed(task_id, f"fehlgeschlagen nach {self.max_retries+1} Versuchen ({result})")
+        else:
+            # Successful conversion
+            self.processed_count += 1
 
-    async def handle_conversion(self, interaction, image, target_format, task_id, retry_count):
-        """Process a single image conversion"""
+    async def handle_conversion(self, image, target_format, task_id, retry_count, batch):
+        """Process a single image conversion and hand the result to the request's batch"""
         from bot.converter import convert_image
-        get_logger().info(f"🔄 Processing task {task_id}: Converting {image.filename} to {target_format}")
+        log_event(event_logger, "job_started", "🔄 Processing task {task_id}: Converting {filename} to {target}",
+                  task_id=task_id, filename=image.filename, target=target_format, attempt=retry_count + 1,
+                  queue_depth=self.queue.qsize)
         
         try:
-            # Inform user about processing (first attempt only)
-            if retry_count == 0:
-                try:
-                    await interaction.followup.send(f"⏳ `{image.filename}` wird nach `{target_format.upper()}` konvertiert...")
-                except Exception as e:
-                    get_logger().error(f"📤 Fehler beim Senden der Statusnachricht: {e}")
-            
             # Check if file is too large
             if image.size > 8 * 1024 * 1024:  # 8 MB limit
-                await interaction.followup.send(f"❌ Die Datei `{image.filename}` ist zu groß (max. 8 MB).")
+                await batch.job_failed(task_id, "zu groß (max. 8 MB)", legacy_calls=0)
                 return
                 
             # Perform conversion
             start_time = time.time()
-            image_bytes = await convert_image(image.url, target_format)
+            # Outputs are fitted under the upload limit (or the size the user asked for)
+            image_bytes = await convert_image(image.url, target_format, self.encoder_profile(), batch.max_output_bytes)
             conversion_time = time.time() - start_time
             
             if image_bytes:
@@ -143,22 +244,16 @@ class ImageQueue:
                 original_name = os.path.splitext(image.filename)[0]
                 new_filename = f"{original_name}.{target_format}"
                 
-                # Send converted file
-                await interaction.followup.send(
-                    f"✅ Konvertierung erfolgreich ({conversion_time:.1f}s)",
-                    file=discord.File(image_bytes, filename=new_filename)
-                )
-                get_logger().info(f"✅ Task {task_id} erfolgreich: `{image.filename}` → `{new_filename}` ({conversion_time:.1f}s)")
+                log_event(event_logger, "job_succeeded", "✅ Task {task_id} erfolgreich: `{filename}` → `{output}` ({seconds:.1f}s)",
+                          task_id=task_id, filename=image.filename, output=new_filename, seconds=conversion_time)
+                # The last job of the request uploads all outputs at once
+                await batch.job_succeeded(task_id, new_filename, image_bytes, job_labels(image, target_format))
                 return True
             else:
                 raise Exception("Konvertierung fehlgeschlagen - keine Ausgabedaten")
                 
         except Exception as e:
-            get_logger().error(f"❌ Fehler bei Task {task_id} (Versuch {retry_count+1}): {e}")
-            # Only notify user on final retry
-            if retry_count >= self.max_retries:
-                try:
-                    await interaction.followup.send(f"❌ Fehler bei der Konvertierung von `{image.filename}`: {e}")
-                except Exception as send_error:
-                    get_logger().error(f"📤 Konnte Fehlermeldung nicht senden: {send_error}")
+            log_event(event_logger, "job_attempt_failed", "❌ Fehler bei Task {task_id} (Versuch {attempt}): {error}",
+                      logging.ERROR, task_id=task_id, filename=image.filename, target=target_format,
+                      attempt=retry_count + 1, error=str(e))
             raise e  # Re-raise so retry logic can handle it
\ No newline at end of file
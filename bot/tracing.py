@@ -0,0 +1,280 @@
+import contextvars
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from bot.config import TRACE_SAMPLE_RATE, TRACE_FILE, TRACE_FORMAT
+
+# Logger direkt ohne Import-Loop nutzen
+logger = logging.getLogger("bot")
+# Fertige Traces gehen über diesen Logger an den Schreib-Thread (siehe bot/logger.py)
+trace_logger = logging.getLogger("traces")
+trace_logger.setLevel(logging.INFO)
+trace_logger.propagate = False
+
+# Alle Zeitstempel stammen aus time.monotonic(). Unter Linux ist das
+# CLOCK_MONOTONIC und damit auch in den Worker-Prozessen der Engine vergleichbar.
+clock = time.monotonic
+
+# Anzahl fertiger Traces, die im Speicher bleiben (für Export ohne Datei)
+MAX_RECENT_TRACES = 200
+
+# (Name, Start, Ende, Attribute)
+Span = Tuple[str, float, float, Dict[str, Any]]
+
+_trace_ids = itertools.count(1)
+
+# Trace des gerade bearbeiteten Jobs; folgt dem Job über alle awaits hinweg
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("imagex_trace", default=None)
+
+
+class Trace:
+    """Zeitleiste eines einzelnen Jobs aus benannten Abschnitten (Spans)."""
+
+    __slots__ = ("trace_id", "name", "attributes", "start", "end", "wall_start", "spans")
+
+    def __init__(self, name: str, start: Optional[float] = None, **attributes: Any):
+        self.trace_id = next(_trace_ids)
+        self.name = name
+        self.attributes = attributes
+        self.start = clock() if start is None else start
+        self.end: Optional[float] = None
+        # Wanduhrzeit zum Startzeitpunkt, um die Spans zeitlich einordnen zu können
+        self.wall_start = time.time() - (clock() - self.start)
+        self.spans: List[Span] = []
+
+    def add_span(self, name: str, start: float, end: float, **attributes: Any) -> None:
+        self.spans.append((name, start, end, attributes))
+
+    def span(self, name: str, **attributes: Any) -> "_SpanContext":
+        return _SpanContext(self, name, attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.end if self.end is not None else clock()
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": self.wall_start,
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "attributes": self.attributes,
+            "spans": [
+                {
+                    "name": name,
+                    "offset_ms": round((span_start - self.start) * 1000, 3),
+                    "duration_ms": round((span_end - span_start) * 1000, 3),
+                    **({"attributes": attributes} if attributes else {})
+                }
+                for name, span_start, span_end, attributes in self.spans
+            ]
+        }
+
+    def to_chrome_events(self, pid: int) -> List[Dict[str, Any]]:
+        """Ereignisse im Chrome-Trace-Format (chrome://tracing, Perfetto); ein Job je Zeile."""
+        events = [{
+            "name": self.name, "cat": "job", "ph": "X", "pid": pid, "tid": self.trace_id,
+            "ts": round(self.start * 1e6, 3),
+            "dur": round(((self.end if self.end is not None else clock()) - self.start) * 1e6, 3),
+            "args": self.attributes
+        }]
+        for name, start, end, attributes in self.spans:
+            events.append({
+                "name": name, "cat": "stage", "ph": "X", "pid": pid, "tid": self.trace_id,
+                "ts": round(start * 1e6, 3), "dur": round((end - start) * 1e6, 3), "args": attributes
+            })
+        return events
+
+
+class _SpanContext:
+    __slots__ = ("trace", "name", "attributes", "start")
+
+    def __init__(self, trace: Trace, name: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.trace.add_span(self.name, self.start, clock(), **self.attributes)
+        return False
+
+
+class _NoopSpan:
+    """Ersatz, wenn kein Trace aktiv ist: kostet nur den Funktionsaufruf."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def span(name: str, **attributes: Any):
+    """Misst einen Abschnitt im aktuellen Trace; ohne aktiven Trace ein No-op."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _SpanContext(trace, name, attributes)
+
+
+def record_span(name: str, start: float, end: float, **attributes: Any) -> None:
+    """Trägt einen bereits gemessenen Abschnitt (z.B. aus einem Worker-Prozess) ein."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start, end, **attributes)
+
+
+class StageTimer:
+    """
+    Zeitmessung innerhalb von render_image im Worker-Prozess. Die Spans gehen
+    mit dem Ergebnis zurück an den Hauptprozess und werden dort eingetragen.
+    """
+
+    __slots__ = ("spans",)
+
+    def __init__(self, enabled: bool):
+        self.spans: Optional[List[Span]] = [] if enabled else None
+
+    def stage(self, name: str):
+        if self.spans is None:
+            return _NOOP_SPAN
+        return _StageContext(self.spans, name)
+
+
+class _StageContext:
+    __slots__ = ("spans", "name", "start")
+
+    def __init__(self, spans: List[Span], name: str):
+        self.spans = spans
+        self.name = name
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.spans.append((self.name, self.start, clock(), {}))
+        return False
+
+
+class TraceRecorder:
+    """
+    Entscheidet über das Sampling, hält die letzten fertigen Traces im Speicher
+    und hängt sie an ``path`` an (JSON Lines oder Chrome-Trace-Format).
+
+    Geschrieben wird im Schreib-Thread des Loggings, sobald init_logging gelaufen
+    ist; wie INFO-Zeilen werden Traces bei voller Warteschlange verworfen. Ohne
+    init_logging (Skripte, Benchmarks) wird direkt geschrieben.
+    """
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, path: Optional[str] = TRACE_FILE,
+                 output_format: str = TRACE_FORMAT):
+        self.sample_rate = sample_rate
+        self.path = path
+        self.output_format = output_format
+        self.recent: Deque[Trace] = deque(maxlen=MAX_RECENT_TRACES)
+        self.sampled = 0
+        self._lock = threading.Lock()
+
+    def start(self, name: str, start: Optional[float] = None, **attributes: Any) -> Optional[contextvars.Token]:
+        """
+        Startet bei positivem Sampling einen Trace für den aktuellen Task.
+
+        Returns:
+            Optional[Token]: Für ``finish``; None, wenn nicht gesampelt wurde
+        """
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return None
+        self.sampled += 1
+        return _current_trace.set(Trace(name, start, **attributes))
+
+    def finish(self, token: Optional[contextvars.Token], **attributes: Any) -> Optional[Trace]:
+        """Beendet den mit ``start`` begonnenen Trace und schreibt ihn weg."""
+        if token is None:
+            return None
+        trace = _current_trace.get()
+        _current_trace.reset(token)
+        if trace is None:
+            return None
+
+        trace.end = clock()
+        trace.attributes.update(attributes)
+        self.recent.append(trace)
+        if self.path:
+            if trace_logger.handlers:
+                # Nicht auf dem Event-Loop schreiben
+                trace_logger.info(trace)
+            else:
+                self.write(trace)
+        return trace
+
+    def write(self, trace: Trace) -> None:
+        try:
+            self._append(trace)
+        except OSError as e:
+            logger.warning(f"⚠️ Trace konnte nicht geschrieben werden: {e}")
+
+    def _append(self, trace: Trace) -> None:
+        with self._lock:
+            if self.output_format == "chrome":
+                # Chrome/Perfetto akzeptieren ein nicht geschlossenes JSON-Array,
+                # daher kann die Datei fortlaufend ergänzt werden
+                new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                with open(self.path, "a", encoding="utf-8") as f:
+                    if new_file:
+                        f.write("[\n")
+                    for event in trace.to_chrome_events(os.getpid()):
+                        f.write(json.dumps(event) + ",\n")
+            else:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace.to_dict()) + "\n")
+
+
+class TraceFileHandler(logging.Handler):
+    """Handler im Schreib-Thread: hängt den Trace eines Eintrags an die Datei des Recorders an."""
+
+    def __init__(self, recorder: TraceRecorder):
+        super().__init__()
+        self.recorder = recorder
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.recorder.path and isinstance(record.msg, Trace):
+            self.recorder.write(record.msg)
+
+
+def export_chrome(traces: Iterable[Trace], path: str) -> None:
+    """Schreibt Traces als vollständige Chrome-Trace-Datei."""
+    pid = os.getpid()
+    events = [event for trace in traces for event in trace.to_chrome_events(pid)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def export_jsonl(traces: Iterable[Trace], path: str) -> None:
+    """Schreibt Traces als JSON Lines, ein Job pro Zeile."""
+    with open(path, "w", encoding="utf-8") as f:
+        for trace in traces:
+            f.write(json.dumps(trace.to_dict()) + "\n")
+
+
+# Prozessweiter Recorder, konfiguriert über TRACE_SAMPLE_RATE / TRACE_FILE / TRACE_FORMAT
+recorder = TraceRecorder()
@@ -0,0 +1,242 @@
+"""
+Konvertierungs-Worker für den geteilten Betrieb (siehe bot/broker.py).
+
+Ein Worker holt /convert-Jobs vom Broker, konvertiert die Dateien mit der
+üblichen Pipeline (ImageQueue, convert_image, Prozess-Pool) und liefert über den
+Interaction-Webhook aus. Außer Caches hält er keinen Zustand: beliebig viele
+Worker auf beliebig vielen Hosts können sich einen Broker teilen.
+
+    BROKER_URL=sqlite:///var/lib/imagex/jobs.db python -m bot.worker
+    BROKER_URL=http://gateway-host:9110 BROKER_SECRET=... python -m bot.worker --concurrency 4
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Dict, Optional
+
+import aiohttp
+import discord
+
+from bot.broker import INTERACTION_TOKEN_TTL, BrokerError, JobBroker, open_broker
+from bot.config import BROKER_LEASE, BROKER_URL, WORKER_CONCURRENCY, create_directories
+from bot.converter import init_converter, shutdown_converter
+from bot.delivery import ConversionBatch
+from bot.events import log_event
+from bot.logger import init_logging
+from bot.metrics import metrics_server
+from bot.task_queue import ImageQueue
+
+# Logger direkt ohne Import-Loop nutzen
+logger = logging.getLogger("bot")
+event_logger = logging.getLogger("queue")
+
+# Längste Wartezeit einer Abholung; so oft wird auch geprüft, ob der Worker enden soll
+CLAIM_TIMEOUT = 5.0
+# Pause nach einem Fehler beim Broker, bevor es erneut versucht wird
+BROKER_RETRY_DELAY = 2.0
+
+
+class JobAttachment:
+    """Das, was ImageQueue von discord.Attachment benutzt."""
+
+    def __init__(self, url: str, filename: str, size: int):
+        self.url = url
+        self.filename = filename
+        self.size = size
+
+
+class JobUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class WebhookInteraction:
+    """
+    Ersatz für discord.Interaction im Worker. Fortschritt und Ergebnisse gehen
+    über den Webhook der Interaction (Application-ID und Token), dafür ist
+    weder der Bot-Token noch eine Gateway-Verbindung nötig.
+    """
+
+    def __init__(self, job: Dict[str, Any], session: aiohttp.ClientSession):
+        self.application_id = job["application_id"]
+        self.token = job["token"]
+        self.user = JobUser(job["user_id"])
+        self.guild_id = job["guild_id"]
+        self.followup = discord.Webhook.partial(self.application_id, self.token, session=session)
+
+    async def edit_original_response(self, *, content: Optional[str] = None, **kwargs: Any):
+        return await self.followup.edit_message("@original", content=content, **kwargs)
+
+
+class ConversionWorker:
+    """
+    Holt Jobs vom Broker, solange weniger als ``concurrency`` Anfragen laufen.
+    Die Dateien einer Anfrage laufen durch die lokale ImageQueue; sind alle
+    ausgeliefert, wird der Job bestätigt.
+    """
+
+    def __init__(self, broker: JobBroker, concurrency: int = WORKER_CONCURRENCY, name: Optional[str] = None):
+        self.broker = broker
+        self.concurrency = max(1, concurrency)
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.queue = ImageQueue()
+        self.active = set()
+        self.completed_jobs = 0
+        self.expired_jobs = 0
+        self._stopping: Optional[asyncio.Event] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def stop(self) -> None:
+        """Keine neuen Jobs mehr abholen; laufende werden noch abgeschlossen."""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self) -> None:
+        self._stopping = asyncio.Event()
+        self._session = aiohttp.ClientSession()
+        slots = asyncio.Semaphore(self.concurrency)
+
+        def finished(task: asyncio.Task) -> None:
+            self.active.discard(task)
+            slots.release()
+
+        try:
+            while not self._stopping.is_set():
+                await slots.acquire()
+                try:
+                    job = await self.broker.claim(self.name, CLAIM_TIMEOUT)
+                except BrokerError as e:
+                    slots.release()
+                    logger.warning(f"⚠️ {e}")
+                    await asyncio.sleep(BROKER_RETRY_DELAY)
+                    continue
+                if job is None:
+                    slots.release()
+                    continue
+                task = asyncio.create_task(self.handle(job))
+                self.active.add(task)
+                task.add_done_callback(finished)
+        finally:
+            if self.active:
+                await asyncio.gather(*self.active, return_exceptions=True)
+            await self._session.close()
+
+    async def handle(self, job: Dict[str, Any]) -> None:
+        """Konvertiert alle Dateien einer Anfrage und liefert sie gesammelt aus."""
+        job_id = job["id"]
+        age = time.time() - job["created"]
+        if age > INTERACTION_TOKEN_TTL:
+            # Der Webhook nimmt nichts mehr an; der Job wäre nur verlorene Arbeit
+            self.expired_jobs += 1
+            log_event(event_logger, "broker_job_expired", "⌛ Broker-Job {job_id} verworfen: Interaction nach {age:.0f}s abgelaufen",
+                      logging.WARNING, job_id=job_id, age=age)
+            await self._ack(job_id)
+            return
+
+        log_event(event_logger, "broker_job_claimed", "📥 Broker-Job {job_id} übernommen: {files} Dateien nach {target}",
+                  job_id=job_id, files=len(job["files"]), target=job["target"], attempt=job["attempts"],
+                  waited=age, worker=self.name)
+        lease_keeper = asyncio.create_task(self._keep_lease(job))
+        try:
+            interaction = WebhookInteraction(job, self._session)
+            batch = ConversionBatch(interaction, job["target"], max_output_bytes=job["max_output_bytes"])
+            for filename, reason in job["skipped"]:
+                batch.skip(filename, reason)
+            for attachment in job["files"]:
+                await self.queue.add(interaction, JobAttachment(**attachment), job["target"], batch)
+            await batch.close()
+            await batch.wait()
+        except Exception as e:
+            # Einem anderen (oder später diesem) Worker überlassen
+            log_event(event_logger, "broker_job_failed", "❌ Broker-Job {job_id} fehlgeschlagen: {error}",
+                      logging.ERROR, job_id=job_id, attempt=job["attempts"], error=str(e))
+            await self._stop_lease_keeper(lease_keeper)
+            try:
+                await self.broker.release(job_id)
+            except BrokerError as release_error:
+                logger.warning(f"⚠️ {release_error}")
+            return
+        finally:
+            # Keine Verlängerung mehr nach ack/release
+            await self._stop_lease_keeper(lease_keeper)
+
+        self.completed_jobs += 1
+        await self._ack(job_id)
+
+    async def _keep_lease(self, job: Dict[str, Any]) -> None:
+        """
+        Verlängert die Vergabe, solange der Job läuft; sonst bekäme ihn nach
+        Ablauf ein zweiter Worker und die Ergebnisse kämen doppelt.
+        """
+        # Drei Verlängerungen pro Vergabedauer: eine verpasste ist kein Problem
+        interval = max(1.0, job.get("lease", BROKER_LEASE) / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                extended = await self.broker.extend(job["id"], job["attempts"])
+            except BrokerError as e:
+                logger.warning(f"⚠️ {e}")
+                continue
+            if not extended:
+                log_event(event_logger, "broker_lease_lost", "⚠️ Vergabe von Broker-Job {job_id} verloren",
+                          logging.WARNING, job_id=job["id"], attempt=job["attempts"])
+                return
+
+    @staticmethod
+    async def _stop_lease_keeper(task: asyncio.Task) -> None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def _ack(self, job_id: str) -> None:
+        try:
+            await self.broker.ack(job_id)
+        except BrokerError as e:
+            # Nach Ablauf der Vergabe liefert ein anderer Worker den Job erneut aus
+            logger.warning(f"⚠️ {e}")
+
+
+async def run_worker(broker_url: str, concurrency: int = WORKER_CONCURRENCY) -> None:
+    """Startet Konverter und Metriken und bearbeitet Jobs bis SIGTERM/SIGINT."""
+    broker = open_broker(broker_url)
+    await init_converter()
+    await metrics_server.start()
+
+    worker = ConversionWorker(broker, concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    logger.info(f"👷 Worker {worker.name} bearbeitet Jobs von {broker_url} ({worker.concurrency} gleichzeitig)")
+    try:
+        await worker.run()
+    finally:
+        await metrics_server.stop()
+        await shutdown_converter()
+        await broker.close()
+        logger.info(f"🛑 Worker {worker.name} beendet nach {worker.completed_jobs} Jobs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--broker", default=BROKER_URL, help="Broker-URL (Standard: BROKER_URL)")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY,
+                        help="Gleichzeitig bearbeitete Anfragen (Standard: WORKER_CONCURRENCY)")
+    args = parser.parse_args()
+
+    init_logging()
+    create_directories()
+    if not args.broker:
+        logger.error("❌ Keine Broker-URL: BROKER_URL setzen oder --broker angeben")
+        sys.exit(1)
+
+    asyncio.run(run_worker(args.broker, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,5 +4,5 @@ import bot.main
 
 # This file serves as a launcher for the bot
 if __name__ == "__main__":
-    # The import above will execute the bot's main code
-    pass
+    # Importing bot.main has no side effects; the startup phase runs here
+    bot.main.main()